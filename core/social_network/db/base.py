@@ -1,7 +1,15 @@
+from time import monotonic
 from itertools import cycle
-from collections import namedtuple
-from datetime import datetime
-from typing import Any, Tuple, Optional, Iterable, TypeVar, Type
+from typing import (
+    Any,
+    List,
+    Tuple,
+    Optional,
+    Iterable,
+    TypeVar,
+    Type,
+    AsyncIterator
+)
 
 from pydantic import BaseModel as PydanticBaseModel
 
@@ -10,9 +18,12 @@ from aiomysql import DatabaseError as RawDatabaseError
 from social_network.settings import Settings, settings
 
 from .db import (
+    CHUNK_SIZE,
     BaseDatabaseConnector,
-    DatabaseResponse
+    DatabaseResponse,
+    Rows
 )
+from .decoding import RowDecoder
 from .exceptions import DatabaseError
 from .connectors_storage import BaseConnectorsStorage
 
@@ -28,17 +39,18 @@ class BaseModel(PydanticBaseModel):
 
     id: int
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if getattr(cls, '_fields', None):
+            cls._decoder = RowDecoder(cls, cls._fields, cls._datetime_fields)
+
     @classmethod
     def from_db(cls: Type[M], tpl: tuple) -> M:
-        parsing_tuple = namedtuple('_', cls._fields)
-        fields = parsing_tuple(*tpl)._asdict()
+        return cls._decoder.decode(tpl)
 
-        # Special parsing for Timestamp field
-        for name in cls._datetime_fields:
-            if isinstance(fields[name], datetime):
-                fields[name] = fields[name].timestamp()
-
-        return cls(**fields)
+    @classmethod
+    def from_db_many(cls: Type[M], rows: Iterable[tuple]) -> List[M]:
+        return cls._decoder.decode_many(rows)
 
 
 class BaseManager:
@@ -54,7 +66,12 @@ class BaseManager:
 
     async def get_connector(self, read_only=False) -> BaseDatabaseConnector:
         connector_storage = self.connector_storage
-        if read_only and self.read_only_confs:
+        router = connector_storage.router
+        if read_only and router is not None:
+            connector = router.choose()
+            if connector is not None:
+                return connector
+        elif read_only and self.read_only_confs:
             slave_conf = next(self.read_only_confs)
             return await connector_storage.get_connector(slave_conf)
         return await connector_storage.get_connector(self.conf.DATABASE.MASTER)
@@ -65,8 +82,18 @@ class BaseManager:
                       read_only=False,
                       last_row_id=False,
                       raise_if_empty=True,
-                      execute_many=False) -> DatabaseResponse:
+                      execute_many=False,
+                      write=False) -> DatabaseResponse:
+        """
+        A write pins later reads of the caller to the master for a while,
+        so that they see it. Queries of the master which only read, e.g.
+        to avoid lag, don't.
+        """
+        router = self.connector_storage.router
+        if router is not None and write:
+            router.record_write()
         conn = await self.get_connector(read_only=read_only)
+        started = monotonic()
         try:
             return await conn.make_query(query, params,
                                          last_row_id=last_row_id,
@@ -74,3 +101,18 @@ class BaseManager:
                                          execute_many=execute_many)
         except RawDatabaseError as e:
             raise DatabaseError(e.args) from e
+        finally:
+            if router is not None and read_only:
+                router.observe(conn, monotonic() - started)
+
+    async def stream(self,
+                     query: str,
+                     params: Optional[Iterable[Any]] = None,
+                     read_only=False,
+                     chunk_size: int = CHUNK_SIZE) -> AsyncIterator[Rows]:
+        conn = await self.get_connector(read_only=read_only)
+        try:
+            async for rows in conn.stream_query(query, params, chunk_size):
+                yield rows
+        except RawDatabaseError as e:
+            raise DatabaseError(e.args) from e
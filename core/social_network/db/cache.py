@@ -0,0 +1,175 @@
+from time import monotonic
+from datetime import datetime
+from json import dumps, loads
+from collections import OrderedDict
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union
+)
+
+from social_network.settings import EntityCacheSettings
+
+from .base import BaseModel, M
+from .exceptions import RowsNotFoundError
+from .metrics import ENTITY_CACHE_REQUESTS
+
+KEY_PREFIX = 'entity'
+# Returned by backends for keys they don't have, None is a cached miss
+MISSING = object()
+
+Row = Optional[Tuple[Any, ...]]
+Id = Union[int, str]
+
+
+class BaseCacheBackend:
+
+    async def get(self, key: str) -> Any:
+        raise NotImplementedError
+
+    async def set(self, key: str, row: Row, ttl: float):
+        raise NotImplementedError
+
+    async def delete(self, keys: List[str]):
+        raise NotImplementedError
+
+
+class LocalCacheBackend(BaseCacheBackend):
+    """
+    Rows in process memory, the least recently used ones are evicted.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries: 'OrderedDict[str, Tuple[float, Row]]' = OrderedDict()
+
+    async def get(self, key: str) -> Any:
+        entry = self.entries.get(key)
+        if entry is None:
+            return MISSING
+        expires, row = entry
+        if expires <= monotonic():
+            del self.entries[key]
+            return MISSING
+        self.entries.move_to_end(key)
+        return row
+
+    async def set(self, key: str, row: Row, ttl: float):
+        self.entries[key] = monotonic() + ttl, row
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    async def delete(self, keys: List[str]):
+        for key in keys:
+            self.entries.pop(key, None)
+
+
+def encode_value(value: Any) -> Any:
+    # Datetime columns, models accept timestamps for them
+    if isinstance(value, datetime):
+        return value.timestamp()
+    raise TypeError(f'Can not cache {value!r}')
+
+
+class RedisCacheBackend(BaseCacheBackend):
+    """
+    Rows as JSON in Redis, shared by all of the workers.
+    """
+
+    def __init__(self, redis_service):
+        self.redis_service = redis_service
+
+    async def get(self, key: str) -> Any:
+        raw = await self.redis_service.get(key)
+        if raw is None:
+            return MISSING
+        row = loads(raw)
+        return None if row is None else tuple(row)
+
+    async def set(self, key: str, row: Row, ttl: float):
+        await self.redis_service.set(key, dumps(row, default=encode_value),
+                                     pexpire=int(ttl * 1000))
+
+    async def delete(self, keys: List[str]):
+        await self.redis_service.delete(*keys)
+
+
+def get_models(table_name: str) -> List[Type[BaseModel]]:
+    models, classes = [], list(BaseModel.__subclasses__())
+    while classes:
+        cls = classes.pop()
+        classes.extend(cls.__subclasses__())
+        if getattr(cls, '_table_name', None) == table_name and \
+                getattr(cls, '_fields', None):
+            models.append(cls)
+    return models
+
+
+class EntityCache:
+    """
+    Rows of entities got by id. Rows are cached rather than models, so
+    that changes made to a returned model don't leak to other callers.
+    Ids which were not found are cached for a shorter time.
+
+    Writes through managers invalidate the rows of every model of the
+    table. A read which started before an invalidation in this process
+    doesn't put its possibly stale row to the cache.
+    """
+
+    def __init__(self, conf: EntityCacheSettings, backend: BaseCacheBackend):
+        self.conf = conf
+        self.backend = backend
+        self._models: Dict[str, List[Type[BaseModel]]] = {}
+        # Key -> moment of its last invalidation, kept for TTL
+        self._invalidated: Dict[str, float] = {}
+
+    @staticmethod
+    def make_key(model: Type[BaseModel], id: Id) -> str:
+        return f'{KEY_PREFIX}:{model._table_name}:{model.__name__}:{id}'
+
+    async def get(self, model: Type[M], id: Id,
+                  load: Callable[[Id], Awaitable[Row]]) -> M:
+        """
+        Returns the cached entity or the one built from the row loaded by
+        the function, which returns None if there is no such row.
+        """
+        key, table_name = self.make_key(model, id), model._table_name
+        row = await self.backend.get(key)
+        if row is None:
+            ENTITY_CACHE_REQUESTS.labels(table_name, 'not_found').inc()
+            raise RowsNotFoundError
+        if row is not MISSING:
+            ENTITY_CACHE_REQUESTS.labels(table_name, 'hit').inc()
+            return model.from_db(row)
+
+        ENTITY_CACHE_REQUESTS.labels(table_name, 'miss').inc()
+        started = monotonic()
+        row = await load(id)
+        if self._invalidated.get(key, 0) < started:
+            ttl = self.conf.TTL if row is not None else self.conf.NEGATIVE_TTL
+            await self.backend.set(key, row, ttl)
+        if row is None:
+            raise RowsNotFoundError
+        return model.from_db(row)
+
+    async def invalidate(self, table_name: str, id: Id):
+        models = self._models.get(table_name)
+        if models is None:
+            models = self._models[table_name] = get_models(table_name)
+        keys = [self.make_key(model, id) for model in models]
+        now = monotonic()
+        if len(self._invalidated) > self.conf.MAX_SIZE:
+            self._invalidated = {
+                key: moment for key, moment in self._invalidated.items()
+                if moment + self.conf.TTL > now
+            }
+        self._invalidated.update(dict.fromkeys(keys, now))
+        if keys:
+            await self.backend.delete(keys)
@@ -1,10 +1,21 @@
-from typing import Dict
+from typing import Dict, List, Optional, Sequence, TYPE_CHECKING
 
-from .db import BaseDatabaseConnector, get_connector
+from .db import BaseDatabaseConnector, QueryHook, get_connector
 from ..settings import DatabaseSettings
 
+if TYPE_CHECKING:
+    from .cache import EntityCache
+    from .replicas import ReplicaRouter
+    from .sharding.shard_map import ShardMap
+
 
 class BaseConnectorsStorage:
+    # Chooses slaves for reads when set, otherwise they are round-robined
+    router: Optional['ReplicaRouter'] = None
+    # Caches entities got by id when set
+    entity_cache: Optional['EntityCache'] = None
+    # Shards of tables loaded at start, when set
+    shard_map: Optional['ShardMap'] = None
 
     async def get_connector(self, conf: DatabaseSettings) \
             -> BaseDatabaseConnector:
@@ -13,12 +24,17 @@ class BaseConnectorsStorage:
 
 class ConnectorsStorage(BaseConnectorsStorage):
 
-    def __init__(self):
+    def __init__(self, hooks: Sequence[QueryHook] = ()):
         self._connectors: Dict[str, BaseDatabaseConnector] = {}
+        self.hooks = hooks
+
+    @property
+    def connectors(self) -> List[BaseDatabaseConnector]:
+        return list(self._connectors.values())
 
     async def create_connector(self, conf: DatabaseSettings) \
             -> BaseDatabaseConnector:
-        connector = await get_connector(conf)
+        connector = await get_connector(conf, self.hooks)
         self._connectors[conf.json()] = connector
         return connector
 
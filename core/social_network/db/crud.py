@@ -1,10 +1,20 @@
-from async_lru import alru_cache
-from typing import Tuple, Any, List, Union
+from typing import (
+    Tuple,
+    Any,
+    Dict,
+    List,
+    Optional,
+    Union,
+    AsyncIterator,
+    Sequence
+)
 
 from social_network.settings import settings
 
 from .base import BaseManager, M
-from .mixins import LimitMixin, OrderMixin
+from .db import CHUNK_SIZE
+from .exceptions import RowsNotFoundError
+from .mixins import LimitMixin, KeysetMixin, add_where
 
 CREATE = '''
     INSERT INTO {table_name} ({fields}) VALUES ({values});
@@ -15,41 +25,92 @@ GET = 'SELECT {fields} FROM {table_name} WHERE id = %s;'
 DELETE = 'DELETE FROM {table_name} WHERE id = %s;'
 
 
-class BaseCRUDManager(BaseManager, LimitMixin, OrderMixin):
+class BaseCRUDManager(BaseManager, LimitMixin, KeysetMixin):
     auto_id: bool = True
 
-    def _make_create_query(self, query=CREATE) -> str:
+    def _get_create_fields(self) -> List[str]:
         fields = list(self.model._fields)
         if self.auto_id:
             fields.remove('id')
+        return fields
+
+    def _make_create_query(self, query=CREATE) -> str:
+        fields = self._get_create_fields()
         return query.format(
             table_name=self.model._table_name,
             fields=", ".join(fields),
             values=", ".join('%s' for _ in fields)
         )
 
-    async def _create(self, params: Tuple[Any, ...]) -> M:
+    def _from_params(self, params: Tuple[Any, ...],
+                     id: Union[int, str, None] = None) -> M:
+        """
+        Builds the model of a row inserted with the params.
+        """
+        values = dict(zip(self._get_create_fields(), params))
+        if self.auto_id:
+            values['id'] = id
+        return self.model.from_db(
+            tuple(values[name] for name in self.model._fields)
+        )
+
+    async def _create(self, params: Tuple[Any, ...], fetch=False) -> M:
+        """
+        Returns the model built from params and the inserted id, fetch
+        reads the row back from the master instead.
+        """
         query = self._make_create_query()
-        id = await self.execute(query, params, last_row_id=True)
-        return await self._get(id, read_only=False)
+        id = await self.execute(query, params, last_row_id=True, write=True)
+        await self._invalidate(id)
+        if fetch:
+            return await self._get(id, read_only=False)
+        return self._from_params(params, id)
 
     async def _bulk_create(self, params: Tuple[Tuple[Any, ...], ...]):
         query = self._make_create_query(BULK_CREATE)
         await self.execute(query, params,
                            raise_if_empty=False,
-                           execute_many=True)
-
-    async def _update(self, id: int, params: Tuple[Any, ...], query: str) -> M:
-        await self.execute(query, params, raise_if_empty=False)
-        return await self._get(id, read_only=False)
+                           execute_many=True,
+                           write=True)
+
+    async def _update(self, id: int, params: Tuple[Any, ...], query: str,
+                      changes: Optional[Dict[str, Any]] = None,
+                      current: Optional[M] = None, fetch=False) -> M:
+        """
+        Returns the current model with changes applied if both are given,
+        otherwise, or with fetch, reads the row back from the master.
+        """
+        await self.execute(query, params, raise_if_empty=False, write=True)
+        await self._invalidate(id)
+        if fetch or current is None or changes is None:
+            return await self._get(id, read_only=False)
+        return current.copy(update=changes)
 
     async def _get(self, id: Union[int, str], read_only=True) -> M:
+        return self.model.from_db(await self._get_row(id, read_only))
+
+    async def _get_row(self, id: Union[int, str],
+                       read_only=True) -> Tuple[Any, ...]:
         query = GET.format(
             fields=", ".join(self.model._fields),
             table_name=self.model._table_name
         )
         rows = await self.execute(query, (id,), read_only=read_only)
-        return self.model.from_db(rows[0])
+        return rows[0]
+
+    async def _load_row(self, id: Union[int, str]) \
+            -> Optional[Tuple[Any, ...]]:
+        # Cached rows are read from the master, a lagging slave could
+        # put a row older than the last write to the cache for its TTL
+        try:
+            return await self._get_row(id, read_only=False)
+        except RowsNotFoundError:
+            return None
+
+    async def _invalidate(self, id: Union[int, str]):
+        cache = self.connector_storage.entity_cache
+        if cache is not None:
+            await cache.invalidate(self.model._table_name, id)
 
     async def _list(self,
                     params: Tuple[Any, ...],
@@ -57,26 +118,54 @@ class BaseCRUDManager(BaseManager, LimitMixin, OrderMixin):
                     order_by: str = None,
                     order: str = None,
                     limit: int = settings.BASE_PAGE_LIMIT,
-                    offset: int = 0) -> List[M]:
+                    offset: int = 0,
+                    cursor: Optional[str] = None,
+                    where: Sequence[str] = ()) -> List[M]:
+        """
+        Filters of the query are passed as where conditions, the query has
+        no WHERE clause.
+        """
         if order_by and order:
-            query = self.add_order(query, order_by, order)
+            query, params = self.add_keyset(query, params, order_by, order,
+                                            cursor, where)
+        else:
+            query = add_where(query, where)
         query = self.add_limit(query, limit, offset)
         rows = await self.execute(query, params, read_only=True,
                                   raise_if_empty=False)
-        models = [self.model.from_db(row) for row in rows]
-        return models
+        return self.model.from_db_many(rows)
+
+    async def _iter(self,
+                    params: Tuple[Any, ...],
+                    query: str,
+                    order_by: str = None,
+                    order: str = None,
+                    chunk_size: int = CHUNK_SIZE,
+                    where: Sequence[str] = ()) -> AsyncIterator[List[M]]:
+        """
+        Same as _list without limit, models are yielded in chunks.
+        """
+        query = add_where(query, where)
+        if order_by and order:
+            query = self.add_order(query, order_by, order)
+        async for rows in self.stream(query, params, read_only=True,
+                                      chunk_size=chunk_size):
+            yield self.model.from_db_many(rows)
 
     async def _delete(self, id: int):
         query = DELETE.format(table_name=self.model._table_name)
-        await self.execute(query, (id,), raise_if_empty=False)
+        await self.execute(query, (id,), raise_if_empty=False, write=True)
+        await self._invalidate(id)
 
 
 class CRUDManager(BaseCRUDManager):
     model: M
 
-    @alru_cache(maxsize=1000)
     async def get(self, id: int) -> M:
-        return await self._get(id)
+        cache = self.connector_storage.entity_cache
+        if cache is None:
+            return await self._get(id)
+        return await cache.get(self.model, id, self._load_row)
 
     async def delete(self, id: int):
         return await self._delete(id)
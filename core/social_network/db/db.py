@@ -1,14 +1,49 @@
-from typing import Optional, Tuple, Any, Union
+import asyncio
+from time import monotonic
+from contextlib import asynccontextmanager
+from typing import (
+    Optional,
+    Tuple,
+    Any,
+    Union,
+    AsyncIterator,
+    NamedTuple,
+    Sequence
+)
 
 import aiomysql
 
 from social_network.settings import DatabaseSettings
 
-from .exceptions import RowsNotFoundError
+from .exceptions import RowsNotFoundError, PoolTimeoutError
+from .metrics import ACQUIRE_WAIT
 
 Rows = Tuple[Tuple[Any, ...]]
 DatabaseResponse = Union[Rows, int, str]
 
+# Rows fetched from the server at once by streaming queries
+CHUNK_SIZE = 1000
+
+
+class QueryEvent(NamedTuple):
+    connector: 'DatabaseConnector'
+    query: str
+    params: Any
+    # Seconds spent waiting for a connection and running the query
+    wait: float
+    duration: float
+    # Rows returned or affected, None if the query failed
+    rows: Optional[int]
+
+
+class QueryHook:
+    """
+    Called after every query made by connectors it was passed to.
+    """
+
+    def on_query(self, event: QueryEvent):
+        raise NotImplementedError
+
 
 class BaseDatabaseConnector:
 
@@ -23,15 +58,26 @@ class BaseDatabaseConnector:
             -> DatabaseResponse:
         raise NotImplementedError
 
+    def stream_query(self,
+                     query_template: str,
+                     params: Optional[Tuple[Any, ...]] = None,
+                     chunk_size: int = CHUNK_SIZE) -> AsyncIterator[Rows]:
+        raise NotImplementedError
+
     async def close(self):
         raise NotImplementedError
 
 
 class DatabaseConnector(BaseDatabaseConnector):
 
-    def __init__(self, conf: DatabaseSettings):
+    def __init__(self, conf: DatabaseSettings,
+                 hooks: Sequence[QueryHook] = ()):
         self.conf = conf
-        self.pool = None
+        self.hooks = hooks
+        self.pool: Optional[aiomysql.Pool] = None
+        self.name = f'{conf.HOST}:{conf.PORT}/{conf.NAME}'
+        # Coroutines waiting for a free connection
+        self.waiting = 0
 
     async def make_query(self,
                          query_template: str,
@@ -42,42 +88,155 @@ class DatabaseConnector(BaseDatabaseConnector):
                          raise_if_empty=True,
                          execute_many=False) \
             -> DatabaseResponse:
-        async with self.pool.acquire() as conn:  # type: aiomysql.Connection
-            async with conn.cursor() as cursor:  # type: aiomysql.Cursor
-                if execute_many:
-                    rowcount = await cursor.executemany(query_template, params)
-                else:
-                    rowcount = await cursor.execute(query_template, params)
-
-                if only_count:
-                    return rowcount
-                if last_row_id:
-                    return cursor.lastrowid
-                data = await cursor.fetchmany(max_rows or rowcount)
-
-                if raise_if_empty and not data:
-                    raise RowsNotFoundError
-                return data
+        started = monotonic()
+        acquired = rowcount = None
+        try:
+            async with self.acquire() as conn:
+                acquired = monotonic()
+                async with conn.cursor() as cursor:  # type: aiomysql.Cursor
+                    if execute_many:
+                        rowcount = await cursor.executemany(query_template,
+                                                            params)
+                    else:
+                        rowcount = await cursor.execute(query_template, params)
+
+                    if only_count:
+                        return rowcount
+                    if last_row_id:
+                        return cursor.lastrowid
+                    data = await cursor.fetchmany(max_rows or rowcount)
+        finally:
+            if self.hooks and acquired is not None:
+                self._notify(QueryEvent(self, query_template, params,
+                                        acquired - started,
+                                        monotonic() - acquired, rowcount))
+
+        if raise_if_empty and not data:
+            raise RowsNotFoundError
+        return data
+
+    def _notify(self, event: QueryEvent):
+        for hook in self.hooks:
+            hook.on_query(event)
+
+    async def stream_query(self,
+                           query_template: str,
+                           params: Optional[Tuple[Any, ...]] = None,
+                           chunk_size: int = CHUNK_SIZE) \
+            -> AsyncIterator[Rows]:
+        """
+        Yields rows in chunks read from an unbuffered server side cursor,
+        so memory doesn't depend on the size of the result. The connection
+        stays acquired until the iteration is over, and so is the query
+        for hooks: until the cursor is closed.
+        """
+        started = monotonic()
+        acquired = None
+        count: Optional[int] = 0
+        try:
+            async with self.acquire() as conn:
+                acquired = monotonic()
+                async with conn.cursor(aiomysql.SSCursor) as cursor:
+                    await cursor.execute(query_template, params)
+                    while rows := await cursor.fetchmany(chunk_size):
+                        count += len(rows)
+                        yield rows
+        except Exception:
+            count = None
+            raise
+        finally:
+            if self.hooks and acquired is not None:
+                self._notify(QueryEvent(self, query_template, params,
+                                        acquired - started,
+                                        monotonic() - acquired, count))
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[aiomysql.Connection]:
+        started = monotonic()
+        self.waiting += 1
+        try:
+            conn = await self._acquire()
+        finally:
+            self.waiting -= 1
+            ACQUIRE_WAIT.labels(self.name).observe(monotonic() - started)
+        try:
+            yield conn
+        finally:
+            self.pool.release(conn)
+
+    async def _acquire(self) -> aiomysql.Connection:
+        # Not asyncio.wait_for: a connection acquired right at the timeout
+        # would be lost for the pool
+        task = asyncio.ensure_future(self._acquire_from_pool())
+        try:
+            done, _ = await asyncio.wait((task,),
+                                         timeout=self.conf.ACQUIRE_TIMEOUT)
+        except asyncio.CancelledError:
+            self._abandon(task)
+            raise
+        if not done:
+            self._abandon(task)
+            raise PoolTimeoutError
+        return task.result()
+
+    async def _acquire_from_pool(self) -> aiomysql.Connection:
+        return await self.pool.acquire()
+
+    def _abandon(self, task: asyncio.Task):
+        def release(_):
+            if not task.cancelled() and task.exception() is None:
+                self.pool.release(task.result())
+
+        task.cancel()
+        task.add_done_callback(release)
+
+    @property
+    def saturation(self) -> float:
+        """
+        Share of the pool's connections in use.
+        """
+        used = self.pool.size - self.pool.freesize
+        return used / self.pool.maxsize
 
     async def start(self):
-        await  self._create_pool()
+        await self._create_pool()
+        await self._warm_up()
 
     async def _create_pool(self):
         c = self.conf
         password = c.PASSWORD.get_secret_value()
-        self.pool = await aiomysql.create_pool(host=c.HOST, port=c.PORT,
-                                               user=c.USER, password=password,
-                                               db=c.NAME,
-                                               minsize=c.MAX_CONNECTIONS,
-                                               maxsize=c.MAX_CONNECTIONS,
-                                               autocommit=True)
+        self.pool = await aiomysql.create_pool(
+            host=c.HOST, port=c.PORT,
+            user=c.USER, password=password,
+            db=c.NAME,
+            minsize=c.MIN_CONNECTIONS,
+            maxsize=c.MAX_CONNECTIONS,
+            pool_recycle=c.CONNECTION_RECYCLE,
+            local_infile=c.LOCAL_INFILE,
+            autocommit=True
+        )
+
+    async def _warm_up(self):
+        """
+        Checks all of the initial connections, so that the first requests
+        don't pay for broken ones.
+        """
+        async def ping():
+            async with self.acquire() as conn:
+                await conn.ping(reconnect=True)
+
+        await asyncio.gather(*[
+            ping() for _ in range(self.conf.MIN_CONNECTIONS)
+        ])
 
     async def close(self):
         self.pool.close()
         await self.pool.wait_closed()
 
 
-async def get_connector(conf: DatabaseSettings) -> BaseDatabaseConnector:
-    connector = DatabaseConnector(conf)
+async def get_connector(conf: DatabaseSettings,
+                        hooks: Sequence[QueryHook] = ()) \
+        -> BaseDatabaseConnector:
+    connector = DatabaseConnector(conf, hooks)
     await connector.start()
     return connector
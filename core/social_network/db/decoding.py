@@ -0,0 +1,110 @@
+from enum import Enum
+from datetime import datetime
+from functools import partial
+from typing import Any, Callable, Iterable, List, Sequence, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+from pydantic.fields import ModelField, SHAPE_SINGLETON
+
+# Columns of these types come from the database ready to use
+TRUSTED_TYPES = (int, float, str, bytes)
+
+Converter = Callable[[Any], Any]
+
+
+def to_timestamp(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return value
+
+
+def validate_field(model: Type[BaseModel], field: ModelField,
+                   value: Any) -> Any:
+    value, errors = field.validate(value, {}, loc=field.name, cls=model)
+    if errors:
+        raise ValidationError([errors], model)
+    return value
+
+
+def is_trusted(field: ModelField) -> bool:
+    type_ = field.type_
+    return field.shape == SHAPE_SINGLETON and \
+        not field.class_validators and \
+        isinstance(type_, type) and \
+        issubclass(type_, TRUSTED_TYPES) and \
+        not issubclass(type_, (bool, Enum))
+
+
+def first_value(column: Sequence[Any]) -> Any:
+    return next((value for value in column if value is not None), None)
+
+
+class RowDecoder:
+    """
+    Builds models from database rows of their `_fields` columns.
+
+    Rows are trusted, so models are created without validation and only the
+    columns which need it are converted: timestamps, enums, secrets, nested
+    models and fields with validators. Which columns those are is worked
+    out once per model. Rows are converted column by column, a column of
+    a plain type is validated only when the driver returned another type
+    for it, e.g. int for a str field.
+    """
+
+    def __init__(self, model: Type[BaseModel], names: Tuple[str, ...],
+                 datetime_names: Tuple[str, ...]):
+        self.model = model
+        self.names = names
+        self.fields_set = frozenset(names)
+        # Keeps the order of fields as if the model was validated
+        self.template = dict.fromkeys(model.__fields__)
+        self.defaults = [
+            (name, field) for name, field in model.__fields__.items()
+            if name not in self.fields_set
+        ]
+        self.converters: List[Tuple[int, Converter]] = []
+        self.checked: List[Tuple[int, type, Converter]] = []
+        for index, name in enumerate(names):
+            field = model.__fields__[name]
+            converter = partial(validate_field, model, field)
+            if name in datetime_names:
+                self.converters.append((index, to_timestamp))
+            elif is_trusted(field):
+                self.checked.append((index, field.type_, converter))
+            else:
+                self.converters.append((index, converter))
+
+    def decode(self, row: Iterable[Any]) -> BaseModel:
+        return self.decode_many((row,))[0]
+
+    def get_converters(self, columns: List[Sequence[Any]]) \
+            -> List[Tuple[int, Converter]]:
+        converters = list(self.converters)
+        for index, type_, converter in self.checked:
+            value = first_value(columns[index])
+            if value is not None and type(value) is not type_:
+                converters.append((index, converter))
+        return converters
+
+    def decode_many(self, rows: Iterable[Iterable[Any]]) -> List[BaseModel]:
+        columns = list(zip(*rows))
+        if not columns:
+            return []
+        converters = self.get_converters(columns)
+        for index, convert in converters:
+            columns[index] = [
+                None if value is None else convert(value)
+                for value in columns[index]
+            ]
+
+        return [self.construct(row) for row in zip(*columns)]
+
+    def construct(self, row: Tuple[Any, ...]) -> BaseModel:
+        values = self.template.copy()
+        values.update(zip(self.names, row))
+        for name, field in self.defaults:
+            values[name] = field.get_default()
+        model = self.model.__new__(self.model)
+        object.__setattr__(model, '__dict__', values)
+        object.__setattr__(model, '__fields_set__', set(self.fields_set))
+        return model
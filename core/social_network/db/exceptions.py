@@ -4,3 +4,15 @@ class DatabaseError(Exception):
 
 class RowsNotFoundError(Exception):
     pass
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class InvalidCursorError(Exception):
+    pass
+
+
+class ReshardingError(Exception):
+    pass
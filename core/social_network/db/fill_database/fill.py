@@ -1,14 +1,17 @@
+import os
 import asyncio
-import copy
+import argparse
 import random
 import string
 import itertools
+from collections import deque
 from functools import lru_cache
-from typing import Tuple, Union, Any, List, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple, Union, List, AsyncIterator, Optional
 
-from social_network.db.managers import AuthUserManager
-from social_network.db.models import Gender
-from social_network.db.db import DatabaseConnector
+from social_network.db.models import AuthUser, Gender
+from social_network.db.db import get_connector
+from social_network.db.fill_database.loader import BulkLoader
 
 from social_network.utils.security import hash_password
 from social_network.settings import settings, Settings
@@ -23,75 +26,124 @@ from social_network.db.fill_database.data import (
     CITIES
 )
 
+RawUser = Tuple[Union[str, int], ...]
+
+# Weighted pools, a uniform choice from them follows the weights
+FIRST_NAMES = (POPULAR_FIRST_NAMES * 10 + COMMON_FIRST_NAMES * 5 +
+               UNCOMMON_FIRST_NAMES)
+LAST_NAMES = (POPULAR_LAST_NAMES * 10 + COMMON_LAST_NAMES * 5 +
+              UNCOMMON_LAST_NAMES)
+CITY_NAMES = tuple(itertools.chain(
+    *[[name] * weight for name, weight in CITIES.items()]
+))
+AGES = tuple(range(18, 61))
+DOMAINS_COUNT = 1000
+
 
 @lru_cache()
 def get_password_and_salt(password='secret_password'):
     return hash_password(password)
 
 
-def random_str(n: int) -> str:
-    return ''.join(random.choices(string.ascii_lowercase + string.digits, k=n))
-
-
-def generate_email() -> str:
-    name, domain = random_str(13), random_str(4)
-    return f'{name}@{domain}.com'
-
-
-def prepare_sequence(seq: List[Any]) -> Iterator[Any]:
-    copy_seq = copy.copy(seq)
-    random.shuffle(copy_seq)
-    return itertools.cycle(copy_seq)
-
-
-def get_raw_user(first_name: str, last_name: str, city: str) \
-        -> Tuple[Union[str, int], ...]:
-    email = generate_email()
+def random_str(rng: random.Random, n: int) -> str:
+    return ''.join(rng.choices(string.ascii_lowercase + string.digits, k=n))
+
+
+def get_raw_users(seed: int, count: int, hashed_password: str,
+                  salt: str) -> List[RawUser]:
+    """
+    Generates a batch of users column by column, deterministic for a seed.
+    Local parts of emails are 64 random bits, so that they are unique
+    among millions of users.
+    """
+    rng = random.Random(seed)
+    domains = [f'{random_str(rng, 4)}.com' for _ in range(DOMAINS_COUNT)]
+    emails = [
+        f'{rng.getrandbits(64):016x}@{domain}'
+        for domain in rng.choices(domains, k=count)
+    ]
+    return list(zip(
+        emails,
+        itertools.repeat(hashed_password, count),
+        itertools.repeat(salt, count),
+        rng.choices(AGES, k=count),
+        rng.choices(FIRST_NAMES, k=count),
+        rng.choices(LAST_NAMES, k=count),
+        rng.choices(CITY_NAMES, k=count),
+        itertools.repeat(Gender.MALE.value, count)
+    ))
+
+
+async def generate_users(count: int, batch_size: int,
+                         executor: ProcessPoolExecutor, prefetch: int,
+                         seed: Optional[int] = None) \
+        -> AsyncIterator[List[RawUser]]:
+    """
+    Yields batches of users generated in the executor, up to prefetch
+    batches are being generated while the previous ones are loaded.
+    """
+    loop = asyncio.get_running_loop()
+    seeds = random.Random(seed)
     hashed_password, salt = get_password_and_salt()
-    age = random.randint(18, 60)
-    gender = Gender.MALE
-    return (email, hashed_password, salt, age, first_name, last_name,
-            city, gender)
-
-
-def get_raw_users(first_names: Iterator[str], last_names: Iterator[str],
-                  cities: Iterator[str], count: int) -> List:
-    users = []
-    for first_name, last_name, city in zip(first_names, last_names, cities):
-        users.append(get_raw_user(first_name, last_name, city))
-        if len(users) >= count:
-            break
-    return users
-
-
-async def fill_db(conf: Settings, count: int = 1000, batch_size: int = 100):
-    connector = DatabaseConnector(conf.DATABASE.MASTER)
-    await connector.start()
-    user_manager = AuthUserManager(connector, conf=settings)
-    first_names = prepare_sequence(
-        list(POPULAR_FIRST_NAMES * 10 +
-             COMMON_FIRST_NAMES * 5 +
-             UNCOMMON_FIRST_NAMES)
-    )
-    last_names = prepare_sequence(
-        list(POPULAR_LAST_NAMES * 10 +
-             COMMON_LAST_NAMES * 5 +
-             UNCOMMON_LAST_NAMES)
-    )
-    cities = prepare_sequence(
-        list(itertools.chain(
-            *[[name] * weight for name, weight in CITIES.items()]
-        )))
-    counter = 0
-    for i in range(count // batch_size):
-        users = get_raw_users(first_names, last_names, cities, batch_size)
-        await user_manager.bulk_create(tuple(users))
-        counter += len(users)
-        print(f'{counter} users created.')
+    sizes = iter([
+        min(batch_size, count - start)
+        for start in range(0, count, batch_size)
+    ])
+    pending = deque()
+
+    def submit():
+        for size in itertools.islice(sizes, prefetch - len(pending)):
+            pending.append(loop.run_in_executor(
+                executor, get_raw_users, seeds.getrandbits(64), size,
+                hashed_password, salt
+            ))
+
+    submit()
+    try:
+        while pending:
+            users = await pending.popleft()
+            submit()
+            yield users
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+async def fill_db(conf: Settings, count: int = 1000, batch_size: int = 10000,
+                  concurrency: int = 8, load_data=False,
+                  processes: Optional[int] = None, seed: Optional[int] = None):
+    db_conf = conf.DATABASE.MASTER.copy(update={
+        'MAX_CONNECTIONS': max(concurrency,
+                               conf.DATABASE.MASTER.MAX_CONNECTIONS),
+        'LOCAL_INFILE': load_data
+    })
+    connector = await get_connector(db_conf)
+    fields = [name for name in AuthUser._fields if name != 'id']
+    loader = BulkLoader(connector, AuthUser._table_name, fields,
+                        concurrency=concurrency, use_load_data=load_data)
+    try:
+        processes = processes or os.cpu_count() or 1
+        with ProcessPoolExecutor(processes) as executor:
+            batches = generate_users(count, batch_size, executor,
+                                     processes * 2, seed)
+            await loader.load(batches, total=count)
+    finally:
+        await connector.close()
 
 
 def main(conf: Settings):
-    asyncio.run(fill_db(conf, 1000000, 100000))
+    parser = argparse.ArgumentParser(description='Fills users table.')
+    parser.add_argument('count', type=int, nargs='?', default=1000000)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--load-data', action='store_true',
+                        help='Use LOAD DATA LOCAL INFILE instead of INSERT')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='Processes generating users, all CPUs if unset')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    asyncio.run(fill_db(conf, args.count, args.batch_size, args.concurrency,
+                        args.load_data, args.processes, args.seed))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,211 @@
+import os
+import asyncio
+import tempfile
+from enum import Enum
+from time import monotonic
+from datetime import datetime
+from typing import (
+    Any,
+    AsyncIterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple
+)
+
+from pymysql.converters import escape_item
+
+from social_network.db.db import DatabaseConnector
+
+CHARSET = 'utf8mb4'
+MAX_PACKET = 'SELECT @@max_allowed_packet;'
+INSERT = 'INSERT INTO {table_name} ({fields}) VALUES '
+LOAD_DATA = '''
+    LOAD DATA LOCAL INFILE %s INTO TABLE {table_name}
+    CHARACTER SET utf8mb4
+    FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+    LINES TERMINATED BY '\\n'
+    ({fields});
+'''
+# Room left in a packet for its header and the statement's own overhead
+PACKET_SHARE = .9
+# Escapes of LOAD DATA's default format
+TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n',
+                             '\r': '\\r', '\0': '\\0'})
+
+Row = Tuple[Any, ...]
+
+
+def to_tsv_field(value: Any) -> str:
+    if value is None:
+        return '\\N'
+    if isinstance(value, Enum):
+        value = value.value
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, datetime):
+        return value.isoformat(' ')
+    return str(value).translate(TSV_ESCAPES)
+
+
+def to_tsv(rows: Sequence[Row]) -> bytes:
+    return ''.join(
+        '\t'.join(map(to_tsv_field, row)) + '\n' for row in rows
+    ).encode()
+
+
+class LoadStats:
+
+    def __init__(self, total: Optional[int] = None):
+        self.total = total
+        self.rows = 0
+        self.bytes = 0
+        self.chunks = 0
+        self.started = monotonic()
+
+    def add(self, rows: int, size: int):
+        self.rows += rows
+        self.bytes += size
+        self.chunks += 1
+
+    @property
+    def elapsed(self) -> float:
+        return monotonic() - self.started
+
+    def __str__(self) -> str:
+        elapsed = self.elapsed or 1e-9
+        done = f'{self.rows}' if self.total is None else \
+            f'{self.rows}/{self.total} ({self.rows / self.total:.0%})'
+        return (f'{done} rows in {self.chunks} chunks, {elapsed:.1f}s, '
+                f'{self.rows / elapsed:.0f} rows/s, '
+                f'{self.bytes / elapsed / 2 ** 20:.1f} MiB/s')
+
+
+class BulkLoader:
+    """
+    Inserts batches of rows with multi-row INSERT statements as large as
+    the server accepts, or with LOAD DATA LOCAL INFILE, several of them at
+    once on connections of the pool. Batches are taken from the iterable
+    only as fast as they are loaded.
+
+    Statements are executed on raw connections, so that they don't reach
+    the query hooks of the connector.
+    """
+
+    def __init__(self,
+                 connector: DatabaseConnector,
+                 table_name: str,
+                 fields: Sequence[str],
+                 concurrency: int = 4,
+                 use_load_data=False,
+                 report_every: float = 5):
+        self.connector = connector
+        self.table_name = table_name
+        self.fields = tuple(fields)
+        self.concurrency = concurrency
+        self.use_load_data = use_load_data
+        self.report_every = report_every
+        self.max_statement_size: Optional[int] = None
+        self._prefix = INSERT.format(
+            table_name=table_name, fields=', '.join(fields)
+        ).encode()
+
+    async def get_max_statement_size(self) -> int:
+        (packet_size,), = await self.connector.make_query(MAX_PACKET)
+        return int(int(packet_size) * PACKET_SHARE)
+
+    def make_statements(self, rows: Sequence[Row]) \
+            -> Iterator[Tuple[bytes, int]]:
+        """
+        Yields INSERT statements with the number of rows in each, none of
+        them is larger than max_statement_size unless a row alone is.
+        """
+        prefix, limit = self._prefix, self.max_statement_size
+        values: List[bytes] = []
+        size = len(prefix)
+        for row in rows:
+            value = escape_item(tuple(row), CHARSET).encode()
+            if values and size + len(value) + 1 > limit:
+                yield prefix + b','.join(values), len(values)
+                values, size = [], len(prefix)
+            values.append(value)
+            size += len(value) + 1
+        if values:
+            yield prefix + b','.join(values), len(values)
+
+    async def load(self, batches: AsyncIterable[Sequence[Row]],
+                   total: Optional[int] = None) -> LoadStats:
+        if self.max_statement_size is None:
+            self.max_statement_size = await self.get_max_statement_size()
+        stats = LoadStats(total)
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        workers = [
+            asyncio.create_task(self._work(queue, stats))
+            for _ in range(self.concurrency)
+        ]
+        reporter = asyncio.create_task(self._report(stats))
+        try:
+            await self._produce(batches, queue, workers)
+            await asyncio.gather(*workers)
+        finally:
+            reporter.cancel()
+            for worker in workers:
+                worker.cancel()
+        print(f'Loaded {stats}')
+        return stats
+
+    async def _produce(self, batches: AsyncIterable[Sequence[Row]],
+                       queue: asyncio.Queue, workers: List[asyncio.Task]):
+        async for rows in batches:
+            if self.use_load_data:
+                chunks = [(rows, len(rows))]
+            else:
+                chunks = self.make_statements(rows)
+            for chunk in chunks:
+                # Waits for a free worker, or fails with one which failed
+                put = asyncio.ensure_future(queue.put(chunk))
+                await asyncio.wait([put, *workers],
+                                   return_when=asyncio.FIRST_COMPLETED)
+                if not put.done():
+                    put.cancel()
+                    await asyncio.gather(*workers)
+        for _ in workers:
+            await queue.put(None)
+
+    async def _work(self, queue: asyncio.Queue, stats: LoadStats):
+        while (chunk := await queue.get()) is not None:
+            data, count = chunk
+            if self.use_load_data:
+                size = await self._load_data(data)
+            else:
+                size = len(data)
+                await self._execute(data)
+            stats.add(count, size)
+
+    async def _execute(self, query: bytes, params: Optional[Row] = None):
+        async with self.connector.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(query, params)
+
+    async def _load_data(self, rows: Sequence[Row]) -> int:
+        """
+        Loads rows from a temporary file, as the driver sends local files
+        by name. Returns the size of the file.
+        """
+        data = to_tsv(rows)
+        fd, path = tempfile.mkstemp(suffix='.tsv')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            query = LOAD_DATA.format(table_name=self.table_name,
+                                     fields=', '.join(self.fields))
+            await self._execute(query, (path,))
+        finally:
+            os.remove(path)
+        return len(data)
+
+    async def _report(self, stats: LoadStats):
+        while True:
+            await asyncio.sleep(self.report_every)
+            print(stats)
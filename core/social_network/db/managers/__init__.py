@@ -5,5 +5,6 @@ from .hobbies import HobbiesManager
 from .users import UserManager
 from .users_hobbies import UsersHobbyManager
 from .shards import ShardsManager
+from .resharding import ReshardingProgressManager
 from .db_infos import DatabaseInfoManager
 from .news import NewsManager
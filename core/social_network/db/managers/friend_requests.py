@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 
 from ..crud import CRUDManager
 
@@ -34,9 +34,12 @@ class FriendRequestManager(CRUDManager):
             -> FriendRequest:
         return await self._create((from_user, to_user, base_status))
 
-    async def update(self, id: int, status: FriendRequestStatus) \
-            -> FriendRequest:
-        return await self._update(id, (status, id), UPDATE_FRIEND_REQUEST)
+    async def update(self, id: int, status: FriendRequestStatus,
+                     current: Optional[FriendRequest] = None,
+                     fetch=False) -> FriendRequest:
+        return await self._update(id, (status, id), UPDATE_FRIEND_REQUEST,
+                                  changes={'status': status},
+                                  current=current, fetch=fetch)
 
     async def list_for_user_exclude_status(self, user_id: int,
                                            status: FriendRequestStatus) \
@@ -1,7 +1,8 @@
 from datetime import datetime as dt
-from typing import Dict, Type, Optional, List
+from typing import Dict, Type, Optional, List, AsyncIterator
 
 from ..crud import CRUDManager
+from ..db import CHUNK_SIZE
 from ..models import (
     New,
     NewsType,
@@ -12,19 +13,11 @@ from ..models import (
     AddedFriendNewPayload
 )
 
-GET_USER_NEWS = '''
-    SELECT id, author_id, type, payload, created FROM news
-    WHERE author_id IN %s
-'''
-
 GET_NEWS = '''
     SELECT id, author_id, type, payload, created FROM news
 '''
-
-GET_NEWS_AFTER_TIMESTAMP = '''
-    SELECT id, author_id, type, payload, created FROM news
-    WHERE created > %s
-'''
+BY_AUTHORS = 'author_id IN %s'
+AFTER_TIMESTAMP = 'created > %s'
 
 
 class NewsManager(CRUDManager):
@@ -38,11 +31,16 @@ class NewsManager(CRUDManager):
     }
 
     async def create(self, id: str, author_id: int, news_type: NewsType,
-                     payload: Payload, created: str) -> New:
+                     payload: Payload, created: str, fetch=False) -> New:
         params = (id, author_id, news_type, payload.json(), created)
         query = self._make_create_query()
-        await self.execute(query, params, raise_if_empty=False)
-        return await self._get(id, read_only=False)
+        await self.execute(query, params, raise_if_empty=False, write=True)
+        await self._invalidate(id)
+        if fetch:
+            return await self._get(id, read_only=False)
+        return self._from_params(
+            (*params[:-1], dt.strptime(created, TIMESTAMP_FORMAT))
+        )
 
     async def create_from_model(self, new: New) -> New:
         return await self.create(
@@ -54,17 +52,26 @@ class NewsManager(CRUDManager):
         )
 
     async def list(self, author_ids: Optional[List[int]] = None,
-                   order_by='created', order='DESC', limit=None, offset=0):
-        params, query = tuple(), GET_NEWS
+                   order_by='created', order='DESC', limit=None, offset=0,
+                   cursor: Optional[str] = None):
+        params, where = tuple(), ()
         if author_ids is not None:
-            params, query = (tuple(author_ids),), GET_USER_NEWS
+            params, where = (tuple(author_ids),), (BY_AUTHORS,)
         limit = limit or self.conf.BASE_PAGE_LIMIT
-        return await self._list(params, query, order_by=order_by, order=order,
-                                limit=limit, offset=offset)
+        return await self._list(params, GET_NEWS, order_by=order_by,
+                                order=order, limit=limit, offset=offset,
+                                cursor=cursor, where=where)
 
     async def list_after_timestamp(self, timestamp: str, order_by='created',
                                    order='DESC', limit=None, offset=0):
-        params, query = (timestamp,), GET_NEWS_AFTER_TIMESTAMP
         limit = limit or self.conf.BASE_PAGE_LIMIT
-        return await self._list(params, query, order_by=order_by, order=order,
-                                limit=limit, offset=offset)
+        return await self._list((timestamp,), GET_NEWS, order_by=order_by,
+                                order=order, limit=limit, offset=offset,
+                                where=(AFTER_TIMESTAMP,))
+
+    def iter_after_timestamp(self, timestamp: str, order_by='created',
+                             order='DESC', chunk_size: int = CHUNK_SIZE) \
+            -> AsyncIterator[List[New]]:
+        return self._iter((timestamp,), GET_NEWS, order_by=order_by,
+                          order=order, chunk_size=chunk_size,
+                          where=(AFTER_TIMESTAMP,))
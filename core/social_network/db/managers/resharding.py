@@ -0,0 +1,48 @@
+from typing import Optional
+
+from ..crud import CRUDManager
+from ..exceptions import RowsNotFoundError
+from ..models import ReshardingProgress, ReshardingPhase
+
+GET_PROGRESS = '''
+    SELECT id, shard_id, source_shard_id, phase, last_key, processed
+    FROM resharding_progress
+    WHERE shard_id = %s AND source_shard_id = %s
+'''
+
+UPDATE_PROGRESS = '''
+    UPDATE resharding_progress
+    SET phase = %s, last_key = %s, processed = %s
+    WHERE id = %s
+'''
+
+
+class ReshardingProgressManager(CRUDManager):
+    model = ReshardingProgress
+
+    async def get(self, shard_id: int, source_shard_id: int) \
+            -> Optional[ReshardingProgress]:
+        try:
+            rows = await self.execute(GET_PROGRESS,
+                                      (shard_id, source_shard_id))
+        except RowsNotFoundError:
+            return None
+        return self.model.from_db(rows[0])
+
+    async def get_or_create(self, shard_id: int, source_shard_id: int) \
+            -> ReshardingProgress:
+        progress = await self.get(shard_id, source_shard_id)
+        if progress is None:
+            progress = await self._create((shard_id, source_shard_id,
+                                           ReshardingPhase.COPYING, '', 0))
+        return progress
+
+    async def update(self, progress: ReshardingProgress,
+                     phase: ReshardingPhase, last_key: str,
+                     processed: int) -> ReshardingProgress:
+        changes = {'phase': phase, 'last_key': last_key,
+                   'processed': processed}
+        return await self._update(progress.id,
+                                  (phase, last_key, processed, progress.id),
+                                  UPDATE_PROGRESS, changes=changes,
+                                  current=progress)
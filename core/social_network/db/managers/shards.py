@@ -1,7 +1,7 @@
-from typing import List
+from typing import Dict, List
 
 from ..crud import CRUDManager
-from ..models import Shard, DatabaseInfo, ShardState
+from ..models import Shard, DatabaseInfo, ShardState, ShardPlacement
 
 GET_SHARDS_WITH_DATABASE_INFO = '''
     SELECT 
@@ -14,35 +14,87 @@ GET_SHARDS_WITH_DATABASE_INFO = '''
        shards_info.id,
        shard_table,
        shard_key,
-       state
+       state,
+       weight
 FROM shards_info
          JOIN database_info ON db_info = database_info.id;
 
 '''
 
+GET_VERSION = 'SELECT version FROM shards_version WHERE id = 1;'
+
+BUMP_VERSION = 'UPDATE shards_version SET version = version + 1 WHERE id = 1;'
+
+UPDATE_SHARD_STATE = 'UPDATE shards_info SET state = %s WHERE id = %s;'
+
+GET_PLACEMENTS = 'SELECT shard_table, placement FROM shards_placement;'
+
+SET_PLACEMENT = '''
+    INSERT INTO shards_placement (shard_table, placement) VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE placement = VALUES(placement);
+'''
+
 CREATE_SHARD = '''
-    INSERT INTO shards_info (db_info, shard_table, shard_key, state)
-    VALUES (%s, %s, %s, %s);
+    INSERT INTO shards_info (db_info, shard_table, shard_key, state, weight)
+    VALUES (%s, %s, %s, %s, %s);
 '''
 
 
 class ShardsManager(CRUDManager):
     model = Shard
 
-    async def get_shards(self) -> List[Shard]:
+    async def get_shards(self, read_only=True) -> List[Shard]:
         rows = await self.execute(GET_SHARDS_WITH_DATABASE_INFO, [],
-                                  read_only=True, raise_if_empty=False)
+                                  read_only=read_only, raise_if_empty=False)
         return [self.parse_shard(row) for row in rows]
 
     def parse_shard(self, raw_shard: tuple) -> Shard:
         db_info = DatabaseInfo.from_db(raw_shard[0:6])
-        id, shard_table, shard_key, state = raw_shard[6:]
+        id, shard_table, shard_key, state, weight = raw_shard[6:]
         return Shard(id=id, db_info=db_info, shard_table=shard_table,
-                     shard_key=shard_key, state=state)
+                     shard_key=shard_key, state=state, weight=weight)
 
     async def create(self, db_info_id: int, shard_table: str, shard_key: str,
-                     state: ShardState = ShardState.ADDING) -> Shard:
-        params = (db_info_id, shard_table, shard_key, state)
-        id = await self.execute(CREATE_SHARD, params, last_row_id=True)
-        shards = await self.get_shards()
+                     state: ShardState = ShardState.ADDING,
+                     weight: int = 1) -> Shard:
+        params = (db_info_id, shard_table, shard_key, state, weight)
+        id = await self.execute(CREATE_SHARD, params, last_row_id=True,
+                                write=True)
+        await self.bump_version()
+        shards = await self.get_shards(read_only=False)
         return [shard for shard in shards if shard.id == id][0]
+
+    async def update_state(self, id: int, state: ShardState):
+        await self.execute(UPDATE_SHARD_STATE, (state, id),
+                           raise_if_empty=False, write=True)
+        await self.bump_version()
+
+    async def get_placements(self, read_only=True) \
+            -> Dict[str, ShardPlacement]:
+        """
+        Placements of tables which have one, others use the ring.
+        """
+        rows = await self.execute(GET_PLACEMENTS, read_only=read_only,
+                                  raise_if_empty=False)
+        return {table: ShardPlacement(placement) for table, placement in rows}
+
+    async def get_placement(self, shard_table: str) -> ShardPlacement:
+        placements = await self.get_placements(read_only=False)
+        return placements.get(shard_table, ShardPlacement.RING)
+
+    async def set_placement(self, shard_table: str,
+                            placement: ShardPlacement):
+        await self.execute(SET_PLACEMENT, (shard_table, placement),
+                           raise_if_empty=False, write=True)
+        await self.bump_version()
+
+    async def get_version(self) -> int:
+        """
+        Version of shards_info and shards_placement, bumped on every change
+        of shards.
+        """
+        rows = await self.execute(GET_VERSION)
+        return rows[0][0]
+
+    async def bump_version(self):
+        await self.execute(BUMP_VERSION, raise_if_empty=False, write=True)
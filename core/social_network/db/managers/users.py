@@ -1,8 +1,9 @@
-from typing import List, Optional
+from typing import List, Optional, AsyncIterator
 
 from social_network.settings import settings
 
 from ..crud import CRUDManager
+from ..db import CHUNK_SIZE
 from ..models import User
 
 GET_USERS = '''
@@ -53,7 +54,8 @@ class UserManager(CRUDManager):
                    order_by='last_name',
                    order='ASC',
                    limit=settings.BASE_PAGE_LIMIT,
-                   offset=0) -> List[User]:
+                   offset=0,
+                   cursor: Optional[str] = None) -> List[User]:
         params = [first_name.upper(), last_name.upper()]
         query = GET_USERS
         if friend_id:
@@ -65,9 +67,17 @@ class UserManager(CRUDManager):
         return await self._list(tuple(params),
                                 query=query,
                                 order_by=order_by, order=order,
-                                limit=limit, offset=offset)
+                                limit=limit, offset=offset,
+                                cursor=cursor)
 
     async def get_friends_ids(self, user_id: int) -> List[int]:
         rows = await self.execute(GET_FRIENDS_IDS, (user_id,), read_only=True,
                                   raise_if_empty=False)
         return [int(row[0]) for row in rows]
+
+    async def iter_friends_ids(self, user_id: int,
+                               chunk_size: int = CHUNK_SIZE) \
+            -> AsyncIterator[List[int]]:
+        async for rows in self.stream(GET_FRIENDS_IDS, (user_id,),
+                                      read_only=True, chunk_size=chunk_size):
+            yield [int(row[0]) for row in rows]
@@ -5,11 +5,16 @@ from itertools import groupby
 from ..crud import CRUDManager
 from ..models import Hobby, UserHobby
 
-DROP_USER_HOBBY = '''
-        DELETE FROM users_hobbies_mtm
+GET_USER_HOBBY_IDS = '''
+        SELECT id FROM users_hobbies_mtm
         WHERE user_id = %s AND hobby_id = %s;
     '''
 
+DELETE_USER_HOBBIES = '''
+        DELETE FROM users_hobbies_mtm
+        WHERE id IN %s;
+    '''
+
 GET_HOBBIES_FOR_USERS = '''
         SELECT user_id, h.id, h.name from users_hobbies_mtm
         JOIN hobbies h on h.id = users_hobbies_mtm.hobby_id
@@ -26,9 +31,17 @@ class UsersHobbyManager(CRUDManager):
         return await self._create((user_id, hobby_id))
 
     async def delete_by_id(self, user_id: int, hobby_id: int):
+        # Ids are selected first, so that their cached rows are invalidated
         params = (user_id, hobby_id)
-        return await self.execute(DROP_USER_HOBBY, params,
+        rows = await self.execute(GET_USER_HOBBY_IDS, params,
                                   raise_if_empty=False)
+        if not rows:
+            return
+        ids = [id for id, in rows]
+        await self.execute(DELETE_USER_HOBBIES, (ids,),
+                           raise_if_empty=False, write=True)
+        for id in ids:
+            await self._invalidate(id)
 
     async def get_hobby_for_users(self, user_ids: List[int]) \
             -> Dict[int, List[Hobby]]:
@@ -0,0 +1,95 @@
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+ACQUIRE_WAIT = Histogram(
+    'db_pool_acquire_wait_seconds',
+    'Time spent waiting for a free connection in the pool',
+    ['host']
+)
+# Query is the fingerprint of a normalized query template, the template
+# itself is served by the profiler's debug endpoint
+QUERY_DURATION = Histogram(
+    'db_query_duration_seconds',
+    'Time spent running queries, waiting for a connection excluded',
+    ['query']
+)
+QUERY_ROWS = Counter(
+    'db_query_rows_total',
+    'Rows returned or affected by queries',
+    ['query']
+)
+# Result is hit, miss or not_found (a cached miss)
+ENTITY_CACHE_REQUESTS = Counter(
+    'db_entity_cache_requests_total',
+    'Entities got by id through the cache',
+    ['table', 'result']
+)
+
+WRITE_BATCH_ROWS = Histogram(
+    'db_write_batch_rows',
+    'Rows inserted by a single statement of a write batcher',
+    ['host'],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+)
+
+
+class PoolCollector:
+    """
+    Exports pool state of every connector in the storage at scrape time.
+    """
+
+    def __init__(self, connectors_storage):
+        self.connectors_storage = connectors_storage
+
+    def collect(self):
+        size = GaugeMetricFamily('db_pool_size', 'Opened connections',
+                                 labels=['host'])
+        used = GaugeMetricFamily('db_pool_used', 'Connections in use',
+                                 labels=['host'])
+        waiting = GaugeMetricFamily('db_pool_waiting',
+                                    'Queries waiting for a free connection',
+                                    labels=['host'])
+        saturation = GaugeMetricFamily(
+            'db_pool_saturation',
+            'Connections in use relative to the pool maximum size',
+            labels=['host']
+        )
+        for connector in self.connectors_storage.connectors:
+            pool = connector.pool
+            if pool is None:
+                continue
+            name = connector.name
+            size.add_metric([name], pool.size)
+            used.add_metric([name], pool.size - pool.freesize)
+            waiting.add_metric([name], connector.waiting)
+            saturation.add_metric([name], connector.saturation)
+        yield from (size, used, waiting, saturation)
+
+
+class ReplicaCollector:
+    """
+    Exports health, replication lag and latency of slaves seen by the
+    replica router.
+    """
+
+    def __init__(self, router):
+        self.router = router
+
+    def collect(self):
+        healthy = GaugeMetricFamily('db_replica_healthy',
+                                    'Slave answered the last check',
+                                    labels=['host'])
+        lag = GaugeMetricFamily('db_replica_lag_seconds',
+                                'Replication lag behind the master',
+                                labels=['host'])
+        latency = GaugeMetricFamily('db_replica_latency_seconds',
+                                    'Moving average of query durations',
+                                    labels=['host'])
+        for replica in self.router.replicas:
+            name = replica.connector.name
+            healthy.add_metric([name], int(replica.healthy))
+            if replica.lag is not None:
+                lag.add_metric([name], replica.lag)
+            if replica.latency is not None:
+                latency.add_metric([name], replica.latency)
+        yield from (healthy, lag, latency)
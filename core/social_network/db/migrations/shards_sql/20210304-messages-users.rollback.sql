@@ -0,0 +1,5 @@
+ALTER TABLE messages
+    DROP INDEX first_user,
+    DROP INDEX second_user,
+    DROP COLUMN first_user_id,
+    DROP COLUMN second_user_id;
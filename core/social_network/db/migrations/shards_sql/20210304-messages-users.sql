@@ -0,0 +1,7 @@
+ALTER TABLE messages
+    ADD COLUMN first_user_id  int AS
+        (CAST(SUBSTRING_INDEX(chat_key, ':', 1) AS UNSIGNED)) VIRTUAL,
+    ADD COLUMN second_user_id int AS
+        (CAST(SUBSTRING_INDEX(chat_key, ':', -1) AS UNSIGNED)) VIRTUAL,
+    ADD INDEX first_user (first_user_id, chat_key, created),
+    ADD INDEX second_user (second_user_id, chat_key, created);
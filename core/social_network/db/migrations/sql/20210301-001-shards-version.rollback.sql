@@ -0,0 +1 @@
+DROP TABLE shards_version;
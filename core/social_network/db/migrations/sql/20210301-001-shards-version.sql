@@ -0,0 +1,8 @@
+CREATE TABLE shards_version
+(
+    id      int NOT NULL,
+    version int NOT NULL,
+    PRIMARY KEY (id)
+);
+
+INSERT INTO shards_version (id, version) VALUES (1, 0);
@@ -0,0 +1,2 @@
+ALTER TABLE shards_info
+    DROP COLUMN weight;
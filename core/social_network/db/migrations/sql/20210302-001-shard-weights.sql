@@ -0,0 +1,2 @@
+ALTER TABLE shards_info
+    ADD COLUMN weight int NOT NULL DEFAULT 1;
@@ -0,0 +1 @@
+DROP TABLE resharding_progress;
@@ -0,0 +1,14 @@
+CREATE TABLE resharding_progress
+(
+    id              int          NOT NULL AUTO_INCREMENT,
+    shard_id        int          NOT NULL,
+    source_shard_id int          NOT NULL,
+    phase           varchar(255) NOT NULL,
+    last_key        varchar(255) NOT NULL,
+    processed       int          NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY (shard_id) REFERENCES shards_info (id) ON DELETE CASCADE,
+    FOREIGN KEY (source_shard_id) REFERENCES shards_info (id)
+        ON DELETE CASCADE,
+    UNIQUE unique_source_per_shard (shard_id, source_shard_id)
+);
@@ -0,0 +1,9 @@
+CREATE TABLE shards_placement
+(
+    shard_table varchar(255) NOT NULL,
+    placement   varchar(255) NOT NULL,
+    PRIMARY KEY (shard_table)
+);
+
+INSERT INTO shards_placement (shard_table, placement)
+SELECT DISTINCT shard_table, 'MODULO' FROM shards_info;
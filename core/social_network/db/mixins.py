@@ -1,4 +1,11 @@
+from json import dumps, loads
+from datetime import datetime
+from binascii import Error as DecodeError
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from typing import Any, Optional, Sequence, Tuple
+
 from .base import M
+from .exceptions import InvalidCursorError
 
 
 class LimitMixin:
@@ -28,3 +35,82 @@ class OrderMixin:
     def add_order(self, query: str, field: str, order='ASC') -> str:
         self.validate_order(field, order)
         return '\n'.join((query, self.ORDER_QUERY.format(field, order)))
+
+
+def add_where(query: str, conditions: Sequence[str]) -> str:
+    """
+    Adds the WHERE clause of conditions to the query, which has none.
+    """
+    if not conditions:
+        return query
+    where = ' AND '.join(f'({condition})' for condition in conditions)
+    return '\n'.join((query, f'WHERE {where}'))
+
+
+def encode_cursor(value: Any, id: Any) -> str:
+    return urlsafe_b64encode(dumps([value, id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    try:
+        value, id = loads(urlsafe_b64decode(cursor.encode()))
+    except (DecodeError, UnicodeError, ValueError, TypeError):
+        raise InvalidCursorError(cursor)
+    return value, id
+
+
+class KeysetMixin(OrderMixin):
+    """
+    Pagination by the ordering field and id of the last row of the previous
+    page. Unlike OFFSET, the skipped rows aren't read at all: the condition
+    is a range over an index on the field, which includes id in InnoDB.
+    """
+    KEYSET_ORDER_QUERY = 'ORDER BY {0} {1}, {2} {1}'
+
+    def get_cursor(self, model: M, order_by: str) -> str:
+        return encode_cursor(getattr(model, order_by), model.id)
+
+    def add_keyset(self,
+                   query: str,
+                   params: Tuple[Any, ...],
+                   order_by: str,
+                   order='ASC',
+                   cursor: Optional[str] = None,
+                   where: Sequence[str] = ()) \
+            -> Tuple[str, Tuple[Any, ...]]:
+        """
+        Filters of the query are passed as where conditions rather than
+        written in it, so that the page condition joins them in one WHERE.
+        """
+        self.validate_order(order_by, order)
+        table_name = self.model._table_name
+        field, id_field = f'{table_name}.{order_by}', f'{table_name}.id'
+        if cursor is not None:
+            value, id = decode_cursor(cursor)
+            if value is not None and order_by in self.model._datetime_fields:
+                value = datetime.fromtimestamp(value)
+            condition, cursor_params = self._make_keyset_condition(
+                field, id_field, order, value, id,
+                self.model.__fields__[order_by].allow_none
+            )
+            where = (*where, condition)
+            params = (*params, *cursor_params)
+        query = add_where(query, where)
+        order_query = self.KEYSET_ORDER_QUERY.format(field, order, id_field)
+        return '\n'.join((query, order_query)), params
+
+    @staticmethod
+    def _make_keyset_condition(field: str, id_field: str, order: str,
+                               value: Any, id: Any, nullable: bool) \
+            -> Tuple[str, Tuple[Any, ...]]:
+        # MySQL puts NULLs first in ascending order and last in descending
+        op = '>' if order == 'ASC' else '<'
+        if value is None:
+            condition = f'{field} IS NULL AND {id_field} {op} %s'
+            if order == 'ASC':
+                condition = f'{condition} OR {field} IS NOT NULL'
+            return condition, (id,)
+        condition = f'({field}, {id_field}) {op} (%s, %s)'
+        if nullable and order == 'DESC':
+            condition = f'{condition} OR {field} IS NULL'
+        return condition, (value, id)
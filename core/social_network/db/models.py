@@ -125,12 +125,45 @@ class ShardState(str, Enum):
 
 class Shard(BaseModel):
     _table_name = 'shards_info'
-    _fields = ('id', 'db_info', 'shard_table', 'shard_key', 'state')
+    _fields = ('id', 'db_info', 'shard_table', 'shard_key', 'state',
+               'weight')
 
     db_info: DatabaseInfo
     shard_table: str
     shard_key: int
     state: ShardState
+    # Share of keys relative to other shards of the table
+    weight: int = 1
+
+
+class ShardPlacement(str, Enum):
+    # Keys of the table are placed by crc32 modulo the number of shards
+    MODULO = 'MODULO'
+    # Keys are read by modulo and written to their ring shards too
+    MOVING = 'MOVING'
+    RING = 'RING'
+
+
+class ReshardingPhase(str, Enum):
+    COPYING = 'COPYING'
+    VERIFYING = 'VERIFYING'
+    VERIFIED = 'VERIFIED'
+    CLEANING = 'CLEANING'
+    DONE = 'DONE'
+
+
+class ReshardingProgress(BaseModel):
+    _table_name = 'resharding_progress'
+    _fields = ('id', 'shard_id', 'source_shard_id', 'phase', 'last_key',
+               'processed')
+
+    # Shard being added and a READY shard its keys are moved from
+    shard_id: int
+    source_shard_id: int
+    phase: ReshardingPhase
+    # Last sharding key processed in the phase
+    last_key: str
+    processed: int
 
 
 class NewsType(str, Enum):
@@ -0,0 +1,165 @@
+import re
+import asyncio
+import logging
+from zlib import crc32
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Any, Dict, List, Set
+
+from social_network.settings import QueryProfilerSettings
+
+from .db import QueryEvent, QueryHook
+from .metrics import QUERY_DURATION, QUERY_ROWS
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of latency buckets in seconds, as in prometheus
+BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10,
+           float('inf'))
+
+STRING = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER = re.compile(r'%s')
+# Lists of placeholders and repeated ones of them, e.g. rows of a multi-row
+# INSERT or values of IN, whose lengths vary by call
+LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+LISTS = re.compile(r'\(\?\)(?:\s*,\s*\(\?\))+')
+WHITESPACE = re.compile(r'\s+')
+EXPLAIN = 'EXPLAIN '
+
+
+@lru_cache(maxsize=1024)
+def normalize(query: str) -> str:
+    """
+    Replaces literals and placeholders with ? and lists of them with (?),
+    so that queries differing only by e.g. LIMIT or the number of rows
+    inserted share a template.
+    """
+    query = STRING.sub('?', query)
+    query = NUMBER.sub('?', query)
+    query = PLACEHOLDER.sub('?', query)
+    query = LIST.sub('(?)', query)
+    query = LISTS.sub('(?)', query)
+    return WHITESPACE.sub(' ', query).strip()
+
+
+class TemplateStats:
+
+    def __init__(self, template: str):
+        self.template = template
+        self.fingerprint = f'{crc32(template.encode()):08x}'
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.
+        self.max_time = 0.
+        self.total_wait = 0.
+        self.rows = 0
+        self.buckets = [0] * len(BUCKETS)
+
+    def observe(self, event: QueryEvent):
+        self.calls += 1
+        self.total_time += event.duration
+        self.max_time = max(self.max_time, event.duration)
+        self.total_wait += event.wait
+        self.buckets[bisect_left(BUCKETS, event.duration)] += 1
+        if event.rows is None:
+            self.errors += 1
+        else:
+            self.rows += event.rows
+
+    def percentile(self, share: float) -> float:
+        """
+        Upper bound of the bucket the percentile falls into.
+        """
+        rank, count = share * self.calls, 0
+        for bound, bucket in zip(BUCKETS, self.buckets):
+            count += bucket
+            if count >= rank:
+                return bound
+        return BUCKETS[-1]
+
+    def dict(self) -> Dict[str, Any]:
+        return {
+            'fingerprint': self.fingerprint,
+            'template': self.template,
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_time': self.total_time,
+            'mean_time': self.total_time / self.calls,
+            'max_time': self.max_time,
+            'p50': self.percentile(.5),
+            'p95': self.percentile(.95),
+            'p99': self.percentile(.99),
+            'mean_wait': self.total_wait / self.calls,
+            'rows': self.rows,
+            'mean_rows': self.rows / self.calls,
+            'histogram': {
+                str(bound): bucket
+                for bound, bucket in zip(BUCKETS, self.buckets) if bucket
+            }
+        }
+
+
+class QueryProfiler(QueryHook):
+    """
+    Aggregates queries by normalized template and logs the slow ones with
+    their params and, optionally, the plan of the query.
+    """
+    sort_keys = ('total_time', 'mean_time', 'max_time', 'calls', 'rows',
+                 'mean_wait')
+
+    def __init__(self, conf: QueryProfilerSettings):
+        self.conf = conf
+        self.stats: Dict[str, TemplateStats] = {}
+        # Templates being explained, one EXPLAIN at a time for each
+        self._explaining: Set[str] = set()
+
+    def on_query(self, event: QueryEvent):
+        if event.query.startswith(EXPLAIN):
+            return  # Made by the profiler itself
+        template = normalize(event.query)
+        stats = self.stats.get(template)
+        if stats is None:
+            stats = self.stats[template] = TemplateStats(template)
+        stats.observe(event)
+        QUERY_DURATION.labels(stats.fingerprint).observe(event.duration)
+        if event.rows:
+            QUERY_ROWS.labels(stats.fingerprint).inc(event.rows)
+
+        if event.duration >= self.conf.SLOW_QUERY_TIME:
+            logger.warning('Slow query %s on %s took %.3fs (waited %.3fs), '
+                           'rows: %s, params: %r\n%s', stats.fingerprint,
+                           event.connector.name, event.duration, event.wait,
+                           event.rows, event.params, event.query)
+            if self.conf.EXPLAIN_SLOW_QUERIES and self.is_explainable(event) \
+                    and template not in self._explaining:
+                self._explaining.add(template)
+                asyncio.ensure_future(self.explain(stats, event))
+
+    @staticmethod
+    def is_explainable(event: QueryEvent) -> bool:
+        return event.query.lstrip().upper().startswith('SELECT')
+
+    async def explain(self, stats: TemplateStats, event: QueryEvent):
+        try:
+            rows = await event.connector.make_query(
+                EXPLAIN + event.query, event.params, raise_if_empty=False
+            )
+            plan = '\n'.join(
+                ' | '.join(str(column) for column in row) for row in rows
+            )
+            logger.warning('Plan of slow query %s:\n%s', stats.fingerprint,
+                           plan)
+        except Exception:
+            logger.exception('Failed to explain slow query %s',
+                             stats.fingerprint)
+        finally:
+            self._explaining.discard(stats.template)
+
+    def top(self, limit: int = 20, sort_by: str = 'total_time') \
+            -> List[Dict[str, Any]]:
+        if sort_by not in self.sort_keys:
+            raise ValueError(f'Invalid sort key: {sort_by}')
+        stats = [s.dict() for s in self.stats.values()]
+        stats.sort(key=lambda s: s[sort_by], reverse=True)
+        return stats[:limit]
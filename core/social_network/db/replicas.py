@@ -0,0 +1,182 @@
+import random
+import asyncio
+from time import monotonic
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+import aiomysql
+
+from social_network.settings import (
+    DatabaseSettings,
+    MasterSlaveDatabaseSettings
+)
+
+from .db import BaseDatabaseConnector
+from .connectors_storage import BaseConnectorsStorage
+
+SLAVE_STATUS = 'SHOW SLAVE STATUS'
+HEARTBEAT_LAG = '''
+    SELECT TIMESTAMPDIFF(MICROSECOND, MAX(ts), UTC_TIMESTAMP(6)) / 1000000
+    FROM {table}
+'''
+# Lower bound of latency used for weights, a replica answering in no time
+# shouldn't get all of the reads
+MIN_LATENCY = .001
+
+# User of the current request, set by the web layer
+current_user_id: ContextVar[Optional[int]] = ContextVar('current_user_id',
+                                                        default=None)
+# Reads of the current task go to the master until this moment
+master_until: ContextVar[float] = ContextVar('master_until', default=0)
+
+
+class Replica:
+
+    def __init__(self, conf: DatabaseSettings,
+                 connector: BaseDatabaseConnector):
+        self.conf = conf
+        self.connector = connector
+        self.healthy = False
+        # Seconds behind the master, None if replication is stopped
+        self.lag: Optional[float] = None
+        # Moving average of query durations
+        self.latency: Optional[float] = None
+        self.check_task: Optional[asyncio.Task] = None
+
+    def is_available(self, max_lag: float) -> bool:
+        return self.healthy and self.lag is not None and self.lag <= max_lag
+
+    def observe(self, duration: float, decay: float):
+        if self.latency is None:
+            self.latency = duration
+        else:
+            self.latency += decay * (duration - self.latency)
+
+
+class ReplicaRouter:
+    """
+    Chooses slaves for reads. Slaves are checked periodically, the ones
+    which are down, stopped replicating or lag behind the master more than
+    MAX_LAG get no reads, the rest get reads in inverse proportion to their
+    latency. Reads go to the master for a while after a write of the same
+    user or task, so that they see what was written.
+    """
+
+    def __init__(self, connectors_storage: BaseConnectorsStorage,
+                 conf: MasterSlaveDatabaseSettings):
+        self.connectors_storage = connectors_storage
+        self.slave_confs = conf.SLAVES
+        self.conf = conf.ROUTING
+        self.replicas: List[Replica] = []
+        self._by_connector: Dict[int, Replica] = {}
+        # User id -> moment until which the user reads from the master
+        self.pinned: Dict[int, float] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        for conf in self.slave_confs:
+            connector = await self.connectors_storage.get_connector(conf)
+            replica = Replica(conf, connector)
+            self.replicas.append(replica)
+            self._by_connector[id(connector)] = replica
+        if self.replicas:
+            await self.check()
+            self.task = asyncio.create_task(self.run())
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.conf.CHECK_INTERVAL)
+            self.unpin_expired()
+            await self.check()
+
+    async def check(self):
+        await asyncio.gather(*[
+            self.check_replica(replica) for replica in self.replicas
+        ])
+
+    async def check_replica(self, replica: Replica):
+        # A hanging check is not cancelled so as not to break its connection,
+        # the replica is unhealthy until it finishes
+        if replica.check_task is None or replica.check_task.done():
+            replica.check_task = asyncio.ensure_future(
+                self.get_lag(replica.connector)
+            )
+        task = replica.check_task
+        started = monotonic()
+        await asyncio.wait((task,), timeout=self.conf.CHECK_TIMEOUT)
+        if not task.done() or task.exception() is not None:
+            replica.healthy = False
+            replica.lag = None
+            return
+        replica.healthy = True
+        replica.lag = task.result()
+        replica.observe(monotonic() - started, self.conf.LATENCY_DECAY)
+
+    async def get_lag(self, connector: BaseDatabaseConnector) \
+            -> Optional[float]:
+        table = self.conf.HEARTBEAT_TABLE
+        async with connector.acquire() as conn:
+            if table:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(HEARTBEAT_LAG.format(table=table))
+                    lag, = await cursor.fetchone()
+                    return None if lag is None else max(float(lag), 0)
+
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(SLAVE_STATUS)
+                status = await cursor.fetchone()
+        if status is None or status['Slave_IO_Running'] != 'Yes' or \
+                status['Slave_SQL_Running'] != 'Yes':
+            return None
+        return status['Seconds_Behind_Master']
+
+    def choose(self) -> Optional[BaseDatabaseConnector]:
+        """
+        Returns a connector of a slave for a read, None if it has to be
+        done on the master.
+        """
+        if self.is_pinned():
+            return None
+        replicas = [
+            replica for replica in self.replicas
+            if replica.is_available(self.conf.MAX_LAG)
+        ]
+        if not replicas:
+            return None
+        if len(replicas) == 1:
+            return replicas[0].connector
+        weights = [
+            1 / max(replica.latency or MIN_LATENCY, MIN_LATENCY)
+            for replica in replicas
+        ]
+        return random.choices(replicas, weights)[0].connector
+
+    def observe(self, connector: BaseDatabaseConnector, duration: float):
+        replica = self._by_connector.get(id(connector))
+        if replica is not None:
+            replica.observe(duration, self.conf.LATENCY_DECAY)
+
+    def record_write(self):
+        until = monotonic() + self.conf.READ_YOUR_WRITES_WINDOW
+        master_until.set(until)
+        user_id = current_user_id.get()
+        if user_id is not None:
+            self.pinned[user_id] = until
+
+    def is_pinned(self) -> bool:
+        now = monotonic()
+        if master_until.get() > now:
+            return True
+        user_id = current_user_id.get()
+        return user_id is not None and self.pinned.get(user_id, 0) > now
+
+    def unpin_expired(self):
+        now = monotonic()
+        self.pinned = {
+            user_id: until for user_id, until in self.pinned.items()
+            if until > now
+        }
@@ -1,5 +1,15 @@
-from zlib import crc32
-from typing import TypeVar, List, Optional, Iterable, Any
+import logging
+from operator import itemgetter
+from typing import (
+    TypeVar,
+    List,
+    Optional,
+    Iterable,
+    Any,
+    Awaitable,
+    Callable,
+    Sequence
+)
 
 from aiomysql import DatabaseError as RawDatabaseError
 
@@ -8,14 +18,20 @@ from social_network.settings import Settings, settings
 from ..db import BaseDatabaseConnector, DatabaseResponse
 from ..exceptions import DatabaseError
 from ..base import BaseManager, BaseModel
-from ..managers import ShardsManager
 from ..connectors_storage import BaseConnectorsStorage
-from ..models import ShardState, Shard
+from ..models import Shard
+from .shard_map import ShardMap
+from .gather import ShardsMerge, Row
+
+logger = logging.getLogger(__name__)
 
 S = TypeVar('S', bound='BaseShardingModel', covariant=True)
 
 
 class BaseShardingModel(BaseModel):
+    # Column of the sharding key
+    _sharding_field: str = 'id'
+
     id: str
 
     def get_sharding_key(self) -> str:
@@ -28,7 +44,9 @@ class BaseShardingManager(BaseManager):
     def __init__(self, connector_storage: BaseConnectorsStorage,
                  conf: Settings = settings):
         super(BaseShardingManager, self).__init__(connector_storage, conf)
-        self.shards_manager = ShardsManager(connector_storage, conf=conf)
+        # Scripts without a shared map load shards on first use
+        self.shard_map = connector_storage.shard_map or \
+            ShardMap(connector_storage, conf)
 
     async def execute(self,
                       query: str,
@@ -39,35 +57,89 @@ class BaseShardingManager(BaseManager):
                       raise_if_empty=True,
                       execute_many=False) -> DatabaseResponse:
         conn = await self.get_shard_connector(key)
+        return await self._make_query(conn, query, params,
+                                      last_row_id=last_row_id,
+                                      raise_if_empty=raise_if_empty,
+                                      execute_many=execute_many)
+
+    async def execute_write(self,
+                            query: str,
+                            key: str,
+                            params: Optional[Iterable[Any]] = None) \
+            -> DatabaseResponse:
+        """
+        Writes to the shard of the key and, while the key is being moved
+        to an ADDING shard, to that shard too. A failed write to the latter
+        is only logged, resharding repairs the key when verifying it.
+        """
+        return await self._write(key, lambda conn: self._make_query(
+            conn, query, params, raise_if_empty=False
+        ))
+
+    async def insert(self, query: str, key: str, params: Sequence[Any]):
+        """
+        Inserts a row of all fields of the model like execute_write. With
+        WRITE_BATCHING enabled, the row is inserted with the rows of other
+        inserts to the shard instead and the query isn't used.
+        """
+        if not self.conf.WRITE_BATCHING.ENABLED:
+            await self.execute_write(query, key, params)
+            return
+        await self._write(key, lambda conn: self.shard_map.get_batcher(
+            conn, self.model
+        ).insert(params))
+
+    async def _write(self, key: str,
+                     write: Callable[[BaseDatabaseConnector], Awaitable[Any]]):
+        shards = await self.shard_map.get(self.model._table_name)
+        conn, *next_conns = shards.get_write_connectors(key)
+        result = await write(conn)
+        for next_conn in next_conns:
+            try:
+                await write(next_conn)
+            except DatabaseError:
+                logger.warning('Failed to write %s to the shard it moves to',
+                               key, exc_info=True)
+        return result
+
+    async def gather_sorted(self,
+                            query: str,
+                            params: Optional[Sequence[Any]] = None,
+                            key: Callable[[Row], Any] = itemgetter(0),
+                            reverse=False,
+                            sharding_key: Callable[[Row], str] = None) \
+            -> ShardsMerge:
+        """
+        Runs the query on every READY shard at once, rows are merged by
+        the key as they are read. Each shard has to order its rows by the
+        same key. Shards which don't answer within SCATTER_TIMEOUT are left
+        out of the rows and listed in failed of the result. Rows with a
+        sharding key are only taken from its shard, so that rows of keys
+        being moved aren't returned twice.
+        """
+        shards = await self.shard_map.get(self.model._table_name)
+        placement = None
+        if sharding_key is not None:
+            def placement(row: Row) -> BaseDatabaseConnector:
+                return shards.get_connector(sharding_key(row))
+        return ShardsMerge(list(zip(shards.shards, shards.connectors)),
+                           query, params, key, reverse,
+                           timeout=self.conf.SHARD_MAP.SCATTER_TIMEOUT,
+                           placement=placement)
+
+    @staticmethod
+    async def _make_query(conn: BaseDatabaseConnector, query: str,
+                          params: Optional[Iterable[Any]] = None,
+                          **kwargs) -> DatabaseResponse:
         try:
-            return await conn.make_query(query, params,
-                                         last_row_id=last_row_id,
-                                         raise_if_empty=raise_if_empty,
-                                         execute_many=execute_many)
+            return await conn.make_query(query, params, **kwargs)
         except RawDatabaseError as e:
             raise DatabaseError(e.args) from e
 
     async def get_shard_connector(self, key: str) -> BaseDatabaseConnector:
-        shard_infos = await self.get_shard_infos()
-        calculated_hash = self.calculate_hash(key, len(shard_infos))
-        shard_info = [
-            info for info in shard_infos if
-            info.shard_key == calculated_hash
-        ][0]
-        conf = shard_info.db_info.as_settings()
-        return await self.connector_storage.get_connector(conf)
+        shards = await self.shard_map.get(self.model._table_name)
+        return shards.get_connector(key)
 
     async def get_shard_infos(self) -> List[Shard]:
-        shard_infos = await self.shards_manager.get_shards()
-        filtered_shards = [
-            shard_info for shard_info in shard_infos if
-            shard_info.shard_table == self.model._table_name and
-            shard_info.state == ShardState.READY
-        ]
-        if not filtered_shards:
-            raise DatabaseError(f'Not shards for table {self.model._table}')
-        return filtered_shards
-
-    @staticmethod
-    def calculate_hash(key: str, max_hash: int) -> int:
-        return crc32(key.encode()) % max_hash
+        shards = await self.shard_map.get(self.model._table_name)
+        return shards.shards
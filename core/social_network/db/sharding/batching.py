@@ -0,0 +1,104 @@
+import asyncio
+from typing import Any, List, Optional, Set, Tuple, Type
+
+from aiomysql import DatabaseError as RawDatabaseError
+
+from social_network.settings import WriteBatchingSettings
+
+from ..base import BaseModel
+from ..db import BaseDatabaseConnector
+from ..exceptions import DatabaseError
+from ..metrics import WRITE_BATCH_ROWS
+
+INSERT = 'INSERT INTO {table_name} ({fields}) VALUES '
+
+Row = Tuple[Any, ...]
+
+
+class WriteBatcher:
+    """
+    Collects rows inserted into a table on a shard for up to MAX_DELAY
+    seconds or MAX_ROWS rows and inserts them with one multi-row INSERT,
+    so that the shard commits and syncs its log once for all of them.
+    Inserts return when the batch is committed. If the batch fails, it's
+    split in halves until bad rows are found, so that a bad row fails only
+    its insert, with at most MAX_RETRIES more inserts.
+    """
+
+    def __init__(self, connector: BaseDatabaseConnector,
+                 model: Type[BaseModel], conf: WriteBatchingSettings):
+        self.connector = connector
+        self.conf = conf
+        self.prefix = INSERT.format(table_name=model._table_name,
+                                    fields=', '.join(model._fields))
+        self.values = f'({", ".join(["%s"] * len(model._fields))})'
+        self.pending: List[Tuple[Row, asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.flushes: Set[asyncio.Task] = set()
+
+    async def insert(self, row: Row):
+        future = asyncio.get_event_loop().create_future()
+        self.pending.append((row, future))
+        if len(self.pending) >= self.conf.MAX_ROWS:
+            self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_event_loop().call_later(
+                self.conf.MAX_DELAY, self.flush
+            )
+        await future
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        task = asyncio.ensure_future(self._flush(batch))
+        self.flushes.add(task)
+        task.add_done_callback(self.flushes.discard)
+
+    async def close(self):
+        self.flush()
+        if self.flushes:
+            await asyncio.wait(self.flushes)
+
+    async def _flush(self, batch: List[Tuple[Row, asyncio.Future]]):
+        WRITE_BATCH_ROWS.labels(self.connector.name).observe(len(batch))
+        batches, retries = [batch], self.conf.MAX_RETRIES
+        while batches:
+            batch = batches.pop()
+            try:
+                await self._insert([row for row, _ in batch])
+            except RawDatabaseError as e:
+                if len(batch) == 1 or retries < 2:
+                    self._resolve_all(batch, DatabaseError(e.args))
+                    continue
+                # Halves are inserted first to last
+                half = len(batch) // 2
+                batches.extend((batch[half:], batch[:half]))
+                retries -= 2
+            except Exception as e:
+                self._resolve_all(batch, e)
+            else:
+                self._resolve_all(batch)
+
+    async def _insert(self, rows: List[Row]):
+        query = self.prefix + ', '.join([self.values] * len(rows))
+        params = [value for row in rows for value in row]
+        await self.connector.make_query(query, params, raise_if_empty=False)
+
+    def _resolve_all(self, batch: List[Tuple[Row, asyncio.Future]],
+                     error: Optional[Exception] = None):
+        for _, future in batch:
+            self._resolve(future, error)
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, error: Optional[Exception] = None):
+        # Rows of cancelled inserts are still written
+        if future.done():
+            return
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(error)
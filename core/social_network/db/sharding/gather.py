@@ -0,0 +1,196 @@
+import heapq
+import asyncio
+import logging
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    List,
+    Optional,
+    Sequence,
+    Tuple
+)
+
+from ..db import BaseDatabaseConnector, CHUNK_SIZE, Rows
+from ..models import Shard
+
+logger = logging.getLogger(__name__)
+
+Row = Tuple[Any, ...]
+# Marks the end of the rows of a shard in its queue
+END = object()
+# Chunks read ahead from every shard
+PREFETCH = 2
+
+
+class Descending:
+    """
+    Sort key which compares in reverse, so that a min-heap pops the largest.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __eq__(self, other: 'Descending') -> bool:
+        return self.value == other.value
+
+    def __lt__(self, other: 'Descending') -> bool:
+        return other.value < self.value
+
+
+class ShardReader:
+    """
+    Streams the rows of a query on a shard into a queue in a task, so that
+    all shards are read at once while rows are merged.
+    """
+
+    def __init__(self, shard: Shard, conn: BaseDatabaseConnector,
+                 query: str, params: Optional[Sequence[Any]],
+                 chunk_size: int):
+        self.shard = shard
+        self.conn = conn
+        self.queue = asyncio.Queue(maxsize=PREFETCH)
+        self.closed = False
+        self.rows: List[Row] = []
+        self.task = asyncio.ensure_future(
+            self.read(conn, query, params, chunk_size)
+        )
+
+    async def read(self, conn: BaseDatabaseConnector, query: str,
+                   params: Optional[Sequence[Any]], chunk_size: int):
+        chunks = conn.stream_query(query, params, chunk_size)
+        result: Any = END
+        try:
+            async for chunk in chunks:
+                if self.closed:
+                    break
+                await self.queue.put(chunk)
+        except Exception as e:
+            result = e
+        finally:
+            # Reads the rest of the result, so that the connection goes
+            # back to the pool usable
+            await chunks.aclose()
+        if not self.closed:
+            await self.queue.put(result)
+
+    async def next_chunk(self, timeout: float) -> Optional[Rows]:
+        """
+        Returns the next chunk, None after the last one.
+        """
+        chunk = await asyncio.wait_for(self.queue.get(), timeout)
+        if chunk is END:
+            return None
+        if isinstance(chunk, Exception):
+            raise chunk
+        return chunk
+
+    def close(self):
+        """
+        Stops reading without cancelling the query, which would break the
+        connection. A reader waiting for room in the queue is released.
+        """
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+
+class ShardsMerge:
+    """
+    Rows of a query run on every shard, merged by a sort key as they are
+    read. Every shard is expected to return its rows ordered by the same
+    key. Shards which fail or don't return their next rows in time are
+    left out and listed in failed, the rest of the rows are still merged.
+    With placement, rows read from shards other than the one placement
+    gives for them are skipped: copies of keys being moved between shards.
+    """
+
+    def __init__(self, shards: Sequence[Tuple[Shard, BaseDatabaseConnector]],
+                 query: str, params: Optional[Sequence[Any]],
+                 key: Callable[[Row], Any], reverse=False,
+                 timeout: float = 2, chunk_size: int = CHUNK_SIZE,
+                 placement: Callable[[Row], BaseDatabaseConnector] = None):
+        self.shards = shards
+        self.query = query
+        self.params = params
+        self.key = key
+        self.reverse = reverse
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.placement = placement
+        self.failed: List[Shard] = []
+
+    @property
+    def is_partial(self) -> bool:
+        return bool(self.failed)
+
+    async def __aiter__(self) -> AsyncIterator[Row]:
+        readers = [
+            ShardReader(shard, conn, self.query, self.params, self.chunk_size)
+            for shard, conn in self.shards
+        ]
+        try:
+            heap = []
+            firsts = await asyncio.gather(*[
+                self._next_row(reader) for reader in readers
+            ])
+            for i, row in enumerate(firsts):
+                if row is not None:
+                    heap.append((self._sort_key(row), i, row))
+            heapq.heapify(heap)
+
+            while heap:
+                _, i, row = heap[0]
+                yield row
+                row = await self._next_row(readers[i])
+                if row is None:
+                    heapq.heappop(heap)
+                else:
+                    heapq.heapreplace(heap, (self._sort_key(row), i, row))
+        finally:
+            for reader in readers:
+                reader.close()
+
+    async def take(self, limit: Optional[int] = None) -> List[Row]:
+        """
+        Returns up to limit first rows, the rest are not read.
+        """
+        rows, iterator = [], self.__aiter__()
+        try:
+            async for row in iterator:
+                rows.append(row)
+                if limit is not None and len(rows) >= limit:
+                    break
+        finally:
+            await iterator.aclose()
+        return rows
+
+    def _sort_key(self, row: Row) -> Any:
+        key = self.key(row)
+        return Descending(key) if self.reverse else key
+
+    async def _next_row(self, reader: ShardReader) -> Optional[Row]:
+        """
+        Returns the next row of the shard, None when it has no more rows or
+        has failed.
+        """
+        while not reader.closed:
+            if not reader.rows:
+                try:
+                    chunk = await reader.next_chunk(self.timeout)
+                except Exception as e:
+                    logger.warning('Shard %s failed in a query to all '
+                                   'shards: %r', reader.shard.id, e)
+                    self.failed.append(reader.shard)
+                    reader.close()
+                    return None
+                if chunk is None:
+                    reader.close()
+                    return None
+                # Popped from the end
+                reader.rows = list(reversed(chunk))
+            row = reader.rows.pop()
+            if self.placement is None or self.placement(row) is reader.conn:
+                return row
+        return None
@@ -1,17 +1,18 @@
 from uuid import uuid4
-from typing import List
+from operator import itemgetter
+from typing import List, Optional, Tuple
 from datetime import datetime
 
 from social_network.settings import settings
 
-from ..models import Message
+from ..models import Message, Chat
 from ..base import BaseShardingManager
-from ...mixins import LimitMixin
-from ...models import TIMESTAMP_FORMAT
+from ...mixins import LimitMixin, KeysetMixin
+from ...models import TIMESTAMP_FORMAT, Shard
 
 CREATE_MESSAGE = '''
-    INSERT INTO messages (id, chat_key, author_id, text)
-     VALUES (%s, %s, %s, %s);
+    INSERT INTO messages (id, chat_key, author_id, text, created)
+     VALUES (%s, %s, %s, %s, %s);
 '''
 
 GET_MESSAGE = '''
@@ -21,33 +22,81 @@ GET_MESSAGE = '''
 
 GET_MESSAGES = '''
     SELECT id, chat_key, author_id, text, created FROM messages
-    WHERE chat_key = %s AND created > %s
-    ORDER BY created DESC 
 '''
+IN_CHAT_AFTER = ('chat_key = %s', 'created > %s')
 
 
-class MessagesManager(BaseShardingManager, LimitMixin):
+GET_RECENT_CHATS = '''
+    SELECT chat_key, MAX(created) AS last_created, COUNT(*) FROM messages
+    WHERE first_user_id = %s GROUP BY chat_key
+    UNION ALL
+    SELECT chat_key, MAX(created), COUNT(*) FROM messages
+    WHERE second_user_id = %s AND first_user_id != %s GROUP BY chat_key
+    ORDER BY last_created DESC
+    LIMIT %s
+'''
+
+
+class MessagesManager(BaseShardingManager, LimitMixin, KeysetMixin):
     model = Message
 
     async def _get(self, id: str, key: str) -> Message:
         rows = await self.execute(GET_MESSAGE, key, (id,))
         return self.model.from_db(rows[0])
 
-    async def create(self, chat_key: str, author_id: int, text: str) -> Message:
+    async def create(self, chat_key: str, author_id: int, text: str,
+                     fetch=False) -> Message:
+        """
+        Creation time is set here rather than defaulted by the server, so
+        that the message is returned without reading it back unless fetch.
+        """
         id = str(uuid4())
-        params = (id, chat_key, author_id, text)
-        await self.execute(CREATE_MESSAGE, chat_key, params, last_row_id=True)
-        return await self._get(id, chat_key)
+        # Column precision is a second
+        created = datetime.now().replace(microsecond=0)
+        params = (id, chat_key, author_id, text, created)
+        await self.insert(CREATE_MESSAGE, chat_key, params)
+        if fetch:
+            return await self._get(id, chat_key)
+        return self.model.from_db(params)
 
     async def list(self,
                    chat_key: str,
                    after_timestamp: float = 0,
                    limit: int = settings.BASE_PAGE_LIMIT,
-                   offset: int = 0) -> List[Message]:
-        query = self.add_limit(GET_MESSAGES, limit, offset)
+                   offset: int = 0,
+                   cursor: Optional[str] = None) -> List[Message]:
         after_timestamp = datetime.fromtimestamp(after_timestamp) \
             .strftime(TIMESTAMP_FORMAT)
-        params = (chat_key, after_timestamp)
+        query, params = self.add_keyset(GET_MESSAGES,
+                                        (chat_key, after_timestamp),
+                                        'created', 'DESC', cursor,
+                                        IN_CHAT_AFTER)
+        query = self.add_limit(query, limit, offset)
         rows = await self.execute(query, chat_key, params, read_only=True,
                                   raise_if_empty=False)
-        return [self.model.from_db(row) for row in rows]
+        return self.model.from_db_many(rows)
+
+    async def recent_chats(self, user_id: int,
+                           limit: int = settings.BASE_PAGE_LIMIT) \
+            -> Tuple[List[Chat], List[Shard]]:
+        """
+        Chats of the user from all shards, the latest first, with the shards
+        which failed to answer, whose chats are missing.
+        """
+        merge = await self.gather_sorted(
+            GET_RECENT_CHATS, (user_id, user_id, user_id, limit),
+            key=itemgetter(1), reverse=True, sharding_key=itemgetter(0)
+        )
+        chats = [
+            self.make_chat(user_id, *row) for row in await merge.take(limit)
+        ]
+        return chats, merge.failed
+
+    @staticmethod
+    def make_chat(user_id: int, chat_key: str, last_created: datetime,
+                  count: int) -> Chat:
+        first, second = map(int, chat_key.split(':'))
+        return Chat(chat_key=chat_key,
+                    user_id=second if first == user_id else first,
+                    last_message_at=last_created.timestamp(),
+                    messages_count=count)
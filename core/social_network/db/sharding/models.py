@@ -1,9 +1,12 @@
+from pydantic import BaseModel as PydanticBaseModel
+
 from .base import BaseShardingModel
 from ..models import Timestamp
 
 
 class Message(BaseShardingModel):
     _table_name = 'messages'
+    _sharding_field = 'chat_key'
     _fields = ('id', 'chat_key', 'author_id', 'text', 'created')
     _datetime_fields = ('created',)
 
@@ -14,3 +17,11 @@ class Message(BaseShardingModel):
 
     def get_sharding_key(self) -> str:
         return self.chat_key
+
+
+class Chat(PydanticBaseModel):
+    chat_key: str
+    # The other user of the chat
+    user_id: int
+    last_message_at: Timestamp
+    messages_count: int
@@ -0,0 +1,381 @@
+import asyncio
+import logging
+from time import monotonic
+from typing import AsyncIterator, Dict, List, Sequence, Tuple, Type
+
+from social_network.settings import Settings
+
+from ..db import BaseDatabaseConnector, Rows
+from ..exceptions import ReshardingError
+from ..managers import ShardsManager, ReshardingProgressManager
+from ..connectors_storage import BaseConnectorsStorage
+from ..models import (
+    Shard,
+    ShardState,
+    ShardPlacement,
+    ReshardingPhase,
+    ReshardingProgress
+)
+from .base import BaseShardingModel
+from .ring import HashRing
+from .shard_map import make_ring
+
+logger = logging.getLogger(__name__)
+
+GET_KEYS = '''
+    SELECT DISTINCT {key} FROM {table_name}
+    WHERE {key} > %s ORDER BY {key} LIMIT %s
+'''
+GET_ROWS = '''
+    SELECT {fields} FROM {table_name}
+    WHERE {key} IN ({keys}) AND id > %s ORDER BY id LIMIT %s
+'''
+COPY_ROWS = '{command} INTO {table_name} ({fields}) VALUES ({values})'
+CHECKSUM = '''
+    SELECT {key}, COUNT(*), BIT_XOR(CRC32(CONCAT_WS('#', {fields})))
+    FROM {table_name} WHERE {key} IN ({keys}) GROUP BY {key}
+'''
+DELETE_ROWS = 'DELETE FROM {table_name} WHERE {key} IN ({keys}) LIMIT %s'
+
+Checksums = Dict[str, Tuple[int, int]]
+
+
+class Throttle:
+    """
+    Keeps the rate of processed rows under the limit by sleeping.
+    """
+
+    def __init__(self, rows_per_second: float):
+        self.rows_per_second = rows_per_second
+        self.reset()
+
+    def reset(self):
+        """
+        Starts counting anew, so that time spent waiting between phases
+        doesn't let the next one run unthrottled.
+        """
+        self.started = monotonic()
+        self.rows = 0
+
+    async def __call__(self, rows: int):
+        self.rows += rows
+        ahead = self.rows / self.rows_per_second - \
+            (monotonic() - self.started)
+        if ahead > 0:
+            await asyncio.sleep(ahead)
+
+
+class Resharder:
+    """
+    Moves the keys of a table which belong to an ADDING shard on the ring
+    with it from the READY shards, while they serve reads and writes:
+
+    1. Waits for every process to load the ADDING shard, from then on they
+       write the moving keys to both shards.
+    2. Copies rows of the moving keys from every READY shard in batches,
+       rows written twice are skipped.
+    3. Compares row counts and checksums of every moving key on both
+       shards, keys which differ are copied again.
+    4. Makes the shard READY and waits for every process to read from it.
+    5. Deletes the moved rows from the READY shards.
+
+    Progress is saved on the master after every batch, so that a stopped
+    run continues from where it was. Rows are processed at most
+    MAX_ROWS_PER_SECOND at a time.
+
+    Keys of a table placed by modulo are moved to the ring the same way,
+    every READY shard being the target of its keys on the others.
+    """
+
+    def __init__(self, connectors_storage: BaseConnectorsStorage,
+                 model: Type[BaseShardingModel], conf: Settings):
+        self.connectors_storage = connectors_storage
+        self.model = model
+        self.conf = conf.RESHARDING
+        self.virtual_nodes = conf.SHARD_MAP.VIRTUAL_NODES
+        self.shards_manager = ShardsManager(connectors_storage, conf=conf)
+        self.progress_manager = ReshardingProgressManager(connectors_storage,
+                                                          conf=conf)
+        self.throttle = Throttle(self.conf.MAX_ROWS_PER_SECOND)
+
+        fields = ', '.join(model._fields)
+        self.format = dict(table_name=model._table_name,
+                           key=model._sharding_field, fields=fields)
+
+    async def get_shards(self) -> List[Shard]:
+        return [
+            shard for shard in await self.shards_manager.get_shards(
+                read_only=False
+            )
+            if shard.shard_table == self.model._table_name
+        ]
+
+    async def run(self, shard_id: int):
+        table_name = self.model._table_name
+        placement = await self.shards_manager.get_placement(table_name)
+        if placement != ShardPlacement.RING:
+            raise ReshardingError(f'Table {table_name} is placed by modulo, '
+                                  f'its keys have to be moved to the ring '
+                                  f'first')
+        shards = await self.get_shards()
+        target = next((shard for shard in shards if shard.id == shard_id),
+                      None)
+        if target is None:
+            raise ReshardingError(f'No shard {shard_id} of table '
+                                  f'{table_name}')
+        sources = [
+            shard for shard in shards
+            if shard.state == ShardState.READY and shard.id != shard_id
+        ]
+        # The same shards as the ring double writes are placed by, other
+        # ADDING shards included
+        placed = [shard for shard in shards if shard.state != ShardState.ERROR]
+        ring = make_ring(placed, [shard.id for shard in placed],
+                         self.virtual_nodes)
+        target_conn = await self.get_connector(target)
+        progresses = [
+            await self.progress_manager.get_or_create(shard_id, source.id)
+            for source in sources
+        ]
+
+        if target.state == ShardState.ADDING:
+            await self.settle('double writes')
+            for i, source in enumerate(sources):
+                progresses[i] = await self.copy(ring, target, source,
+                                                target_conn, progresses[i])
+            for i, source in enumerate(sources):
+                progresses[i] = await self.verify(ring, target, source,
+                                                  target_conn, progresses[i])
+            await self.shards_manager.update_state(shard_id, ShardState.READY)
+            logger.info('Shard %s is READY', shard_id)
+        elif target.state != ShardState.READY:
+            raise ReshardingError(f'Shard {shard_id} is {target.state.value}')
+
+        await self.settle('reads from the shard')
+        for source, progress in zip(sources, progresses):
+            await self.clean(ring, target, source, progress)
+        logger.info('Resharding to shard %s is done', shard_id)
+
+    async def move_to_ring(self):
+        """
+        Moves the keys of a table placed by modulo to their shards on the
+        ring of its READY shards. Every shard is scanned once per other
+        shard in each phase, as the target of its keys there.
+        """
+        table_name = self.model._table_name
+        placement = await self.shards_manager.get_placement(table_name)
+        shards = await self.get_shards()
+        if any(shard.state == ShardState.ADDING for shard in shards):
+            raise ReshardingError(f'Shards of table {table_name} are being '
+                                  f'added')
+        ready = [shard for shard in shards if shard.state == ShardState.READY]
+        ring = make_ring(ready, [shard.id for shard in ready],
+                         self.virtual_nodes)
+        moves = [
+            (target, source) for target in ready for source in ready
+            if source.id != target.id
+        ]
+        if placement == ShardPlacement.RING:
+            # Moved, unless the run stopped before cleaning
+            progresses = [
+                await self.progress_manager.get(target.id, source.id)
+                for target, source in moves
+            ]
+            if not all(progresses) or any(
+                    progress.phase == ReshardingPhase.COPYING
+                    for progress in progresses):
+                raise ReshardingError(f'Table {table_name} is on the ring')
+        else:
+            progresses = [
+                await self.progress_manager.get_or_create(target.id,
+                                                          source.id)
+                for target, source in moves
+            ]
+
+        if placement == ShardPlacement.MODULO:
+            await self.shards_manager.set_placement(table_name,
+                                                    ShardPlacement.MOVING)
+            placement = ShardPlacement.MOVING
+        if placement == ShardPlacement.MOVING:
+            await self.settle('double writes')
+            for i, (target, source) in enumerate(moves):
+                progresses[i] = await self.copy(
+                    ring, target, source, await self.get_connector(target),
+                    progresses[i]
+                )
+            for i, (target, source) in enumerate(moves):
+                progresses[i] = await self.verify(
+                    ring, target, source, await self.get_connector(target),
+                    progresses[i]
+                )
+            await self.shards_manager.set_placement(table_name,
+                                                    ShardPlacement.RING)
+            logger.info('Table %s is on the ring', table_name)
+
+        await self.settle('reads from the ring')
+        for (target, source), progress in zip(moves, progresses):
+            await self.clean(ring, target, source, progress)
+        logger.info('Keys of table %s are moved to the ring', table_name)
+
+    async def settle(self, reason: str):
+        logger.info('Waiting %ss for %s', self.conf.SETTLE_TIME, reason)
+        await asyncio.sleep(self.conf.SETTLE_TIME)
+
+    async def get_connector(self, shard: Shard) -> BaseDatabaseConnector:
+        return await self.connectors_storage.get_connector(
+            shard.db_info.as_settings()
+        )
+
+    async def iter_moving_keys(self, ring: HashRing[int], target: Shard,
+                               conn: BaseDatabaseConnector,
+                               last_key: str) \
+            -> AsyncIterator[Tuple[List[str], str]]:
+        """
+        Yields keys after the last one which move to the target by batches,
+        with the last key read in each, which may not move.
+        """
+        query = GET_KEYS.format(**self.format)
+        while True:
+            rows = await conn.make_query(
+                query, (last_key, self.conf.KEYS_BATCH_SIZE),
+                raise_if_empty=False
+            )
+            if not rows:
+                return
+            last_key = rows[-1][0]
+            keys = [key for key, in rows if ring.get(key) == target.id]
+            yield keys, last_key
+
+    async def copy(self, ring: HashRing[int], target: Shard, source: Shard,
+                   target_conn: BaseDatabaseConnector,
+                   progress: ReshardingProgress) -> ReshardingProgress:
+        if progress.phase != ReshardingPhase.COPYING:
+            return progress
+        source_conn = await self.get_connector(source)
+        self.throttle.reset()
+        copied = progress.processed
+        async for keys, last_key in self.iter_moving_keys(
+                ring, target, source_conn, progress.last_key):
+            if keys:
+                copied += await self.copy_keys(keys, source_conn,
+                                               target_conn)
+            progress = await self.progress_manager.update(
+                progress, ReshardingPhase.COPYING, last_key, copied
+            )
+            logger.info('Copied %s rows from shard %s, last key %s',
+                        copied, source.id, last_key)
+        return await self.progress_manager.update(
+            progress, ReshardingPhase.VERIFYING, '', 0
+        )
+
+    async def copy_keys(self, keys: Sequence[str],
+                        source_conn: BaseDatabaseConnector,
+                        target_conn: BaseDatabaseConnector,
+                        command='INSERT IGNORE') -> int:
+        select = GET_ROWS.format(keys=', '.join(['%s'] * len(keys)),
+                                 **self.format)
+        insert = COPY_ROWS.format(
+            command=command,
+            values=', '.join(['%s'] * len(self.model._fields)),
+            **self.format
+        )
+        copied, last_id = 0, ''
+        while True:
+            rows: Rows = await source_conn.make_query(
+                select, (*keys, last_id, self.conf.ROWS_BATCH_SIZE),
+                raise_if_empty=False
+            )
+            if not rows:
+                return copied
+            await target_conn.make_query(insert, rows, execute_many=True,
+                                         raise_if_empty=False)
+            copied += len(rows)
+            last_id = rows[-1][0]
+            await self.throttle(len(rows))
+
+    async def get_checksums(self, conn: BaseDatabaseConnector,
+                            keys: Sequence[str]) -> Checksums:
+        query = CHECKSUM.format(keys=', '.join(['%s'] * len(keys)),
+                                **self.format)
+        rows = await conn.make_query(query, keys, raise_if_empty=False)
+        return {key: (count, checksum) for key, count, checksum in rows}
+
+    async def verify(self, ring: HashRing[int], target: Shard, source: Shard,
+                     target_conn: BaseDatabaseConnector,
+                     progress: ReshardingProgress) -> ReshardingProgress:
+        if progress.phase != ReshardingPhase.VERIFYING:
+            return progress
+        source_conn = await self.get_connector(source)
+        self.throttle.reset()
+        verified = progress.processed
+        async for keys, last_key in self.iter_moving_keys(
+                ring, target, source_conn, progress.last_key):
+            if keys:
+                await self.verify_keys(keys, source_conn, target_conn)
+                verified += len(keys)
+            progress = await self.progress_manager.update(
+                progress, ReshardingPhase.VERIFYING, last_key, verified
+            )
+        logger.info('Verified %s keys from shard %s', verified, source.id)
+        return await self.progress_manager.update(
+            progress, ReshardingPhase.VERIFIED, '', verified
+        )
+
+    async def verify_keys(self, keys: Sequence[str],
+                          source_conn: BaseDatabaseConnector,
+                          target_conn: BaseDatabaseConnector):
+        """
+        Copies keys with different rows again, replacing the copied rows,
+        until they match. Keys written to at the moment may differ for a
+        while, so they are given a few attempts.
+        """
+        for attempt in range(self.conf.VERIFY_ATTEMPTS):
+            expected = await self.get_checksums(source_conn, keys)
+            actual = await self.get_checksums(target_conn, keys)
+            await self.throttle(sum(count for count, _ in expected.values()))
+            keys = [
+                key for key in keys if expected.get(key) != actual.get(key)
+            ]
+            if not keys:
+                return
+            logger.warning('Copying %s keys again: %s', len(keys), keys)
+            await self.copy_keys(keys, source_conn, target_conn, 'REPLACE')
+        raise ReshardingError(f'Keys differ after copying: {keys}')
+
+    async def clean(self, ring: HashRing[int], target: Shard, source: Shard,
+                    progress: ReshardingProgress) -> ReshardingProgress:
+        if progress.phase == ReshardingPhase.DONE:
+            return progress
+        if progress.phase != ReshardingPhase.CLEANING:
+            progress = await self.progress_manager.update(
+                progress, ReshardingPhase.CLEANING, '', 0
+            )
+        source_conn = await self.get_connector(source)
+        self.throttle.reset()
+        deleted = progress.processed
+        async for keys, last_key in self.iter_moving_keys(
+                ring, target, source_conn, progress.last_key):
+            if keys:
+                deleted += await self.delete_keys(keys, source_conn)
+            progress = await self.progress_manager.update(
+                progress, ReshardingPhase.CLEANING, last_key, deleted
+            )
+        logger.info('Deleted %s moved rows from shard %s', deleted,
+                    source.id)
+        return await self.progress_manager.update(
+            progress, ReshardingPhase.DONE, '', deleted
+        )
+
+    async def delete_keys(self, keys: Sequence[str],
+                          conn: BaseDatabaseConnector) -> int:
+        query = DELETE_ROWS.format(keys=', '.join(['%s'] * len(keys)),
+                                   **self.format)
+        deleted = 0
+        while True:
+            count = await conn.make_query(
+                query, (*keys, self.conf.ROWS_BATCH_SIZE), only_count=True
+            )
+            deleted += count
+            await self.throttle(count)
+            if count < self.conf.ROWS_BATCH_SIZE:
+                return deleted
@@ -0,0 +1,73 @@
+from zlib import crc32
+from bisect import bisect
+from hashlib import blake2b
+from typing import Dict, Generic, List, Tuple, TypeVar, Union
+
+N = TypeVar('N')
+
+# Points of a shard of weight 1, more points spread keys more evenly
+VIRTUAL_NODES = 160
+
+
+def hash_key(key: str) -> int:
+    return int.from_bytes(blake2b(key.encode(), digest_size=8).digest(),
+                          'big')
+
+
+class HashRing(Generic[N]):
+    """
+    Consistent hash ring. Every node gets weight * virtual_nodes points on
+    the ring, placed by the hash of its name, and a key belongs to the node
+    of the first point after the key's hash. Adding or removing a node
+    moves only the keys of its points, about 1/N of them.
+    """
+
+    def __init__(self, nodes: Dict[str, Tuple[N, int]],
+                 virtual_nodes: int = VIRTUAL_NODES):
+        """
+        :param nodes: node by name with its weight, names must stay the same
+                      for the same nodes for keys to stay on them
+        """
+        points: List[Tuple[int, N]] = []
+        for name, (node, weight) in nodes.items():
+            points.extend(
+                (hash_key(f'{name}#{i}'), node)
+                for i in range(weight * virtual_nodes)
+            )
+        points.sort(key=lambda point: point[0])
+        self.hashes = [hash for hash, _ in points]
+        self.nodes = [node for _, node in points]
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def get(self, key: str) -> N:
+        if not self.hashes:
+            raise KeyError(key)
+        index = bisect(self.hashes, hash_key(key))
+        return self.nodes[index % len(self.nodes)]
+
+
+class ModuloPlacement(Generic[N]):
+    """
+    Former placement: crc32 of the key modulo the number of shards is the
+    shard key of its shard. Kept for tables which have not been moved to
+    the ring yet.
+    """
+
+    def __init__(self, nodes: Dict[int, N]):
+        """
+        :param nodes: node by shard key, shard keys are 0..N-1
+        """
+        self.nodes = nodes
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def get(self, key: str) -> N:
+        if not self.nodes:
+            raise KeyError(key)
+        return self.nodes[crc32(key.encode()) % len(self.nodes)]
+
+
+Placement = Union[HashRing[N], ModuloPlacement[N]]
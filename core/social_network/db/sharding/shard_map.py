@@ -0,0 +1,194 @@
+import asyncio
+import logging
+from time import monotonic
+from itertools import compress
+from typing import Dict, List, Optional, Tuple, Type
+
+from social_network.settings import Settings
+
+from ..base import BaseModel
+from ..db import BaseDatabaseConnector
+from ..exceptions import DatabaseError
+from ..managers import ShardsManager
+from ..connectors_storage import BaseConnectorsStorage
+from ..models import ShardState, Shard, ShardPlacement
+from .ring import HashRing, ModuloPlacement, Placement, N
+from .batching import WriteBatcher
+
+logger = logging.getLogger(__name__)
+
+
+def make_ring(shards: List[Shard], nodes: List[N],
+              virtual_nodes: int) -> HashRing[N]:
+    """
+    Ring of nodes of the shards, placed by shard key and weight.
+    """
+    return HashRing({
+        str(shard.shard_key): (node, shard.weight)
+        for shard, node in zip(shards, nodes)
+    }, virtual_nodes)
+
+
+def make_modulo(shards: List[Shard], nodes: List[N]) -> ModuloPlacement[N]:
+    return ModuloPlacement({
+        shard.shard_key: node for shard, node in zip(shards, nodes)
+    })
+
+
+class TableShards:
+    """
+    Shards of a table on a consistent hash ring, so that adding or losing a
+    shard moves only the keys of that shard. Keys are read from READY
+    shards. While shards are being added, keys which move to them are
+    written both to their READY shard and to the one they move to.
+
+    Tables sharded before the ring keep the modulo placement until their
+    keys are moved to the ring, which works the same way: while they are
+    MOVING, keys are written to their ring shard too.
+    """
+
+    def __init__(self, table_name: str, shards: List[Shard],
+                 connectors: List[BaseDatabaseConnector],
+                 virtual_nodes: int,
+                 placement: ShardPlacement = ShardPlacement.RING):
+        self.table_name = table_name
+        self.placement = placement
+        ready = [shard.state == ShardState.READY for shard in shards]
+        self.shards = list(compress(shards, ready))
+        self.connectors = list(compress(connectors, ready))
+        self.adding = [
+            shard for shard in shards if shard.state == ShardState.ADDING
+        ]
+        # Placement once the ADDING shards are READY or the keys are moved
+        self.next_ring: Optional[HashRing[BaseDatabaseConnector]] = None
+        if placement == ShardPlacement.RING:
+            self.ring: Placement[BaseDatabaseConnector] = make_ring(
+                self.shards, self.connectors, virtual_nodes
+            )
+            if self.adding:
+                self.next_ring = make_ring(shards, connectors, virtual_nodes)
+        else:
+            # Shards are added only to tables on the ring
+            self.ring = make_modulo(self.shards, self.connectors)
+            if placement == ShardPlacement.MOVING:
+                self.next_ring = make_ring(self.shards, self.connectors,
+                                           virtual_nodes)
+
+    def get_connector(self, key: str) -> BaseDatabaseConnector:
+        try:
+            return self.ring.get(key)
+        except KeyError:
+            raise DatabaseError(f'No shards for table {self.table_name}')
+
+    def get_write_connectors(self, key: str) -> List[BaseDatabaseConnector]:
+        """
+        Connector of the READY shard of the key first, then the one of the
+        shard it moves to, if any.
+        """
+        connector = self.get_connector(key)
+        if self.next_ring is None:
+            return [connector]
+        next_connector = self.next_ring.get(key)
+        if next_connector is connector:
+            return [connector]
+        return [connector, next_connector]
+
+
+class ShardMap:
+    """
+    Shards of tables kept in memory, so that queries to shards don't read
+    shards_info. While the map is started, it is reloaded when the version
+    in shards_version is bumped, which is checked every CHECK_INTERVAL, and
+    every REFRESH_INTERVAL. A map which isn't started is reloaded on use
+    once it is older than REFRESH_INTERVAL. Concurrent reloads share a
+    single load. Write batchers of shards are kept here too, so that they
+    are shared by every manager and outlive reloads.
+    """
+
+    def __init__(self, connectors_storage: BaseConnectorsStorage,
+                 conf: Settings):
+        self.connectors_storage = connectors_storage
+        self.conf = conf.SHARD_MAP
+        self.batching_conf = conf.WRITE_BATCHING
+        self.shards_manager = ShardsManager(connectors_storage, conf=conf)
+        self.version: Optional[int] = None
+        self.tables: Dict[str, TableShards] = {}
+        self.loaded_at: Optional[float] = None
+        self._loading: Optional[asyncio.Future] = None
+        self.task: Optional[asyncio.Task] = None
+        self.batchers: Dict[Tuple[str, str], WriteBatcher] = {}
+
+    async def start(self):
+        await self.refresh()
+        self.task = asyncio.create_task(self.run())
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+        for batcher in self.batchers.values():
+            await batcher.close()
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.conf.CHECK_INTERVAL)
+            try:
+                version = await self.shards_manager.get_version()
+                if version != self.version or self.is_stale():
+                    await self.refresh()
+            except Exception:
+                # The loaded map is kept until the master is back
+                logger.exception('Failed to refresh shard map')
+
+    async def get(self, table_name: str) -> TableShards:
+        if self.loaded_at is None or self.task is None and self.is_stale():
+            await self.refresh()
+        shards = self.tables.get(table_name)
+        if shards is None:
+            raise DatabaseError(f'No shards for table {table_name}')
+        return shards
+
+    def get_batcher(self, connector: BaseDatabaseConnector,
+                    model: Type[BaseModel]) -> WriteBatcher:
+        key = (connector.name, model._table_name)
+        batcher = self.batchers.get(key)
+        if batcher is None:
+            batcher = WriteBatcher(connector, model, self.batching_conf)
+            self.batchers[key] = batcher
+        return batcher
+
+    def is_stale(self) -> bool:
+        return monotonic() - self.loaded_at > self.conf.REFRESH_INTERVAL
+
+    async def refresh(self):
+        if self._loading is None or self._loading.done():
+            self._loading = asyncio.ensure_future(self._load())
+        # A cancelled caller doesn't cancel the load the others wait for
+        await asyncio.shield(self._loading)
+
+    async def _load(self):
+        # Read before the shards, so that a concurrent change bumps the
+        # version past it and is loaded by the next check
+        version = await self.shards_manager.get_version()
+        placements = await self.shards_manager.get_placements(
+            read_only=False
+        )
+        shards_by_table: Dict[str, List[Shard]] = {}
+        for shard in await self.shards_manager.get_shards(read_only=False):
+            if shard.state != ShardState.ERROR:
+                shards_by_table.setdefault(shard.shard_table, []).append(shard)
+
+        tables = {}
+        for table_name, shards in shards_by_table.items():
+            connectors = [
+                await self.connectors_storage.get_connector(
+                    shard.db_info.as_settings()
+                )
+                for shard in shards
+            ]
+            tables[table_name] = TableShards(
+                table_name, shards, connectors, self.conf.VIRTUAL_NODES,
+                placements.get(table_name, ShardPlacement.RING)
+            )
+        self.tables = tables
+        self.version = version
+        self.loaded_at = monotonic()
@@ -0,0 +1,69 @@
+"""
+Compares decoding of database rows into models by the compiled row decoder
+with the per-row validation it replaced.
+
+    python -m social_network.scripts.benchmark_decoding [rows] [repeat]
+"""
+import sys
+from json import dumps
+from timeit import repeat
+from datetime import datetime
+from collections import namedtuple
+from typing import Callable, List, Type
+
+from social_network.db.base import BaseModel
+from social_network.db.models import New, User
+from social_network.db.sharding.models import Message
+
+
+def legacy_from_db(cls: Type[BaseModel], tpl: tuple) -> BaseModel:
+    parsing_tuple = namedtuple('_', cls._fields)
+    fields = parsing_tuple(*tpl)._asdict()
+    for name in cls._datetime_fields:
+        if isinstance(fields[name], datetime):
+            fields[name] = fields[name].timestamp()
+    return cls(**fields)
+
+
+def make_user(i: int) -> tuple:
+    return i, f'First{i}', f'Last{i}', 20 + i % 50, 'Moscow', \
+        ('MALE', 'FEMALE', None)[i % 3]
+
+
+def make_new(i: int) -> tuple:
+    payload = {'author': {'id': i, 'first_name': 'First', 'last_name': 'Last'},
+               'hobby': {'id': i, 'name': 'Hobby'}}
+    return str(i), i, 'ADDED_HOBBY', dumps(payload), \
+        datetime(2021, 1, 1, 12, i % 60)
+
+
+def make_message(i: int) -> tuple:
+    return f'{i:032x}', '1:2', i, 'Hello' * 10, \
+        datetime(2021, 1, 1, 12, i % 60)
+
+
+def run(model: Type[BaseModel], make_row: Callable[[int], tuple],
+        count: int, times: int):
+    rows = [make_row(i) for i in range(count)]
+    legacy = [legacy_from_db(model, row) for row in rows]
+    assert model.from_db_many(rows) == legacy, 'Decoded models differ'
+
+    def measure(func: Callable[[], List[BaseModel]]) -> float:
+        return min(repeat(func, number=1, repeat=times))
+
+    legacy_time = measure(lambda: [legacy_from_db(model, r) for r in rows])
+    row_time = measure(lambda: [model.from_db(r) for r in rows])
+    bulk_time = measure(lambda: model.from_db_many(rows))
+    print(f'{model.__name__:<8} legacy {legacy_time * 1000:8.2f}ms  '
+          f'from_db {row_time * 1000:8.2f}ms  '
+          f'from_db_many {bulk_time * 1000:8.2f}ms  '
+          f'x{legacy_time / bulk_time:.1f}')
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    times = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    print(f'Decoding {count} rows, best of {times}')
+    run(User, make_user, count, times)
+    run(New, make_new, count, times)
+    run(Message, make_message, count, times)
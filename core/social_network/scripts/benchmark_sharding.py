@@ -0,0 +1,81 @@
+"""
+Compares placement of chats by crc32 modulo with the consistent hash ring:
+share of chats moved when a shard is added or lost, balance of shards and
+cost of a lookup.
+
+    python -m social_network.scripts.benchmark_sharding [keys] [shards]
+"""
+import sys
+import random
+from zlib import crc32
+from timeit import repeat
+from collections import Counter
+from typing import Callable, Dict, List
+
+from social_network.db.sharding.ring import HashRing, VIRTUAL_NODES
+
+Placement = Callable[[str], int]
+
+
+def modulo(shard_keys: List[int]) -> Placement:
+    # Former placement, shard keys are 0..N-1 of READY shards
+    return lambda key: shard_keys[crc32(key.encode()) % len(shard_keys)]
+
+
+def ring(shard_keys: List[int], weights: Dict[int, int] = None,
+         virtual_nodes: int = VIRTUAL_NODES) -> Placement:
+    weights = weights or {}
+    return HashRing({
+        str(shard_key): (shard_key, weights.get(shard_key, 1))
+        for shard_key in shard_keys
+    }, virtual_nodes).get
+
+
+def moved(keys: List[str], before: Placement, after: Placement) -> float:
+    return sum(before(key) != after(key) for key in keys) / len(keys)
+
+
+def imbalance(keys: List[str], placement: Placement) -> float:
+    """
+    Load of the fullest shard relative to the mean one.
+    """
+    counts = Counter(placement(key) for key in keys)
+    return max(counts.values()) / (len(keys) / len(counts))
+
+
+def lookup_time(keys: List[str], placement: Placement) -> float:
+    sample = keys[:10000]
+    best = min(repeat(lambda: [placement(key) for key in sample],
+                      number=1, repeat=5))
+    return best / len(sample) * 1e6
+
+
+def run(keys: List[str], count: int):
+    shards = list(range(count))
+    grown = shards + [count]
+    lost = shards[:1] + shards[2:]
+    print(f'{count} shards, {len(keys)} chats, ideal move on adding '
+          f'{1 / (count + 1):.1%}, on losing {1 / count:.1%}')
+    for name, make in (('modulo', modulo), ('ring', ring)):
+        placement = make(shards)
+        print(f'  {name:<8} add {moved(keys, placement, make(grown)):6.1%}'
+              f'  lose {moved(keys, placement, make(lost)):6.1%}'
+              f'  max/mean {imbalance(keys, placement):.3f}'
+              f'  lookup {lookup_time(keys, placement):.2f}us')
+    for virtual_nodes in (10, 40, VIRTUAL_NODES, 640):
+        placement = ring(shards, virtual_nodes=virtual_nodes)
+        print(f'  ring with {virtual_nodes:>3} points  '
+              f'max/mean {imbalance(keys, placement):.3f}')
+    weighted = ring(grown, {count: 2})
+    share = sum(weighted(key) == count for key in keys) / len(keys)
+    print(f'  new shard of weight 2 gets {share:.1%} of chats, '
+          f'expected {2 / (count + 2):.1%}')
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    shards = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    # Chat keys are ids of both users, the smaller one first
+    pairs = (sorted(random.sample(range(1, 10 ** 7), 2)) for _ in range(count))
+    keys = [f'{first}:{second}' for first, second in pairs]
+    run(keys, shards)
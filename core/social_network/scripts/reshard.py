@@ -0,0 +1,74 @@
+"""
+Adds a shard of messages and moves its chats to it from the READY shards
+without downtime, or continues a stopped run. Chats placed by modulo,
+before the ring, are moved to their ring shards with ring, which is rerun
+to continue.
+
+    python -m social_network.scripts.reshard add HOST PORT USER PASSWORD \
+        NAME SHARD_KEY [--weight WEIGHT]
+    python -m social_network.scripts.reshard resume SHARD_ID
+    python -m social_network.scripts.reshard ring
+"""
+import asyncio
+import logging
+import argparse
+
+from social_network.db.connectors_storage import ConnectorsStorage
+from social_network.db.migrations import migrate, SHARDS_PATH
+from social_network.db.managers import DatabaseInfoManager, ShardsManager
+from social_network.db.sharding.models import Message
+from social_network.db.sharding.resharding import Resharder
+
+from social_network.settings import settings, Settings, DatabaseSettings
+
+
+async def add_shard(conf: Settings, storage: ConnectorsStorage,
+                    db_conf: DatabaseSettings, shard_key: int,
+                    weight: int) -> int:
+    migrate(db_conf, SHARDS_PATH)
+    db_info = await DatabaseInfoManager(storage, conf=conf).create(db_conf)
+    shard = await ShardsManager(storage, conf=conf).create(
+        db_info.id, Message._table_name, shard_key, weight=weight
+    )
+    return shard.id
+
+
+async def main(conf: Settings, args: argparse.Namespace):
+    storage = ConnectorsStorage()
+    await storage.create_connector(conf.DATABASE.MASTER)
+    resharder = Resharder(storage, Message, conf)
+    if args.command == 'ring':
+        await resharder.move_to_ring()
+        return
+    if args.command == 'add':
+        db_conf = DatabaseSettings(HOST=args.host, PORT=args.port,
+                                   USER=args.user, PASSWORD=args.password,
+                                   NAME=args.name)
+        shard_id = await add_shard(conf, storage, db_conf, args.shard_key,
+                                   args.weight)
+    else:
+        shard_id = args.shard_id
+    await resharder.run(shard_id)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Reshards messages.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add', help='Add a shard and move chats to it')
+    add.add_argument('host')
+    add.add_argument('port', type=int)
+    add.add_argument('user')
+    add.add_argument('password')
+    add.add_argument('name')
+    add.add_argument('shard_key', type=int)
+    add.add_argument('--weight', type=int, default=1)
+    resume = commands.add_parser('resume', help='Continue moving chats')
+    resume.add_argument('shard_id', type=int)
+    commands.add_parser('ring', help='Move chats placed by modulo to the '
+                                     'ring')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(settings, parse_args()))
@@ -1,6 +1,14 @@
 from typing import Type, TypeVar, List
 
 from social_network.db.connectors_storage import ConnectorsStorage
+from social_network.db.replicas import ReplicaRouter
+from social_network.db.profiler import QueryProfiler
+from social_network.db.sharding.shard_map import ShardMap
+from social_network.db.cache import (
+    EntityCache,
+    LocalCacheBackend,
+    RedisCacheBackend
+)
 from social_network.settings import Settings
 
 from .base import BaseService, BaseController
@@ -14,6 +22,9 @@ M = TypeVar('M')
 
 class DependencyInjector(BaseController):
     connectors_storage: ConnectorsStorage
+    query_profiler: QueryProfiler
+    replica_router: ReplicaRouter
+    shard_map: ShardMap
     kafka_producer: KafkaProducer
     rabbit_producer: RabbitMQProducer
     redis_service: RedisService
@@ -22,8 +33,19 @@ class DependencyInjector(BaseController):
 
     def __init__(self, conf: Settings):
         self.conf = conf
-        self.connectors_storage = ConnectorsStorage()
+        self.query_profiler = QueryProfiler(conf.QUERY_PROFILER)
+        hooks = [self.query_profiler] if conf.QUERY_PROFILER.ENABLED else []
+        self.connectors_storage = ConnectorsStorage(hooks)
+        self.replica_router = ReplicaRouter(self.connectors_storage,
+                                            conf.DATABASE)
+        self.connectors_storage.router = self.replica_router
+        self.shard_map = ShardMap(self.connectors_storage, conf)
+        self.connectors_storage.shard_map = self.shard_map
         self.redis_service = RedisService(conf.REDIS)
+        if conf.ENTITY_CACHE.ENABLED:
+            self.connectors_storage.entity_cache = EntityCache(
+                conf.ENTITY_CACHE, self.get_cache_backend()
+            )
         self.rabbit_producer = RabbitMQProducer(conf.RABBIT)
         self.kafka_producer = KafkaProducer(conf.KAFKA)
         self.kafka_consumer_service = KafkaConsumersService(
@@ -36,9 +58,17 @@ class DependencyInjector(BaseController):
         )
         self.ws_service = FeedWebSocketService(self.conf.RABBIT)
 
+    def get_cache_backend(self):
+        conf = self.conf.ENTITY_CACHE
+        if conf.USE_REDIS:
+            return RedisCacheBackend(self.redis_service)
+        return LocalCacheBackend(conf.MAX_SIZE)
+
     @property
     def services(self) -> List[BaseService]:
         return [
+            self.replica_router,
+            self.shard_map,
             self.kafka_producer,
             self.kafka_consumer_service,
             self.redis_service,
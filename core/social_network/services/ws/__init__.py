@@ -1 +1 @@
-from .service import FeedWebSocketService
+from .service import FeedWebSocketService, MultiplexedWebSocket
@@ -10,6 +10,24 @@ from ..rabbitmq import FeedConsumer
 from ..base import BaseService
 
 
+class MultiplexedWebSocket:
+    """
+    Feed of one user inside a socket shared by feeds of many users
+    (api gateway multiplexes client feeds this way).
+    """
+
+    def __init__(self, ws: WebSocket, user_id: int):
+        self.ws = ws
+        self.user_id = user_id
+
+    async def send_json(self, data: dict):
+        await self.ws.send_json({'user_id': self.user_id, 'data': data})
+
+    async def close(self):
+        # Shared socket is closed by its owner
+        pass
+
+
 class BaseWebSocketService(BaseService):
     sockets: Dict[int, List[WebSocket]]
 
@@ -24,8 +42,17 @@ class BaseWebSocketService(BaseService):
             self.sockets[user_id].append(ws)
 
     async def remove(self, user_id: int, ws: WebSocket):
+        """
+        Does nothing for a socket which is already removed, e.g. by a
+        failed send, so that cleanups of a closed socket can repeat it.
+        """
+        sockets = self.sockets.get(user_id, [])
+        if ws not in sockets:
+            return
+        sockets.remove(ws)
+        if not sockets:
+            del self.sockets[user_id]
         await ws.close()
-        self.sockets[user_id].remove(ws)
 
     async def process(self):
         raise NotImplemented
@@ -49,7 +76,7 @@ class FeedWebSocketService(BaseWebSocketService):
 
     async def callback(self, data: dict, user_id: int):
         failed = []
-        for ws in self.sockets[user_id]:
+        for ws in self.sockets.get(user_id, []):
             try:
                 print(data)
                 await ws.send_json(data)
@@ -66,7 +93,7 @@ class FeedWebSocketService(BaseWebSocketService):
 
     async def remove(self, user_id: int, ws: WebSocket):
         await super().remove(user_id, ws)
-        if not self.sockets[user_id]:
+        if user_id not in self.sockets and user_id in self.consumers:
             await self.remove_consumer(user_id)
 
     async def add_consumer(self, user_id: int):
@@ -8,5 +8,11 @@ from social_network.settings.base import (
     NewsCacheSettings,
     KafkaSSLSettings,
     RabbitMQSettings,
-    MasterSlaveDatabaseSettings
+    MasterSlaveDatabaseSettings,
+    ReplicaRoutingSettings,
+    QueryProfilerSettings,
+    EntityCacheSettings,
+    ShardMapSettings,
+    ReshardingSettings,
+    WriteBatchingSettings
 )
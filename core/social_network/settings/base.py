@@ -1,7 +1,7 @@
 import os
 import json
 from copy import deepcopy
-from typing import List
+from typing import List, Optional
 
 from pydantic import (
     BaseModel,
@@ -24,12 +24,96 @@ class DatabaseSettings(BaseModel):
     USER: str = 'root'
     PASSWORD: SecretStr
     NAME: str
-    MAX_CONNECTIONS = 1
+    # Opened and checked on start, kept open while idle
+    MIN_CONNECTIONS: int = 1
+    MAX_CONNECTIONS: int = 10
+    # Seconds to wait for a free connection before giving up
+    ACQUIRE_TIMEOUT: float = 5
+    # Connections idle longer than this are reopened, -1 to never recycle
+    CONNECTION_RECYCLE: int = 60 * 60
+    # Allow LOAD DATA LOCAL INFILE, used by bulk loading
+    LOCAL_INFILE: bool = False
+
+
+class ReplicaRoutingSettings(BaseModel):
+    # Seconds between health and replication lag checks of slaves
+    CHECK_INTERVAL: float = 1
+    CHECK_TIMEOUT: float = 1
+    # Slaves lagging behind the master more than this many seconds get
+    # no reads
+    MAX_LAG: float = 5
+    # Table updated by pt-heartbeat on the master, lag is read from
+    # SHOW SLAVE STATUS when not set
+    HEARTBEAT_TABLE: Optional[str] = None
+    # Seconds to read from the master after a user's write
+    READ_YOUR_WRITES_WINDOW: float = 5
+    # Weight of the latest query duration in the latency moving average
+    LATENCY_DECAY: float = .1
 
 
 class MasterSlaveDatabaseSettings(BaseModel):
     MASTER: DatabaseSettings
     SLAVES: List[DatabaseSettings] = []
+    ROUTING: ReplicaRoutingSettings = ReplicaRoutingSettings()
+
+
+class QueryProfilerSettings(BaseModel):
+    ENABLED: bool = True
+    # Queries slower than this many seconds are logged with their params
+    SLOW_QUERY_TIME: float = .5
+    # Also log the plan of slow SELECT queries
+    EXPLAIN_SLOW_QUERIES: bool = False
+    # Serve the heaviest query templates at /debug/queries
+    DEBUG_ENDPOINT: bool = False
+
+
+class EntityCacheSettings(BaseModel):
+    ENABLED: bool = True
+    # Seconds to keep entities got by id
+    TTL: float = 60
+    # Seconds to remember ids which were not found
+    NEGATIVE_TTL: float = 5
+    # Entries kept in process memory, when Redis is not used
+    MAX_SIZE: int = 10000
+    # Share entries and invalidations between workers through Redis
+    USE_REDIS: bool = False
+
+
+class ShardMapSettings(BaseModel):
+    # Seconds between checks of the version of shards
+    CHECK_INTERVAL: float = 1
+    # Seconds after which shards are reloaded even if the version is the same
+    REFRESH_INTERVAL: float = 60
+    # Points on the hash ring of a shard of weight 1
+    VIRTUAL_NODES: int = 160
+    # Seconds to wait for the next rows of a shard in queries to all shards
+    SCATTER_TIMEOUT: float = 2
+
+
+class WriteBatchingSettings(BaseModel):
+    # Insert messages into shards in batches, an insert returns once its
+    # batch is committed
+    ENABLED: bool = False
+    # Seconds the first row of a batch waits for others
+    MAX_DELAY: float = .005
+    MAX_ROWS: int = 100
+    # Extra inserts a failed batch may take to find its bad rows by
+    # splitting it in halves, rows still not inserted then fail
+    MAX_RETRIES: int = 16
+
+
+class ReshardingSettings(BaseModel):
+    # Sharding keys read from a shard at once
+    KEYS_BATCH_SIZE: int = 500
+    # Rows copied or deleted at once
+    ROWS_BATCH_SIZE: int = 1000
+    # Rows copied, checked or deleted per second at most
+    MAX_ROWS_PER_SECOND: float = 5000
+    # Seconds for every process to load a change of shards, longer than
+    # SHARD_MAP.CHECK_INTERVAL
+    SETTLE_TIME: float = 10
+    # Copies of keys which differ before giving up
+    VERIFY_ATTEMPTS: int = 3
 
 
 class KafkaSSLSettings(BaseModel):
@@ -76,6 +160,11 @@ class BaseSettings(PydanticSettings):
     DEBUG: bool
     UVICORN: UvicornSettings
     DATABASE: MasterSlaveDatabaseSettings
+    QUERY_PROFILER: QueryProfilerSettings
+    ENTITY_CACHE: EntityCacheSettings
+    SHARD_MAP: ShardMapSettings
+    WRITE_BATCHING: WriteBatchingSettings
+    RESHARDING: ReshardingSettings
     KAFKA: KafkaSettings
     REDIS: RedisSettings
     RABBIT: RabbitMQSettings
@@ -9,7 +9,12 @@ from social_network.settings.base import (
     NewsCacheSettings,
     RabbitMQSettings,
     MasterSlaveDatabaseSettings,
-    AuthServiceSettings
+    AuthServiceSettings,
+    QueryProfilerSettings,
+    EntityCacheSettings,
+    ShardMapSettings,
+    ReshardingSettings,
+    WriteBatchingSettings
 )
 
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -25,6 +30,11 @@ class Settings(BaseSettings):
             NAME='otus_highload'
         )
     )
+    QUERY_PROFILER: QueryProfilerSettings = QueryProfilerSettings()
+    ENTITY_CACHE: EntityCacheSettings = EntityCacheSettings()
+    SHARD_MAP: ShardMapSettings = ShardMapSettings()
+    WRITE_BATCHING: WriteBatchingSettings = WriteBatchingSettings()
+    RESHARDING: ReshardingSettings = ReshardingSettings()
     KAFKA: KafkaSettings = KafkaSettings()
     REDIS: RedisSettings = RedisSettings()
     RABBIT: RabbitMQSettings = RabbitMQSettings()
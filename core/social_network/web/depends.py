@@ -8,6 +8,7 @@ from fastapi import (
     WebSocket,
 )
 from social_network.db.models import User
+from social_network.db.replicas import current_user_id
 from social_network.db.managers import (
     AuthUserManager,
     FriendRequestManager,
@@ -108,6 +109,8 @@ def get_ws_service(
 
 
 async def get_user_id(x_user_id: Optional[int] = Header(None)) -> Optional[int]:
+    # Lets reads after the user's writes go to the master
+    current_user_id.set(x_user_id)
     return x_user_id
 
 
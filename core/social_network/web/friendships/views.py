@@ -110,7 +110,8 @@ class FriendRequestViewSet:
         if not is_request_target(request, self.user_.id):
             raise HTTPException(403, 'Not allowed')
         await self.friend_request_manager.update(id,
-                                                 FriendRequestStatus.DECLINED)
+                                                 FriendRequestStatus.DECLINED,
+                                                 current=request)
 
     @router.put('/accept/{id}/', response_model=Friendship,
                 status_code=201,
@@ -1,10 +1,16 @@
 from asyncio import create_task
 
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, HTMLResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
 
 from social_network.settings import settings
-from social_network.db.exceptions import RowsNotFoundError
+from social_network.db.exceptions import (
+    InvalidCursorError,
+    PoolTimeoutError,
+    RowsNotFoundError
+)
+from social_network.db.metrics import PoolCollector, ReplicaCollector
 from social_network.db.managers import NewsManager
 from social_network.services import DependencyInjector
 
@@ -25,6 +31,37 @@ async def handle_404(request: Request, exc: RowsNotFoundError):
     return JSONResponse(status_code=404, content={'detail': 'Not found'})
 
 
+@app.exception_handler(PoolTimeoutError)
+async def handle_pool_timeout(request: Request, exc: PoolTimeoutError):
+    return JSONResponse(status_code=503,
+                        content={'detail': 'Database is overloaded'})
+
+
+@app.exception_handler(InvalidCursorError)
+async def handle_invalid_cursor(request: Request, exc: InvalidCursorError):
+    return JSONResponse(status_code=400, content={'detail': 'Invalid cursor'})
+
+
+@app.get('/metrics', include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(REGISTRY),
+                    media_type=CONTENT_TYPE_LATEST)
+
+
+if settings.QUERY_PROFILER.DEBUG_ENDPOINT:
+    @app.get('/debug/queries', include_in_schema=False)
+    async def queries(request: Request, limit: int = Query(20, ge=1),
+                      sort_by: str = 'total_time'):
+        """
+        Heaviest query templates, sort_by is one of QueryProfiler.sort_keys.
+        """
+        profiler = request.app.state.dependency_injector.query_profiler
+        try:
+            return profiler.top(limit, sort_by)
+        except ValueError as e:
+            raise HTTPException(400, detail=str(e))
+
+
 app.include_router(auth_router, prefix='/auth')
 app.include_router(users_router, prefix='/users')
 app.include_router(friend_requests_manager, prefix='/friendships')
@@ -44,8 +81,14 @@ async def startup():
     )
     create_task(coro)
     app.state.dependency_injector = injector
+    app.state.pool_collector = PoolCollector(injector.connectors_storage)
+    app.state.replica_collector = ReplicaCollector(injector.replica_router)
+    REGISTRY.register(app.state.pool_collector)
+    REGISTRY.register(app.state.replica_collector)
 
 
 @app.on_event('shutdown')
 async def shutdown():
+    REGISTRY.unregister(app.state.pool_collector)
+    REGISTRY.unregister(app.state.replica_collector)
     await app.state.dependency_injector.close()
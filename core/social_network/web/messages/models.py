@@ -19,7 +19,17 @@ class MessageQueryParams:
     page: int = Query(1, ge=1)
     paginate_by: int = Query(settings.BASE_PAGE_LIMIT,
                              le=settings.BASE_PAGE_LIMIT)
+    # X-Next-Cursor of the previous page, replaces page
+    cursor: Optional[str] = Query(None)
 
     @property
     def offset(self) -> int:
+        if self.cursor is not None:
+            return 0
         return (self.page - 1) * self.paginate_by
+
+
+@dataclass
+class ChatQueryParams:
+    paginate_by: int = Query(settings.BASE_PAGE_LIMIT,
+                             le=settings.BASE_PAGE_LIMIT)
@@ -2,21 +2,26 @@ from typing import Optional, List
 from fastapi import (
     APIRouter,
     Depends,
+    Response
 )
 from fastapi_utils.cbv import cbv
 
 from social_network.db.managers import UserManager
 from social_network.db.sharding.managers import MessagesManager
-from social_network.db.sharding.models import Message
+from social_network.db.sharding.models import Message, Chat
 
 from ..depends import (
     get_user_id,
     get_messages_manager,
     get_user_manager
 )
-from .models import MessageQueryParams, MessageCreatePayload
+from .models import (
+    MessageQueryParams,
+    MessageCreatePayload,
+    ChatQueryParams
+)
 
-from ..utils import authorize_only
+from ..utils import authorize_only, set_next_cursor, PARTIAL_RESULTS_HEADER
 
 router = APIRouter()
 
@@ -46,11 +51,35 @@ class MessagesViewSet:
     @router.get('/', response_model=List[Message], responses={
         200: {'description': 'List of messages.'},
     })
-    async def list(self, q: MessageQueryParams = Depends(MessageQueryParams)) \
+    async def list(self, response: Response,
+                   q: MessageQueryParams = Depends(MessageQueryParams)) \
             -> List[Message]:
-        return await self.messages_manager.list(
+        messages = await self.messages_manager.list(
             chat_key=self.get_key(q.to_user_id),
             after_timestamp=q.after_timestamp,
             limit=q.paginate_by,
-            offset=q.offset
+            offset=q.offset,
+            cursor=q.cursor
+        )
+        set_next_cursor(response, self.messages_manager, messages,
+                        q.paginate_by, 'created')
+        return messages
+
+    @router.get('/chats/', response_model=List[Chat], responses={
+        200: {'description': 'Chats of the user, the latest first. '
+                             'X-Partial-Results lists shards which failed, '
+                             'their chats are missing.'},
+        401: {'description': 'Unauthorized.'}
+    })
+    @authorize_only
+    async def recent_chats(self, response: Response,
+                           q: ChatQueryParams = Depends(ChatQueryParams)) \
+            -> List[Chat]:
+        chats, failed = await self.messages_manager.recent_chats(
+            self.user_id, limit=q.paginate_by
         )
+        if failed:
+            response.headers[PARTIAL_RESULTS_HEADER] = ','.join(
+                str(shard.id) for shard in failed
+            )
+        return chats
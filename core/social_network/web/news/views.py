@@ -4,9 +4,10 @@ from typing import Optional, List
 from fastapi import (
     APIRouter,
     Depends,
+    Response,
     WebSocket
 )
-from starlette.websockets import WebSocketState
+from starlette.websockets import WebSocketState, WebSocketDisconnect
 from fastapi_utils.cbv import cbv
 
 from social_network.db.models import (
@@ -17,7 +18,10 @@ from social_network.db.models import (
 from social_network.db.managers import NewsManager, UserManager
 from social_network.services.kafka import KafkaProducer
 from social_network.services.redis import RedisService, RedisKeys
-from social_network.services.ws import FeedWebSocketService
+from social_network.services.ws import (
+    FeedWebSocketService,
+    MultiplexedWebSocket
+)
 
 from ..depends import (
     get_user,
@@ -29,7 +33,7 @@ from ..depends import (
     get_ws_service
 )
 from .models import NewCreatePayload, NewsQueryParams
-from ..utils import authorize_only
+from ..utils import authorize_only, set_next_cursor
 
 router = APIRouter()
 
@@ -80,12 +84,16 @@ class NewsViewSet:
     @router.get('/{user_id}/', response_model=List[New], responses={
         200: {'description': 'List of news for user.'},
     })
-    async def list(self, user_id: int,
+    async def list(self, user_id: int, response: Response,
                    q: NewsQueryParams = Depends(NewsQueryParams)) -> List[New]:
-        return await self.news_manager.list(author_ids=[user_id],
+        news = await self.news_manager.list(author_ids=[user_id],
                                             order=q.order,
                                             limit=q.paginate_by,
-                                            offset=q.offset)
+                                            offset=q.offset,
+                                            cursor=q.cursor)
+        set_next_cursor(response, self.news_manager, news, q.paginate_by,
+                        'created')
+        return news
 
     async def get_feed_from_cache(self) -> List[New]:
         feed = await self.redis.hget(
@@ -105,3 +113,32 @@ class WebSocketNewsViewSet:
         await self.ws_service.add(self.user_.id, ws)
         while ws.application_state != WebSocketState.DISCONNECTED:
             await asyncio.sleep(1)
+
+
+@cbv(router)
+class MultiplexedWebSocketNewsViewSet:
+    ws_service: FeedWebSocketService = Depends(get_ws_service)
+
+    @router.websocket('/ws/multiplex')
+    async def multiplexed_feed(self, ws: WebSocket):
+        """
+        Feeds of many users over one socket, for trusted api gateway only.
+        Accepts {"action": "subscribe"|"unsubscribe", "user_id": ...}
+        and sends {"user_id": ..., "data": ...}.
+        """
+        await ws.accept()
+        sockets = {}
+        try:
+            while True:
+                message = await ws.receive_json()
+                user_id = int(message['user_id'])
+                if message['action'] == 'subscribe' and user_id not in sockets:
+                    sockets[user_id] = MultiplexedWebSocket(ws, user_id)
+                    await self.ws_service.add(user_id, sockets[user_id])
+                elif message['action'] == 'unsubscribe' and user_id in sockets:
+                    await self.ws_service.remove(user_id, sockets.pop(user_id))
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for user_id, socket in sockets.items():
+                await self.ws_service.remove(user_id, socket)
@@ -20,6 +20,8 @@ class UsersQueryParams:
     page: int = Query(1, ge=1)
     paginate_by: int = Query(settings.BASE_PAGE_LIMIT,
                              le=settings.BASE_PAGE_LIMIT)
+    # X-Next-Cursor of the previous page, replaces page
+    cursor: Optional[str] = Query(None)
     first_name: str = Query('')
     last_name: str = Query('')
     friends_of: Optional[int] = Query(None)
@@ -29,4 +31,6 @@ class UsersQueryParams:
 
     @property
     def offset(self) -> int:
+        if self.cursor is not None:
+            return 0
         return (self.page - 1) * self.paginate_by
@@ -2,7 +2,8 @@ from typing import List, Optional
 from fastapi import (
     APIRouter,
     Depends,
-    HTTPException
+    HTTPException,
+    Response
 )
 from fastapi_utils.cbv import cbv
 
@@ -26,7 +27,7 @@ from ..depends import (
     get_user_hobby_manager,
     get_kafka_producer
 )
-from ..utils import authorize_only
+from ..utils import authorize_only, set_next_cursor
 
 router = APIRouter()
 
@@ -43,7 +44,8 @@ class UserViewSet:
     @router.get('/', response_model=List[User], responses={
         200: {'description': 'List of users.'},
     })
-    async def users(self, q: UsersQueryParams = Depends(UsersQueryParams)) \
+    async def users(self, response: Response,
+                    q: UsersQueryParams = Depends(UsersQueryParams)) \
             -> List[User]:
         users = await self.user_manager.list(first_name=q.first_name,
                                              last_name=q.last_name,
@@ -52,7 +54,10 @@ class UserViewSet:
                                              order=q.order,
                                              order_by=q.order_by,
                                              limit=q.paginate_by,
-                                             offset=q.offset)
+                                             offset=q.offset,
+                                             cursor=q.cursor)
+        set_next_cursor(response, self.user_manager, users, q.paginate_by,
+                        q.order_by)
         if not users:
             return []
         if q.with_hobbies:
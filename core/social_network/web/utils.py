@@ -1,20 +1,39 @@
 from enum import Enum
 from functools import wraps
+from typing import List
 from datetime import datetime, timedelta
 
-from fastapi import HTTPException
+from fastapi import HTTPException, Response
 
 from social_network.settings import NewsCacheSettings
+from social_network.db.base import M
+from social_network.db.mixins import KeysetMixin
 from social_network.db.managers import NewsManager
 from social_network.db.models import TIMESTAMP_FORMAT
 from social_network.services.kafka.producer import KafkaProducer
 
 
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+# Lists shards which failed to answer a query to all of them
+PARTIAL_RESULTS_HEADER = 'X-Partial-Results'
+
+
 class Order(str, Enum):
     DESC = 'DESC'
     ASC = 'ASC'
 
 
+def set_next_cursor(response: Response, manager: KeysetMixin,
+                    models: List[M], limit: int, order_by: str):
+    """
+    Passes the cursor of the next page in a header, so that list responses
+    stay plain lists. A page shorter than the limit is the last one.
+    """
+    if models and len(models) >= limit:
+        response.headers[NEXT_CURSOR_HEADER] = manager.get_cursor(models[-1],
+                                                                  order_by)
+
+
 def authorize_only(func):
     @wraps(func)
     async def wrapper(self, *args, **kwargs):
@@ -31,7 +50,7 @@ async def warmup_news(conf: NewsCacheSettings,
                       producer: KafkaProducer):
     timestamp = datetime.now() - timedelta(seconds=conf.WARMUP_CACHE_PERIOD)
     timestamp = timestamp.strftime(TIMESTAMP_FORMAT)
-    news = await news_manager.list_after_timestamp(timestamp)
-    for new in news:
-        new.populated, new.stored = True, True
-        await producer.send(new.json())
+    async for news in news_manager.iter_after_timestamp(timestamp):
+        for new in news:
+            new.populated, new.stored = True, True
+            await producer.send(new.json())
@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture(name='db', autouse=True, scope='session')
+def no_database():
+    """
+    Unit tests don't touch the database, so it isn't created for them.
+    """
+    yield
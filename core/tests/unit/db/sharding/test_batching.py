@@ -0,0 +1,165 @@
+import asyncio
+from datetime import datetime
+from typing import Any, List, Tuple
+
+import pytest
+from aiomysql import DatabaseError as RawDatabaseError
+
+from social_network.db.exceptions import DatabaseError
+from social_network.db.sharding.batching import WriteBatcher
+from social_network.db.sharding.models import Message
+from social_network.settings import WriteBatchingSettings
+
+CREATED = datetime(2021, 3, 1)
+
+
+class FakeConnector:
+    """
+    Stores rows of multi-row INSERTs, rows with text 'bad' fail them.
+    """
+    name = 'localhost:3370/otus'
+
+    def __init__(self):
+        self.statements: List[Tuple[str, List[Any]]] = []
+        self.rows: List[Tuple[Any, ...]] = []
+
+    async def make_query(self, query: str, params: List[Any],
+                         raise_if_empty=True):
+        await asyncio.sleep(0)
+        self.statements.append((query, params))
+        rows = [
+            tuple(params[i:i + len(Message._fields)])
+            for i in range(0, len(params), len(Message._fields))
+        ]
+        if any(row[3] == 'bad' for row in rows):
+            raise RawDatabaseError(1406, 'Data too long for column text')
+        self.rows.extend(rows)
+
+
+def make_row(i: int, text='Hi') -> Tuple[Any, ...]:
+    return str(i), '1:2', 1, text, CREATED
+
+
+def make_batcher(conn: FakeConnector, max_rows=10, max_delay=.01) \
+        -> WriteBatcher:
+    conf = WriteBatchingSettings(ENABLED=True, MAX_ROWS=max_rows,
+                                 MAX_DELAY=max_delay)
+    return WriteBatcher(conn, Message, conf)
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_one_insert():
+    conn = FakeConnector()
+    batcher = make_batcher(conn, max_rows=3, max_delay=10)
+    await asyncio.gather(*[batcher.insert(make_row(i)) for i in range(3)])
+    assert len(conn.statements) == 1
+    query, params = conn.statements[0]
+    assert query == ('INSERT INTO messages (id, chat_key, author_id, text, '
+                     'created) VALUES (%s, %s, %s, %s, %s), '
+                     '(%s, %s, %s, %s, %s), (%s, %s, %s, %s, %s)')
+    assert params == [value for i in range(3) for value in make_row(i)]
+
+
+@pytest.mark.asyncio
+async def test_batches_by_max_rows():
+    conn = FakeConnector()
+    batcher = make_batcher(conn, max_rows=4)
+    await asyncio.gather(*[batcher.insert(make_row(i)) for i in range(10)])
+    assert [len(params) // 5 for _, params in conn.statements] == [4, 4, 2]
+    assert conn.rows == [make_row(i) for i in range(10)]
+
+
+@pytest.mark.asyncio
+async def test_partial_batch_is_flushed_after_max_delay():
+    conn = FakeConnector()
+    batcher = make_batcher(conn, max_delay=.05)
+    insert = asyncio.ensure_future(batcher.insert(make_row(1)))
+    await asyncio.sleep(.02)
+    assert not conn.statements and not insert.done()
+    await asyncio.wait_for(insert, 1)
+    assert conn.rows == [make_row(1)]
+
+
+async def insert_rows(batcher: WriteBatcher, count: int, bad: Tuple[int]):
+    return await asyncio.gather(
+        *[batcher.insert(make_row(i, 'bad' if i in bad else 'Hi'))
+          for i in range(count)],
+        return_exceptions=True
+    )
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_fails_only_bad_rows():
+    conn = FakeConnector()
+    batcher = make_batcher(conn, max_rows=16)
+    results = await insert_rows(batcher, 16, bad=(5,))
+    assert [result is None for result in results] == \
+        [i != 5 for i in range(16)]
+    assert isinstance(results[5], DatabaseError)
+    # The batch, then both halves of every failed part
+    assert [len(params) // 5 for _, params in conn.statements] == \
+        [16, 8, 4, 4, 2, 1, 1, 2, 8]
+    assert sorted(conn.rows) == \
+        sorted(make_row(i) for i in range(16) if i != 5)
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_retries_are_limited():
+    conn = FakeConnector()
+    conf = WriteBatchingSettings(ENABLED=True, MAX_ROWS=8, MAX_DELAY=10,
+                                 MAX_RETRIES=4)
+    batcher = WriteBatcher(conn, Message, conf)
+    results = await insert_rows(batcher, 8, bad=(0, 7))
+    assert len(conn.statements) == 5
+    # Good rows of parts failed after retries ran out fail with bad ones
+    assert [result is None for result in results] == \
+        [False, False, True, True, False, False, False, False]
+    assert sorted(conn.rows) == [make_row(2), make_row(3)]
+
+
+@pytest.mark.asyncio
+async def test_failed_single_row():
+    conn = FakeConnector()
+    batcher = make_batcher(conn, max_rows=1)
+    with pytest.raises(DatabaseError):
+        await batcher.insert(make_row(1, 'bad'))
+    assert len(conn.statements) == 1
+
+
+@pytest.mark.asyncio
+async def test_other_errors_fail_the_batch():
+    conn = FakeConnector()
+
+    async def make_query(*args, **kwargs):
+        raise ConnectionResetError()
+
+    conn.make_query = make_query
+    batcher = make_batcher(conn, max_rows=2)
+    results = await asyncio.gather(
+        *[batcher.insert(make_row(i)) for i in range(2)],
+        return_exceptions=True
+    )
+    assert all(isinstance(result, ConnectionResetError)
+               for result in results)
+
+
+@pytest.mark.asyncio
+async def test_close_flushes_pending_rows():
+    conn = FakeConnector()
+    batcher = make_batcher(conn, max_delay=10)
+    insert = asyncio.ensure_future(batcher.insert(make_row(1)))
+    await asyncio.sleep(0)
+    await batcher.close()
+    assert conn.rows == [make_row(1)]
+    await insert
+
+
+@pytest.mark.asyncio
+async def test_cancelled_insert_is_still_written():
+    conn = FakeConnector()
+    batcher = make_batcher(conn, max_rows=2, max_delay=10)
+    cancelled = asyncio.ensure_future(batcher.insert(make_row(1)))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    await batcher.insert(make_row(2))
+    assert conn.rows == [make_row(1), make_row(2)]
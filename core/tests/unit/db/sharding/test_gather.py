@@ -0,0 +1,137 @@
+import asyncio
+from operator import itemgetter
+from typing import Any, List, Optional, Tuple
+
+import pytest
+
+from social_network.db.models import DatabaseInfo, Shard, ShardState
+from social_network.db.sharding.gather import ShardsMerge, Descending
+
+Row = Tuple[Any, ...]
+
+
+class FakeConnector:
+    """
+    Streams its rows in chunks, failing or answering late if asked to.
+    """
+
+    def __init__(self, rows: List[Row], delay: float = 0,
+                 fail_after: Optional[int] = None):
+        self.rows = rows
+        self.delay = delay
+        self.fail_after = fail_after
+        self.finished = False
+
+    async def stream_query(self, query, params, chunk_size):
+        try:
+            for i in range(0, len(self.rows), chunk_size):
+                await asyncio.sleep(self.delay)
+                if self.fail_after is not None and i >= self.fail_after:
+                    raise RuntimeError('Shard is down')
+                yield self.rows[i:i + chunk_size]
+        finally:
+            self.finished = True
+
+
+def make_shard(id: int) -> Shard:
+    db_info = DatabaseInfo(id=id, host='localhost', port=3370 + id,
+                           user='otus', password='otus', name='otus')
+    return Shard(id=id, db_info=db_info, shard_table='messages',
+                 shard_key=id, state=ShardState.READY)
+
+
+def make_rows(shard: int, values: List[int]) -> List[Row]:
+    return [(f'{shard}:{value}', value) for value in values]
+
+
+def make_merge(connectors: List[FakeConnector], **kwargs) -> ShardsMerge:
+    kwargs.setdefault('chunk_size', 3)
+    return ShardsMerge(
+        [(make_shard(i), conn) for i, conn in enumerate(connectors)],
+        'SELECT', (), itemgetter(1), **kwargs
+    )
+
+
+def test_descending():
+    assert sorted([1, 3, 2], key=Descending) == [3, 2, 1]
+    assert Descending(1) == Descending(1)
+
+
+@pytest.mark.asyncio
+async def test_merges_in_order():
+    shards = [[1, 4, 7, 10], [2, 5, 8], [], [3, 6, 9, 11, 12]]
+    merge = make_merge([
+        FakeConnector(make_rows(i, values)) for i, values in enumerate(shards)
+    ])
+    rows = await merge.take()
+    assert [value for _, value in rows] == list(range(1, 13))
+    assert not merge.is_partial
+
+
+@pytest.mark.asyncio
+async def test_merges_in_reverse_order():
+    shards = [[10, 7, 4, 1], [8, 5, 2], [12, 11, 9, 6, 3]]
+    merge = make_merge([
+        FakeConnector(make_rows(i, values)) for i, values in enumerate(shards)
+    ], reverse=True)
+    rows = await merge.take()
+    assert [value for _, value in rows] == list(range(12, 0, -1))
+
+
+@pytest.mark.asyncio
+async def test_take_stops_reading():
+    connectors = [
+        FakeConnector(make_rows(0, list(range(0, 100, 2)))),
+        FakeConnector(make_rows(1, list(range(1, 100, 2))))
+    ]
+    rows = await make_merge(connectors).take(5)
+    assert [value for _, value in rows] == [0, 1, 2, 3, 4]
+    await asyncio.sleep(.01)
+    # Results are read to the end in the background, so that connections
+    # go back to the pool usable
+    assert all(conn.finished for conn in connectors)
+
+
+@pytest.mark.asyncio
+async def test_failed_shard_is_left_out():
+    connectors = [
+        FakeConnector(make_rows(0, [1, 3, 5, 7, 9, 11, 13])),
+        FakeConnector(make_rows(1, [2, 4, 6, 8, 10, 12, 14]), fail_after=3)
+    ]
+    merge = make_merge(connectors)
+    rows = await merge.take()
+    # The first chunk of the failed shard is still merged
+    assert [value for _, value in rows] == [1, 2, 3, 4, 5, 6, 7, 9, 11, 13]
+    assert merge.is_partial
+    assert [shard.id for shard in merge.failed] == [1]
+
+
+@pytest.mark.asyncio
+async def test_slow_shard_is_left_out():
+    connectors = [
+        FakeConnector(make_rows(0, [1, 3])),
+        FakeConnector(make_rows(1, [2, 4]), delay=.2)
+    ]
+    merge = make_merge(connectors, timeout=.05)
+    rows = await merge.take()
+    assert [value for _, value in rows] == [1, 3]
+    assert [shard.id for shard in merge.failed] == [1]
+    # The late answer is still read to the end
+    await asyncio.sleep(.3)
+    assert connectors[1].finished
+
+
+@pytest.mark.asyncio
+async def test_rows_of_other_shards_are_skipped():
+    # Shard 1 has a copy of key 0:3, which is being moved from it
+    connectors = [
+        FakeConnector(make_rows(0, [1, 3, 5])),
+        FakeConnector([('1:2', 2), ('0:3', 3), ('1:4', 4)])
+    ]
+
+    def placement(row: Row) -> FakeConnector:
+        return connectors[int(row[0].split(':')[0])]
+
+    rows = await make_merge(connectors, placement=placement).take()
+    assert rows == [('0:1', 1), ('1:2', 2), ('0:3', 3), ('1:4', 4),
+                    ('0:5', 5)]
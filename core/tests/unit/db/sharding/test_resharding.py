@@ -0,0 +1,49 @@
+import pytest
+
+from social_network.db.sharding import resharding
+from social_network.db.sharding.resharding import Throttle
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture(name='clock')
+def fake_clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(resharding, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(resharding.asyncio, 'sleep', clock.sleep)
+    return clock
+
+
+@pytest.mark.asyncio
+async def test_throttle_sleeps_when_ahead(clock):
+    throttle = Throttle(100)
+    await throttle(50)
+    assert clock.sleeps == [.5]
+    clock.now += 1
+    await throttle(50)
+    # Behind the limit after the pause
+    assert clock.sleeps == [.5]
+    await throttle(200)
+    assert clock.sleeps == [.5, pytest.approx(1.5)]
+
+
+@pytest.mark.asyncio
+async def test_throttle_reset_drops_idle_time(clock):
+    throttle = Throttle(100)
+    # E.g. waiting for processes to settle before copying
+    clock.now += 10
+    throttle.reset()
+    await throttle(100)
+    assert clock.sleeps == [1]
@@ -0,0 +1,121 @@
+from zlib import crc32
+from collections import Counter
+
+import pytest
+
+from social_network.db.models import (
+    DatabaseInfo,
+    Shard,
+    ShardState,
+    ShardPlacement
+)
+from social_network.db.sharding.ring import HashRing, ModuloPlacement
+from social_network.db.sharding.shard_map import TableShards
+
+KEYS = [f'{i}:{i * 7 + 1}' for i in range(20000)]
+
+
+def make_ring(names, weights=None, virtual_nodes=160) -> HashRing[str]:
+    weights = weights or {}
+    return HashRing({
+        name: (name, weights.get(name, 1)) for name in names
+    }, virtual_nodes)
+
+
+def make_shard(id: int, state=ShardState.READY, weight=1) -> Shard:
+    db_info = DatabaseInfo(id=id, host='localhost', port=3370 + id,
+                           user='otus', password='otus', name='otus')
+    return Shard(id=id, db_info=db_info, shard_table='messages',
+                 shard_key=id, state=state, weight=weight)
+
+
+def shares(placement, keys=KEYS):
+    counts = Counter(placement.get(key) for key in keys)
+    return {node: count / len(keys) for node, count in counts.items()}
+
+
+def test_empty_ring():
+    with pytest.raises(KeyError):
+        make_ring([]).get('1:2')
+
+
+def test_points():
+    assert len(make_ring(['a', 'b'], {'b': 2}, virtual_nodes=10)) == 30
+
+
+def test_placement_is_stable():
+    # Doesn't depend on the order of nodes or the process
+    assert [make_ring(['a', 'b', 'c']).get(key) for key in KEYS[:100]] == \
+        [make_ring(['c', 'a', 'b']).get(key) for key in KEYS[:100]]
+
+
+def test_balance():
+    for share in shares(make_ring(['a', 'b', 'c', 'd'])).values():
+        assert share == pytest.approx(.25, abs=.05)
+
+
+def test_weights():
+    placement = shares(make_ring(['a', 'b', 'c'], {'c': 2}))
+    assert placement['c'] == pytest.approx(.5, abs=.05)
+
+
+def test_adding_moves_keys_only_to_the_new_node():
+    before, after = make_ring(['a', 'b', 'c', 'd']), \
+        make_ring(['a', 'b', 'c', 'd', 'e'])
+    moved = [key for key in KEYS if before.get(key) != after.get(key)]
+    assert {after.get(key) for key in moved} == {'e'}
+    assert len(moved) / len(KEYS) == pytest.approx(.2, abs=.05)
+
+
+def test_removing_moves_only_keys_of_the_node():
+    before, after = make_ring(['a', 'b', 'c', 'd']), \
+        make_ring(['a', 'b', 'd'])
+    for key in KEYS:
+        if before.get(key) != 'c':
+            assert after.get(key) == before.get(key)
+
+
+def test_modulo_placement():
+    placement = ModuloPlacement({0: 'a', 1: 'b', 2: 'c'})
+    for key in KEYS[:100]:
+        assert placement.get(key) == 'abc'[crc32(key.encode()) % 3]
+
+
+def test_empty_modulo_placement():
+    with pytest.raises(KeyError):
+        ModuloPlacement({}).get('1:2')
+
+
+def test_table_on_ring():
+    shards = [make_shard(0), make_shard(1)]
+    table = TableShards('messages', shards, ['a', 'b'], 160)
+    for key in KEYS[:100]:
+        assert table.get_write_connectors(key) == [table.get_connector(key)]
+
+
+def test_table_with_adding_shard():
+    shards = [make_shard(0), make_shard(1), make_shard(2, ShardState.ADDING)]
+    table = TableShards('messages', shards, ['a', 'b', 'c'], 160)
+    assert table.shards == shards[:2] and table.adding == shards[2:]
+    for key in KEYS[:1000]:
+        assert table.get_connector(key) in ('a', 'b')
+        writes = table.get_write_connectors(key)
+        assert writes[0] == table.get_connector(key)
+        # Keys are written to the ADDING shard only if they move to it
+        assert writes[1:] in ([], ['c'])
+
+
+@pytest.mark.parametrize('placement', [ShardPlacement.MODULO,
+                                       ShardPlacement.MOVING])
+def test_table_placed_by_modulo(placement):
+    shards = [make_shard(0), make_shard(1), make_shard(2)]
+    table = TableShards('messages', shards, ['a', 'b', 'c'], 160, placement)
+    ring = TableShards('messages', shards, ['a', 'b', 'c'], 160)
+    for key in KEYS[:1000]:
+        modulo = 'abc'[crc32(key.encode()) % 3]
+        assert table.get_connector(key) == modulo
+        expected = [modulo]
+        if placement == ShardPlacement.MOVING and \
+                ring.get_connector(key) != modulo:
+            expected.append(ring.get_connector(key))
+        assert table.get_write_connectors(key) == expected
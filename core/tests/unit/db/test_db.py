@@ -0,0 +1,104 @@
+from typing import List
+
+import pytest
+
+from social_network.db.db import DatabaseConnector, QueryEvent, QueryHook
+from social_network.settings import DatabaseSettings
+
+
+class Cursor:
+
+    def __init__(self, rows: List[tuple], fail: bool):
+        self.rows = rows
+        self.fail = fail
+        self.closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.closed = True
+
+    async def execute(self, query, params):
+        if self.fail:
+            raise RuntimeError
+
+    async def fetchmany(self, size: int):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+
+class Connection:
+
+    def __init__(self, cursor: Cursor):
+        self._cursor = cursor
+
+    def cursor(self, cls=None) -> Cursor:
+        return self._cursor
+
+
+class Pool:
+
+    def __init__(self, conn: Connection):
+        self.conn = conn
+
+    async def acquire(self) -> Connection:
+        return self.conn
+
+    def release(self, conn: Connection):
+        pass
+
+
+class Events(QueryHook):
+
+    def __init__(self):
+        self.events: List[QueryEvent] = []
+
+    def on_query(self, event: QueryEvent):
+        self.events.append(event)
+
+
+def make_connector(rows: List[tuple], fail=False):
+    events = Events()
+    connector = DatabaseConnector(
+        DatabaseSettings(PASSWORD='', NAME='test'), [events]
+    )
+    cursor = Cursor(rows, fail)
+    connector.pool = Pool(Connection(cursor))
+    return connector, cursor, events.events
+
+
+@pytest.mark.asyncio
+async def test_stream_query_is_reported_when_cursor_is_closed():
+    connector, cursor, events = make_connector([(i,) for i in range(5)])
+    stream = connector.stream_query('SELECT id FROM users', (),
+                                    chunk_size=2)
+    async for _ in stream:
+        assert not events
+    assert cursor.closed
+    event, = events
+    assert event.query == 'SELECT id FROM users'
+    assert event.rows == 5
+
+
+@pytest.mark.asyncio
+async def test_stopped_stream_query_reports_rows_read():
+    connector, cursor, events = make_connector([(i,) for i in range(5)])
+    stream = connector.stream_query('SELECT id FROM users', (),
+                                    chunk_size=2)
+    async for _ in stream:
+        break
+    await stream.aclose()
+    assert cursor.closed
+    event, = events
+    assert event.rows == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_stream_query_is_reported():
+    connector, _, events = make_connector([], fail=True)
+    with pytest.raises(RuntimeError):
+        async for _ in connector.stream_query('SELECT id FROM users'):
+            pass
+    event, = events
+    assert event.rows is None
@@ -0,0 +1,77 @@
+from datetime import datetime
+from typing import Any, Tuple, Type
+
+import pytest
+from pydantic import ValidationError
+
+from social_network.db.base import BaseModel
+from social_network.db.decoding import to_timestamp
+from social_network.db.models import User, Hobby, New, Gender, NewsType
+from social_network.db.sharding.models import Message
+
+CREATED = datetime(2021, 3, 1, 12, 30)
+
+ROWS = [
+    (User, (1, 'Paul', 'Atreides', 15, 'Arrakeen', 'MALE')),
+    (User, (2, 'Alia', None, 4, None, None)),
+    (Hobby, (1, 'Chess')),
+    (Message, ('a1b2', '1:2', 1, 'Hi', CREATED)),
+    (New, ('a1b2', 1, 'ADDED_POST', '{"author": 1, "text": "Hi"}', CREATED)),
+    (New, ('c3d4', 1, 'ADDED_HOBBY',
+           '{"author": {"id": 1, "first_name": "Paul", "last_name": null}, '
+           '"hobby": {"id": 1, "name": "Chess"}}', CREATED)),
+]
+
+
+def validate(model: Type[BaseModel], row: Tuple[Any, ...]) -> BaseModel:
+    """
+    Model built the way rows were decoded before the decoder.
+    """
+    return model(**{
+        name: to_timestamp(value) if name in model._datetime_fields
+        else value
+        for name, value in zip(model._fields, row)
+    })
+
+
+@pytest.mark.parametrize('model, row', ROWS)
+def test_same_as_validated(model: Type[BaseModel], row: Tuple[Any, ...]):
+    decoded, validated = model.from_db(row), validate(model, row)
+    assert decoded == validated
+    assert list(decoded.__dict__) == list(validated.__dict__)
+    assert decoded.__fields_set__ == validated.__fields_set__
+    assert decoded.json() == validated.json()
+
+
+def test_many_rows():
+    rows = [row for model, row in ROWS if model is User]
+    assert User.from_db_many(rows) == [validate(User, row) for row in rows]
+    assert User.from_db_many([]) == []
+
+
+def test_converted_types():
+    user = User.from_db((1, 'Paul', 'Atreides', 15, 'Arrakeen', 'MALE'))
+    assert user.gender is Gender.MALE
+    assert user.hobbies == []
+    new = New.from_db(ROWS[4][1])
+    assert new.type is NewsType.ADDED_POST
+    assert new.payload.text == 'Hi'
+    assert new.created == CREATED.timestamp()
+    assert not new.populated
+
+
+def test_unexpected_column_types_are_validated():
+    # E.g. a driver returning a number for a string column
+    message = Message.from_db((12, '1:2', '1', 'Hi', CREATED))
+    assert message.id == '12' and message.author_id == 1
+
+
+def test_default_is_not_shared():
+    first, second = User.from_db_many([ROWS[0][1], ROWS[1][1]])
+    first.hobbies.append(Hobby(id=1, name='Chess'))
+    assert second.hobbies == []
+
+
+def test_invalid_row():
+    with pytest.raises(ValidationError):
+        User.from_db((1, 'Paul', 'Atreides', 15, 'Arrakeen', 'SANDWORM'))
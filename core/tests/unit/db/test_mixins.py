@@ -0,0 +1,136 @@
+from datetime import datetime
+
+import pytest
+
+from social_network.db.exceptions import InvalidCursorError
+from social_network.db.mixins import (
+    KeysetMixin,
+    add_where,
+    encode_cursor,
+    decode_cursor
+)
+from social_network.db.models import User, New
+
+QUERY = 'SELECT id FROM users'
+SUBQUERY = ('SELECT id FROM users '
+            'JOIN (SELECT user_id FROM news WHERE type = %s) n '
+            'ON n.user_id = users.id')
+
+
+class UsersKeyset(KeysetMixin):
+    model = User
+
+
+class NewsKeyset(KeysetMixin):
+    model = New
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor('Smith', 42)
+    assert decode_cursor(cursor) == ('Smith', 42)
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor('?' * 10, 1)
+    assert not set(cursor) & set('+/?&')
+
+
+@pytest.mark.parametrize('cursor', ['not a cursor', '', 'bnVsbA==',
+                                    encode_cursor('a', 1)[:-3]])
+def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
+
+
+def test_get_cursor():
+    user = User(id=7, first_name='Paul', last_name='Atreides', age=15)
+    assert decode_cursor(UsersKeyset().get_cursor(user, 'last_name')) == \
+        ('Atreides', 7)
+
+
+def test_first_page_is_only_ordered():
+    query, params = UsersKeyset().add_keyset(QUERY, (), 'age', 'DESC')
+    assert query == f'{QUERY}\nORDER BY users.age DESC, users.id DESC'
+    assert params == ()
+
+
+def test_next_page_ascending():
+    query, params = UsersKeyset().add_keyset(QUERY, (), 'age', 'ASC',
+                                             encode_cursor(30, 5))
+    assert query == (f'{QUERY}\n'
+                     'WHERE ((users.age, users.id) > (%s, %s))\n'
+                     'ORDER BY users.age ASC, users.id ASC')
+    assert params == (30, 5)
+
+
+def test_next_page_adds_to_where():
+    query, params = UsersKeyset().add_keyset(QUERY, (18,), 'age', 'DESC',
+                                             encode_cursor(30, 5),
+                                             where=('age > %s',))
+    assert query == (f'{QUERY}\n'
+                     'WHERE (age > %s) AND '
+                     '((users.age, users.id) < (%s, %s))\n'
+                     'ORDER BY users.age DESC, users.id DESC')
+    assert params == (18, 30, 5)
+
+
+def test_where_of_subquery_is_not_the_query_one():
+    query, _ = UsersKeyset().add_keyset(SUBQUERY, ('post',), 'age', 'ASC',
+                                        encode_cursor(30, 5))
+    assert query == (f'{SUBQUERY}\n'
+                     'WHERE ((users.age, users.id) > (%s, %s))\n'
+                     'ORDER BY users.age ASC, users.id ASC')
+
+
+def test_first_page_keeps_where():
+    query, params = UsersKeyset().add_keyset(QUERY, (18,), 'age', 'ASC',
+                                             where=('age > %s',))
+    assert query == (f'{QUERY}\nWHERE (age > %s)\n'
+                     'ORDER BY users.age ASC, users.id ASC')
+    assert params == (18,)
+
+
+def test_add_where():
+    assert add_where(QUERY, ()) == QUERY
+    assert add_where(QUERY, ('a = %s OR b = %s', 'c = %s')) == \
+        f'{QUERY}\nWHERE (a = %s OR b = %s) AND (c = %s)'
+
+
+def test_next_page_of_nullable_field_descending():
+    # NULLs are last in descending order, so they all follow the cursor
+    query, params = UsersKeyset().add_keyset(QUERY, (), 'city', 'DESC',
+                                             encode_cursor('Arrakeen', 5))
+    assert '((users.city, users.id) < (%s, %s) OR users.city IS NULL)' \
+        in query
+    assert params == ('Arrakeen', 5)
+
+
+def test_next_page_after_null_ascending():
+    # NULLs are first in ascending order, so every value follows them
+    query, params = UsersKeyset().add_keyset(QUERY, (), 'city', 'ASC',
+                                             encode_cursor(None, 5))
+    assert ('(users.city IS NULL AND users.id > %s '
+            'OR users.city IS NOT NULL)') in query
+    assert params == (5,)
+
+
+def test_next_page_after_null_descending():
+    query, params = UsersKeyset().add_keyset(QUERY, (), 'city', 'DESC',
+                                             encode_cursor(None, 5))
+    assert '(users.city IS NULL AND users.id < %s)' in query
+    assert params == (5,)
+
+
+def test_datetime_cursor():
+    created = datetime(2021, 3, 1, 12, 30)
+    cursor = encode_cursor(created.timestamp(), 'id')
+    _, params = NewsKeyset().add_keyset('SELECT id FROM news', (), 'created',
+                                        'DESC', cursor)
+    assert params == (created, 'id')
+
+
+@pytest.mark.parametrize('order_by, order', [('password', 'ASC'),
+                                             ('age', 'DROP')])
+def test_invalid_order(order_by, order):
+    with pytest.raises(ValueError):
+        UsersKeyset().add_keyset(QUERY, (), order_by, order)
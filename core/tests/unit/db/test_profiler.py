@@ -0,0 +1,56 @@
+import pytest
+
+from social_network.db.profiler import normalize
+
+
+@pytest.mark.parametrize('query, template', [
+    ("SELECT id FROM users WHERE email = 'a@b.c'",
+     'SELECT id FROM users WHERE email = ?'),
+    ('SELECT id FROM users WHERE email = "a@b.c"',
+     'SELECT id FROM users WHERE email = ?'),
+    ("SELECT id FROM users WHERE name = 'O\\'Neil'",
+     'SELECT id FROM users WHERE name = ?'),
+    ('SELECT id FROM news LIMIT 10 OFFSET 20',
+     'SELECT id FROM news LIMIT ? OFFSET ?'),
+    ('SELECT id FROM users WHERE age > 1.5',
+     'SELECT id FROM users WHERE age > ?'),
+    ('SELECT id FROM users WHERE id = %s',
+     'SELECT id FROM users WHERE id = ?'),
+    ('SELECT id\n    FROM users\n    WHERE id = %s\n',
+     'SELECT id FROM users WHERE id = ?'),
+    # Names with digits are kept
+    ('SELECT id FROM table1', 'SELECT id FROM table1'),
+])
+def test_literals(query, template):
+    assert normalize(query) == template
+
+
+@pytest.mark.parametrize('size', [1, 2, 100])
+def test_in_lists(size):
+    placeholders = ', '.join(['%s'] * size)
+    query = f'DELETE FROM messages WHERE chat_key IN ({placeholders}) LIMIT %s'
+    assert normalize(query) == \
+        'DELETE FROM messages WHERE chat_key IN (?) LIMIT ?'
+
+
+@pytest.mark.parametrize('rows', [1, 2, 100])
+def test_multi_row_inserts(rows):
+    values = ', '.join(['(%s, %s, %s)'] * rows)
+    query = f'INSERT INTO hobbies (id, name, rank) VALUES {values}'
+    assert normalize(query) == \
+        'INSERT INTO hobbies (id, name, rank) VALUES (?)'
+
+
+def test_escaped_multi_row_inserts():
+    query = "INSERT INTO users (id, name) VALUES (1,'a'),(2,'b'),(3,'c')"
+    assert normalize(query) == 'INSERT INTO users (id, name) VALUES (?)'
+
+
+def test_row_comparison():
+    query = 'SELECT id FROM news WHERE (created, id) < (%s, %s)'
+    assert normalize(query) == 'SELECT id FROM news WHERE (created, id) < (?)'
+
+
+def test_columns_are_kept():
+    query = 'SELECT COUNT(*), MAX(created) FROM messages GROUP BY chat_key'
+    assert normalize(query) == query
@@ -1,7 +1,9 @@
 from fastapi import APIRouter
 
 from .v1 import router as v1_router
+from .batch import router as batch_router
 
 router = APIRouter()
 
 router.include_router(v1_router, prefix='/v1')
+router.include_router(batch_router)
@@ -0,0 +1,139 @@
+import asyncio
+from json import dumps
+from urllib.parse import urlencode
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import Response
+from pydantic import ValidationError, parse_obj_as
+
+from api_gateway.models.path_info import PathInfo
+from api_gateway.models.request import BatchPayload, SubRequest
+from api_gateway.models.response import AccessToken, BatchResponse
+from api_gateway.services import UpstreamError
+from api_gateway.services.responses import ProxyResponse
+from api_gateway.settings import settings
+from api_gateway.utils import fetch, get_injector
+
+from .v1.views import MAPPING
+
+PREFIX = '/api/v1'
+# Body is set per sub-request and must be plain JSON to embed it as is
+EXCLUDED_HEADERS = frozenset((
+    b'content-length',
+    b'content-type',
+    b'transfer-encoding',
+    b'accept-encoding',
+    b'if-none-match',
+    b'if-modified-since',
+))
+
+router = APIRouter()
+
+
+def make_subrequest(request: Request, path_info: PathInfo,
+                    path_params: Dict[str, Any], sub: SubRequest) -> Request:
+    path = PREFIX + path_info.path.format(**path_params)
+    headers = [
+        (key, value) for key, value in request.scope['headers']
+        if key not in EXCLUDED_HEADERS
+    ]
+    body = b''
+    if sub.body is not None:
+        body = dumps(sub.body).encode()
+        headers.append((b'content-type', b'application/json'))
+        headers.append((b'content-length', str(len(body)).encode()))
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    return Request({
+        **request.scope,
+        'method': path_info.method,
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': urlencode(sub.query_params, doseq=True).encode(),
+        'headers': headers,
+        'path_params': path_params
+    }, receive)
+
+
+def encode_body(response: ProxyResponse) -> bytes:
+    if not response.content:
+        return b'null'
+    if 'json' in (response.get_header('content-type') or ''):
+        return response.content
+    return dumps(response.content.decode(errors='replace')).encode()
+
+
+def encode_subresponse(name: str, status_code: int, body: bytes) -> bytes:
+    return b'{"name":%s,"status_code":%d,"body":%s}' % (
+        dumps(name).encode(), status_code, body
+    )
+
+
+def encode_error(name: str, status_code: int, detail: Any) -> bytes:
+    return encode_subresponse(name, status_code,
+                              dumps({'detail': detail}).encode())
+
+
+async def run_subrequest(request: Request, sub: SubRequest,
+                         token: Optional[AccessToken]) -> bytes:
+    path_info = MAPPING[sub.name]
+    try:
+        path_params = {
+            key: parse_obj_as(annotation, sub.path_params[key])
+            for key, annotation in path_info.path_params.items()
+        }
+    except (KeyError, ValidationError):
+        return encode_error(sub.name, 422, 'Invalid path params.')
+
+    if not path_info.authorized:
+        # Public routes are cached and coalesced regardless of the caller
+        token = None
+    elif token is None:
+        return encode_error(sub.name, 401, 'Unauthorized')
+    subrequest = make_subrequest(request, path_info, path_params, sub)
+    try:
+        response = await fetch(subrequest, path_info, token)
+    except HTTPException as e:
+        return encode_error(sub.name, e.status_code, e.detail)
+    except UpstreamError as e:
+        return encode_error(sub.name, e.status_code,
+                            'Upstream service is unavailable.')
+    return encode_subresponse(sub.name, response.status_code,
+                              encode_body(response))
+
+
+@router.post(
+    '/batch',
+    response_model=BatchResponse,
+    status_code=200,
+    responses={
+        200: {'description': 'Responses in the order of requests.'},
+        422: {'description': 'Unknown route or too many requests.'}
+    }
+)
+async def batch(payload: BatchPayload, request: Request,
+                x_auth_token: Optional[str] = Header(None)):
+    """
+    Runs requests to gateway routes concurrently, the access token is
+    checked once for all of them.
+    """
+    if len(payload.requests) > settings.BATCH.MAX_REQUESTS:
+        raise HTTPException(status_code=422, detail='Too many requests.')
+    unknown = [sub.name for sub in payload.requests if sub.name not in MAPPING]
+    if unknown:
+        raise HTTPException(status_code=422,
+                            detail=f'Unknown routes: {", ".join(unknown)}.')
+
+    token = None
+    if any(MAPPING[sub.name].authorized for sub in payload.requests):
+        token = await get_injector(request).tokens.get(x_auth_token)
+    parts = await asyncio.gather(*[
+        run_subrequest(request, sub, token) for sub in payload.requests
+    ])
+    return Response(
+        content=b'{"responses":[%s]}' % b','.join(parts),
+        media_type='application/json'
+    )
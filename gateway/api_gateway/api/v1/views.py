@@ -1,12 +1,13 @@
-from json import loads, dumps
+from json import loads
 from typing import List
 from fastapi import APIRouter, WebSocket
-import websockets
+from starlette.websockets import WebSocketDisconnect
 
-from api_gateway.utils import generate_handler, get_token_by_value
+from api_gateway.utils import generate_handler, get_injector
 from api_gateway.models.response import (
     AccessToken,
     AuthUser,
+    Chat,
     FriendRequest,
     Friendship,
     Hobby,
@@ -23,6 +24,8 @@ from api_gateway.models.request import (
     NewCreatePayload
 )
 from api_gateway.models.path_info import PathInfo
+from api_gateway.services import UpstreamError
+from api_gateway.services.ws import close_client
 from api_gateway.settings import settings
 
 router = APIRouter()
@@ -165,6 +168,7 @@ MAPPING = {
         response_model=Hobby,
         status_code=200,
         method='GET',
+        cache_ttl=60,
         path_params={'id': int},
         responses={
             200: {'description': 'Success'},
@@ -177,6 +181,7 @@ MAPPING = {
         response_model=List[Hobby],
         status_code=200,
         method='GET',
+        cache_ttl=60,
         responses={
             200: {'description': 'List of hobbies.'},
         }
@@ -203,11 +208,24 @@ MAPPING = {
         response_model=List[Message],
         status_code=200,
         method='GET',
+        streaming=True,
         authorized=True,
         responses={
             200: {'description': 'List of messages.'},
         }
     ),
+    'get_recent_chats': PathInfo(
+        path='/messages/chats/',
+        service_path='/messages/chats/',
+        response_model=List[Chat],
+        status_code=200,
+        method='GET',
+        authorized=True,
+        responses={
+            200: {'description': 'Chats of the user, the latest first.'},
+            401: {'description': 'Unauthorized.'}
+        }
+    ),
     'create_new': PathInfo(
         path='/news/',
         service_path='/news/',
@@ -227,6 +245,7 @@ MAPPING = {
         response_model=List[New],
         status_code=200,
         method='GET',
+        streaming=True,
         authorized=True,
         responses={
             200: {'description': 'User feed.'},
@@ -238,6 +257,7 @@ MAPPING = {
         response_model=List[New],
         status_code=200,
         method='GET',
+        cache_ttl=5,
         path_params={'user_id': int},
         responses={
             200: {'description': 'List of news for user.'},
@@ -249,6 +269,7 @@ MAPPING = {
         response_model=List[User],
         status_code=200,
         method='GET',
+        cache_ttl=10,
         responses={
             200: {'description': 'List of users.'},
         }
@@ -259,6 +280,7 @@ MAPPING = {
         response_model=User,
         status_code=200,
         method='GET',
+        cache_ttl=10,
         path_params={'id': int},
         responses={
             200: {'description': 'User.'},
@@ -295,17 +317,19 @@ for name, path_info in MAPPING.items():
     endpoints.append(handler)
 
 
-# todo: rewrite universal
 @router.websocket('/news/ws')
 async def feed_websocket_proxy(client_ws: WebSocket):
-    host, port = settings.MONOLITH.HOST, settings.MONOLITH.PORT
-    uri = f'ws://{host}:{port}/news/ws'
+    injector = get_injector(client_ws)
     await client_ws.accept()
-    auth = loads(await client_ws.receive_text())
-    print(auth)
-    auth['value'] = (await get_token_by_value(auth['value'])).user_id
-    async with websockets.connect(uri) as server_ws:
-        await server_ws.send(dumps(auth))
-        while True:
-            msg = await server_ws.recv()
-            await client_ws.send_text(msg)
+    try:
+        auth = loads(await client_ws.receive_text())
+        token = await injector.tokens.get(auth['value'])
+    except (ValueError, KeyError, TypeError, WebSocketDisconnect):
+        token = None
+    except UpstreamError:
+        await close_client(client_ws, code=1013)  # Try again later
+        return
+    if not token:
+        await close_client(client_ws, code=1008)  # Policy violation
+        return
+    await injector.feed_relay.relay(client_ws, token.user_id)
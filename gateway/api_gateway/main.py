@@ -5,17 +5,28 @@ from fastapi import FastAPI
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import REGISTRY
 
-from api_gateway.settings import ROOT_DIR
+from api_gateway.settings import ROOT_DIR, settings
 from api_gateway.api import router
+from api_gateway.api.v1.views import MAPPING
+from api_gateway.metrics import GatewayCollector, handle_metrics
+from api_gateway.routing import FastPathMiddleware, RouteTable
+from api_gateway.services import DependencyInjector, UpstreamError
+from api_gateway.utils import upstream_error_handler
 
 app = FastAPI()
 
+if settings.FAST_PATH:
+    # Added first, so that CORS headers wrap fast path responses too
+    app.add_middleware(FastPathMiddleware,
+                       routes=RouteTable('/api/v1', MAPPING))
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Partial-Results"],
 )
 
 STATIC_DIR = os.path.join(ROOT_DIR, 'app/frontend/static')
@@ -25,6 +36,23 @@ app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
 
 app.include_router(router, prefix='/api')
+app.add_exception_handler(UpstreamError, upstream_error_handler)
+app.add_route('/metrics', handle_metrics)
+
+
+@app.on_event('startup')
+async def startup():
+    injector = DependencyInjector(settings)
+    await injector.start()
+    app.state.dependency_injector = injector
+    app.state.metrics_collector = GatewayCollector(injector)
+    REGISTRY.register(app.state.metrics_collector)
+
+
+@app.on_event('shutdown')
+async def shutdown():
+    REGISTRY.unregister(app.state.metrics_collector)
+    await app.state.dependency_injector.close()
 
 
 @app.get('{full_path:path}', response_class=HTMLResponse)
@@ -0,0 +1,147 @@
+from time import monotonic
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from api_gateway.models.path_info import PathInfo
+from api_gateway.services import DependencyInjector, UpstreamError
+from api_gateway.services.breaker import CircuitState
+
+# Route is the path template of a MAPPING entry, e.g. "/users/{id}/"
+LABELS = ('method', 'route')
+
+REQUEST_DURATION = Histogram(
+    'gateway_request_duration_seconds',
+    'Time from receiving a proxied request to sending response headers',
+    LABELS
+)
+AUTH_DURATION = Histogram(
+    'gateway_auth_duration_seconds',
+    'Time spent checking access tokens',
+    LABELS
+)
+UPSTREAM_DURATION = Histogram(
+    'gateway_upstream_duration_seconds',
+    'Time from sending a request upstream to its response headers, '
+    'waiting for a pooled connection and connecting included, those are '
+    'also exported by gateway_upstream_connection_duration_seconds',
+    LABELS
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'gateway_requests_in_flight',
+    'Proxied requests being processed',
+    LABELS
+)
+REQUEST_ERRORS = Counter(
+    'gateway_request_errors_total',
+    'Proxied requests answered with an error status',
+    LABELS + ('status',)
+)
+
+
+def get_labels(path_info: PathInfo) -> Tuple[str, str]:
+    return path_info.method, path_info.path
+
+
+@contextmanager
+def observe(histogram: Histogram, path_info: PathInfo) -> Iterator[None]:
+    started = monotonic()
+    try:
+        yield
+    finally:
+        histogram.labels(*get_labels(path_info)).observe(monotonic() - started)
+
+
+class RequestTracker:
+    status_code: Optional[int] = None
+
+
+@contextmanager
+def track_request(path_info: PathInfo) -> Iterator[RequestTracker]:
+    """
+    Measures total time, requests in flight and errors of a proxied request,
+    the caller sets the status code of the response it got.
+    """
+    labels = get_labels(path_info)
+    tracker = RequestTracker()
+    in_flight = REQUESTS_IN_FLIGHT.labels(*labels)
+    in_flight.inc()
+    started = monotonic()
+    try:
+        yield tracker
+    except (HTTPException, UpstreamError) as e:
+        tracker.status_code = e.status_code
+        raise
+    except Exception:
+        tracker.status_code = 500
+        raise
+    finally:
+        in_flight.dec()
+        REQUEST_DURATION.labels(*labels).observe(monotonic() - started)
+        if tracker.status_code is not None and tracker.status_code >= 400:
+            REQUEST_ERRORS.labels(*labels, str(tracker.status_code)).inc()
+
+
+class GatewayCollector:
+    """
+    Exports the state of gateway services at scrape time.
+    """
+
+    def __init__(self, injector: DependencyInjector):
+        self.injector = injector
+
+    def collect(self):
+        in_flight = GaugeMetricFamily(
+            'gateway_upstream_requests_in_flight',
+            'Requests sent to the upstream and not finished yet',
+            labels=['upstream']
+        )
+        circuit = GaugeMetricFamily(
+            'gateway_upstream_circuit_state',
+            'Current circuit breaker state of the upstream',
+            labels=['upstream', 'state']
+        )
+        for upstream in self.injector.upstreams.upstreams:
+            in_flight.add_metric([upstream.name], upstream.in_flight)
+            for state in CircuitState:
+                circuit.add_metric(
+                    [upstream.name, state.value],
+                    int(upstream.breaker.state == state)
+                )
+        yield in_flight
+        yield circuit
+
+        stats = self.injector.coalescing.stats
+        yield CounterMetricFamily(
+            'gateway_coalesced_calls',
+            'Upstream calls made for coalesced GET requests',
+            value=stats['calls']
+        )
+        yield CounterMetricFamily(
+            'gateway_coalesced_requests_collapsed',
+            'GET requests which joined an identical call in flight',
+            value=stats['collapsed']
+        )
+
+        cache = self.injector.response_cache.cache
+        yield GaugeMetricFamily('gateway_response_cache_entries',
+                                'Cached upstream responses', value=len(cache))
+        yield GaugeMetricFamily('gateway_response_cache_bytes',
+                                'Size of cached upstream responses',
+                                value=cache.weight)
+
+
+async def handle_metrics(request: Request) -> Response:
+    return Response(generate_latest(REGISTRY),
+                    media_type=CONTENT_TYPE_LATEST)
@@ -1,6 +1,6 @@
 from typing import Dict, Optional, Type, Any
 
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
 
 from api_gateway.settings import ServiceSettings, settings
 
@@ -14,7 +14,17 @@ class PathInfo(BaseModel):
     authorized: bool = False
     path_params: Dict[str, Type] = {}
     method: str = 'GET'
+    # Pipe upstream body to the client without buffering it in memory
+    streaming: bool = False
+    # Seconds to cache successful responses, public GET routes only
+    cache_ttl: Optional[float] = None
     status_code: int = 204
     responses: Dict[int, Dict[str, str]] = {
         200: {'description': 'OK'}
     }
+
+    @validator('cache_ttl')
+    def only_public_get(cls, v, values):
+        if v and (values.get('authorized') or values.get('method') != 'GET'):
+            raise ValueError('Only public GET responses can be cached')
+        return v
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from enum import Enum
 
 from pydantic import (
@@ -42,3 +42,17 @@ class MessageCreatePayload(BaseModel):
 
 class NewCreatePayload(BaseModel):
     text: str
+
+
+class SubRequest(BaseModel):
+    """
+    Request to one of the gateway routes, `name` is its key in MAPPING
+    """
+    name: str
+    path_params: Dict[str, Any] = {}
+    query_params: Dict[str, Any] = {}
+    body: Any = None
+
+
+class BatchPayload(BaseModel):
+    requests: List[SubRequest] = Field(..., min_items=1)
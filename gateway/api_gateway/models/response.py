@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Optional, List, Union
+from typing import Any, Optional, List, Union
 
 from pydantic import (
     Field,
@@ -120,3 +120,20 @@ class Message(BaseModel):
     author_id: int
     text: str
     created: Timestamp
+
+
+class Chat(PydanticModel):
+    chat_key: str
+    user_id: int
+    last_message_at: Timestamp
+    messages_count: int
+
+
+class SubResponse(PydanticModel):
+    name: str
+    status_code: int
+    body: Any = None
+
+
+class BatchResponse(PydanticModel):
+    responses: List[SubResponse]
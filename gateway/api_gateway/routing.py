@@ -0,0 +1,90 @@
+from typing import Dict, List, Mapping, NamedTuple, Optional, Pattern, Tuple
+
+from fastapi import HTTPException
+from fastapi.exception_handlers import http_exception_handler
+from starlette.convertors import Convertor
+from starlette.requests import Request
+from starlette.routing import compile_path
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from api_gateway.models.path_info import PathInfo
+from api_gateway.services import UpstreamError
+from api_gateway.utils import proxy, upstream_error_handler
+
+CONVERTORS = {int: 'int', float: 'float'}
+
+
+class CompiledRoute(NamedTuple):
+    regex: Pattern
+    convertors: Dict[str, Convertor]
+    path_info: PathInfo
+
+
+Match = Tuple[PathInfo, Dict[str, object]]
+
+
+class RouteTable:
+    """
+    Routes of MAPPING compiled once: static paths are looked up in a dict,
+    parametrized ones are matched with a regex per route.
+    """
+
+    def __init__(self, prefix: str, mapping: Mapping[str, PathInfo]):
+        self.static: Dict[Tuple[str, str], PathInfo] = {}
+        self.dynamic: Dict[str, List[CompiledRoute]] = {}
+        for path_info in mapping.values():
+            path = prefix + path_info.path
+            if not path_info.path_params:
+                self.static[(path_info.method, path)] = path_info
+                continue
+            for name, annotation in path_info.path_params.items():
+                convertor = CONVERTORS.get(annotation, 'str')
+                path = path.replace(f'{{{name}}}', f'{{{name}:{convertor}}}')
+            regex, _, convertors = compile_path(path)
+            self.dynamic.setdefault(path_info.method, []).append(
+                CompiledRoute(regex, convertors, path_info)
+            )
+
+    def match(self, method: str, path: str) -> Optional[Match]:
+        path_info = self.static.get((method, path))
+        if path_info is not None:
+            return path_info, {}
+        for route in self.dynamic.get(method, ()):
+            if (m := route.regex.match(path)) is not None:
+                return route.path_info, {
+                    key: route.convertors[key].convert(value)
+                    for key, value in m.groupdict().items()
+                }
+        return None
+
+
+class FastPathMiddleware:
+    """
+    Proxies requests matching the route table without FastAPI dependency
+    resolution and request model validation, the body is forwarded to the
+    upstream as is. Everything else, including OpenAPI docs generated from
+    MAPPING, is served by the application.
+    """
+
+    def __init__(self, app: ASGIApp, routes: RouteTable):
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or \
+                (match := self.routes.match(scope['method'],
+                                            scope['path'])) is None:
+            await self.app(scope, receive, send)
+            return
+
+        path_info, path_params = match
+        scope['path_params'] = path_params
+        request = Request(scope, receive)
+        try:
+            response = await proxy(request, path_info,
+                                   request.headers.get('x-auth-token'))
+        except HTTPException as e:
+            response = await http_exception_handler(request, e)
+        except UpstreamError as e:
+            response = await upstream_error_handler(request, e)
+        await response(scope, receive, send)
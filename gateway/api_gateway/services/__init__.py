@@ -0,0 +1,12 @@
+from .upstreams import (
+    Upstream,
+    UpstreamsStorage,
+    UpstreamError,
+    UpstreamTimeout,
+    UpstreamUnavailable
+)
+from .tokens import TokensService
+from .ws import FeedRelayService
+from .responses import ResponseCacheService, ProxyResponse
+from .coalescing import CoalescingService
+from .injector import DependencyInjector
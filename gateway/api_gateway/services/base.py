@@ -0,0 +1,25 @@
+from typing import List
+
+
+class BaseService:
+
+    async def start(self):
+        raise NotImplementedError
+
+    async def close(self):
+        raise NotImplementedError
+
+
+class BaseController(BaseService):
+
+    @property
+    def services(self) -> List[BaseService]:
+        raise NotImplementedError
+
+    async def start(self):
+        for service in self.services:
+            await service.start()
+
+    async def close(self):
+        for service in self.services:
+            await service.close()
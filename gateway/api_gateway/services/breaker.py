@@ -0,0 +1,89 @@
+from enum import Enum
+from time import monotonic
+from collections import deque
+from typing import Deque, Tuple
+
+from api_gateway.settings import CircuitBreakerSettings
+
+
+class CircuitState(str, Enum):
+    CLOSED = 'CLOSED'
+    OPEN = 'OPEN'
+    HALF_OPEN = 'HALF_OPEN'
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to an upstream when too many of the recent ones
+    failed or were slow. After OPEN_TIMEOUT a few probe requests are let
+    through: the circuit closes if all of them succeed and opens again
+    otherwise.
+    """
+
+    def __init__(self, conf: CircuitBreakerSettings):
+        self.conf = conf
+        self.state = CircuitState.CLOSED
+        self.opened_at = 0.0
+        self.probes = 0
+        self.probes_succeeded = 0
+        # (finished_at, failed, slow)
+        self.outcomes: Deque[Tuple[float, bool, bool]] = deque()
+
+    def allow(self) -> bool:
+        if self.state == CircuitState.OPEN:
+            if monotonic() - self.opened_at < self.conf.OPEN_TIMEOUT:
+                return False
+            self.state = CircuitState.HALF_OPEN
+            self.probes = self.probes_succeeded = 0
+        if self.state == CircuitState.HALF_OPEN:
+            if self.probes >= self.conf.HALF_OPEN_REQUESTS:
+                return False
+            self.probes += 1
+        return True
+
+    def record(self, failed: bool, duration: float):
+        slow = duration >= self.conf.SLOW_CALL_DURATION
+        if self.state == CircuitState.HALF_OPEN:
+            if failed or slow:
+                self._open()
+            else:
+                self.probes_succeeded += 1
+                if self.probes_succeeded >= self.conf.HALF_OPEN_REQUESTS:
+                    self._close()
+            return
+        if self.state == CircuitState.OPEN:
+            # Late answer of a request sent before the circuit opened
+            return
+
+        now = monotonic()
+        self.outcomes.append((now, failed, slow))
+        while self.outcomes[0][0] < now - self.conf.WINDOW:
+            self.outcomes.popleft()
+        if self._is_tripped():
+            self._open()
+
+    def release(self):
+        """
+        Frees the probe taken by allow for a request which was cancelled
+        before its outcome was known.
+        """
+        if self.state == CircuitState.HALF_OPEN and self.probes > 0:
+            self.probes -= 1
+
+    def _is_tripped(self) -> bool:
+        total = len(self.outcomes)
+        if total < self.conf.MIN_REQUESTS:
+            return False
+        failed = sum(1 for _, f, _ in self.outcomes if f)
+        slow = sum(1 for _, _, s in self.outcomes if s)
+        return failed / total >= self.conf.ERROR_RATE or \
+            slow / total >= self.conf.SLOW_CALL_RATE
+
+    def _open(self):
+        self.state = CircuitState.OPEN
+        self.opened_at = monotonic()
+        self.outcomes.clear()
+
+    def _close(self):
+        self.state = CircuitState.CLOSED
+        self.outcomes.clear()
@@ -0,0 +1,56 @@
+from time import monotonic
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+MISSING = object()
+
+
+class LRUCache:
+    """
+    Bounded LRU cache where every entry has its own time to live.
+    Optionally bounded by total weight of entries too (e.g. bytes).
+    """
+
+    def __init__(self, max_size: int, max_weight: Optional[int] = None):
+        self.max_size = max_size
+        self.max_weight = max_weight
+        self.weight = 0
+        self._data: 'OrderedDict[Hashable, Tuple[float, int, Any]]' = \
+            OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expired_at, _, value = item
+        if expired_at <= monotonic():
+            self.pop(key)
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float, weight: int = 1):
+        self.pop(key)
+        too_heavy = self.max_weight is not None and weight > self.max_weight
+        if ttl <= 0 or too_heavy:
+            return
+        self._data[key] = (monotonic() + ttl, weight, value)
+        self.weight += weight
+        while len(self._data) > self.max_size or self._is_overweight():
+            _, (_, evicted_weight, _) = self._data.popitem(last=False)
+            self.weight -= evicted_weight
+
+    def pop(self, key: Hashable):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.weight -= item[1]
+
+    def clear(self):
+        self._data.clear()
+        self.weight = 0
+
+    def _is_overweight(self) -> bool:
+        return self.max_weight is not None and self.weight > self.max_weight
@@ -0,0 +1,48 @@
+from typing import Awaitable, Callable, Dict, Hashable
+
+from api_gateway.settings import CoalescingSettings
+
+from .base import BaseService
+from .responses import Headers, ProxyResponse
+from .singleflight import SingleFlight
+
+# Request headers the upstream response depends on, "x-user-id" is the
+# identity of an authorized caller
+VARY_HEADERS = ('x-user-id', 'accept-encoding',
+                'if-none-match', 'if-modified-since')
+
+
+class CoalescingService(BaseService):
+    """
+    Collapses identical concurrent upstream GET requests into one call,
+    every waiter receives the same response.
+    """
+
+    def __init__(self, conf: CoalescingSettings):
+        self.conf = conf
+        self.single_flight = SingleFlight()
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @staticmethod
+    def make_key(method: str, url: str, headers: Headers) -> Hashable:
+        values = dict((key.lower(), value) for key, value in headers)
+        return (method, url) + tuple(values.get(h) for h in VARY_HEADERS)
+
+    async def do(self, key: Hashable,
+                 func: Callable[[], Awaitable[ProxyResponse]]) \
+            -> ProxyResponse:
+        if not self.conf.ENABLED:
+            return await func()
+        return await self.single_flight.do(key, func)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            'calls': self.single_flight.calls,
+            'collapsed': self.single_flight.collapsed
+        }
@@ -0,0 +1,37 @@
+from typing import List
+
+from api_gateway.settings import Settings
+
+from .base import BaseService, BaseController
+from .upstreams import UpstreamsStorage
+from .tokens import TokensService
+from .ws import FeedRelayService
+from .responses import ResponseCacheService
+from .coalescing import CoalescingService
+
+
+class DependencyInjector(BaseController):
+    upstreams: UpstreamsStorage
+    tokens: TokensService
+    feed_relay: FeedRelayService
+    response_cache: ResponseCacheService
+    coalescing: CoalescingService
+
+    def __init__(self, conf: Settings):
+        self.conf = conf
+        self.upstreams = UpstreamsStorage(conf)
+        self.tokens = TokensService(conf.TOKEN_CACHE, conf.AUTH,
+                                    self.upstreams)
+        self.feed_relay = FeedRelayService(conf.WEBSOCKET, conf.MONOLITH)
+        self.response_cache = ResponseCacheService(conf.RESPONSE_CACHE)
+        self.coalescing = CoalescingService(conf.COALESCING)
+
+    @property
+    def services(self) -> List[BaseService]:
+        return [
+            self.upstreams,
+            self.tokens,
+            self.feed_relay,
+            self.response_cache,
+            self.coalescing
+        ]
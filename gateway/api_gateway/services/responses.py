@@ -0,0 +1,109 @@
+from hashlib import md5
+from time import monotonic
+from dataclasses import dataclass
+from urllib.parse import urlencode
+from typing import Iterable, List, Optional, Tuple
+
+from api_gateway.settings import ResponseCacheSettings
+
+from .base import BaseService
+from .cache import LRUCache
+
+Headers = List[Tuple[str, str]]
+
+
+@dataclass(frozen=True)
+class ProxyResponse:
+    """
+    Upstream response read into memory.
+    """
+    status_code: int
+    headers: Headers
+    content: bytes
+
+    def get_header(self, name: str) -> Optional[str]:
+        for key, value in self.headers:
+            if key.lower() == name:
+                return value
+        return None
+
+    @property
+    def size(self) -> int:
+        headers_size = sum(len(k) + len(v) for k, v in self.headers)
+        return len(self.content) + headers_size
+
+
+@dataclass
+class CacheEntry:
+    response: ProxyResponse
+    etag: str
+    # Only ETag issued by upstream can be revalidated against it
+    revalidate: bool
+    fresh_until: float
+
+    @property
+    def is_fresh(self) -> bool:
+        return monotonic() < self.fresh_until
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        tags = {tag.strip() for tag in if_none_match.split(',')}
+        return '*' in tags or strip_weak(self.etag) in {
+            strip_weak(tag) for tag in tags
+        }
+
+
+def strip_weak(etag: str) -> str:
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def make_etag(content: bytes) -> str:
+    return f'"{md5(content).hexdigest()}"'
+
+
+class ResponseCacheService(BaseService):
+    """
+    Memory bounded LRU cache of upstream responses for public GET routes.
+    Entries with an upstream ETag are kept for MAX_STALE seconds after
+    expiration, so they can be revalidated with If-None-Match instead of
+    downloading the body again.
+    """
+
+    def __init__(self, conf: ResponseCacheSettings):
+        self.conf = conf
+        self.cache = LRUCache(conf.MAX_SIZE, max_weight=conf.MAX_MEMORY)
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        self.cache.clear()
+
+    @staticmethod
+    def make_key(path: str, query_params: Iterable[Tuple[str, str]]) -> str:
+        return f'{path}?{urlencode(sorted(query_params))}'
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        return self.cache.get(key, None)
+
+    def set(self, key: str, response: ProxyResponse, ttl: float) \
+            -> CacheEntry:
+        upstream_etag = response.get_header('etag')
+        entry = CacheEntry(
+            response=response,
+            etag=upstream_etag or make_etag(response.content),
+            revalidate=upstream_etag is not None,
+            fresh_until=monotonic() + ttl
+        )
+        self._store(key, entry, ttl)
+        return entry
+
+    def refresh(self, key: str, entry: CacheEntry, ttl: float):
+        entry.fresh_until = monotonic() + ttl
+        self._store(key, entry, ttl)
+
+    def _store(self, key: str, entry: CacheEntry, ttl: float):
+        if entry.revalidate:
+            ttl += self.conf.MAX_STALE
+        self.cache.set(key, entry, ttl, weight=entry.response.size)
@@ -0,0 +1,55 @@
+from time import time
+from typing import Optional
+
+from api_gateway.models.response import AccessToken
+from api_gateway.settings import ServiceSettings, TokenCacheSettings
+
+from .base import BaseService
+from .cache import LRUCache, MISSING
+from .singleflight import SingleFlight
+from .upstreams import UpstreamsStorage
+
+
+class TokensService(BaseService):
+    """
+    Validates access tokens against the auth service. Valid tokens are cached
+    until they expire, invalid ones for a short time, and concurrent checks
+    of the same token share one upstream call.
+    """
+
+    def __init__(self, conf: TokenCacheSettings, auth_conf: ServiceSettings,
+                 upstreams: UpstreamsStorage):
+        self.conf = conf
+        self.auth_conf = auth_conf
+        self.upstreams = upstreams
+        self.cache = LRUCache(conf.MAX_SIZE)
+        self.single_flight = SingleFlight()
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        self.cache.clear()
+
+    async def get(self, value: Optional[str]) -> Optional[AccessToken]:
+        if not value:
+            return None
+        token = self.cache.get(value)
+        if token is not MISSING:
+            return token
+        return await self.single_flight.do(value, lambda: self._fetch(value))
+
+    async def _fetch(self, value: str) -> Optional[AccessToken]:
+        upstream = self.upstreams.get_upstream(self.auth_conf)
+        response = await upstream.request('PUT', '/tokens/',
+                                          json={'value': value})
+        if response.is_error:
+            # Server errors are not an answer about the token itself
+            if response.status_code < 500:
+                self.cache.set(value, None, self.conf.NEGATIVE_TTL)
+            return None
+
+        token = AccessToken(**response.json())
+        ttl = min(token.expired_at - time(), self.conf.TTL)
+        self.cache.set(value, token, ttl)
+        return token
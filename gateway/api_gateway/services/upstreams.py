@@ -0,0 +1,207 @@
+import asyncio
+from time import monotonic
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import httpx
+import httpcore
+from prometheus_client import Histogram
+
+from api_gateway.settings import Settings, ServiceSettings
+
+from .base import BaseService, BaseController
+from .breaker import CircuitBreaker
+
+
+# Here rather than in api_gateway.metrics, which imports services
+CONNECTION_DURATION = Histogram(
+    'gateway_upstream_connection_duration_seconds',
+    'Time spent getting an upstream connection before sending a request: '
+    'waiting for the pool ("pool") and opening a new one ("connect")',
+    ('upstream', 'stage')
+)
+
+# Moment the request of the current task asked the pool for a connection
+pool_requested: ContextVar[Optional[float]] = ContextVar('pool_requested',
+                                                         default=None)
+
+
+class TimedConnectionPool(httpcore.AsyncConnectionPool):
+    """
+    Connection pool which exports the time requests wait for a connection
+    and the time of opening connections apart from the response time, so
+    that a saturated pool can be told apart from a slow upstream. Hooks
+    internals of the pinned httpcore version.
+    """
+
+    def __init__(self, name: str, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.name = name
+
+    async def arequest(self, *args: Any, **kwargs: Any):
+        token = pool_requested.set(monotonic())
+        try:
+            return await super().arequest(*args, **kwargs)
+        finally:
+            pool_requested.reset(token)
+
+    def _create_connection(self, origin):
+        connection = super()._create_connection(origin)
+        arequest, open_socket = connection.arequest, connection._open_socket
+        pool = CONNECTION_DURATION.labels(self.name, 'pool')
+        connect = CONNECTION_DURATION.labels(self.name, 'connect')
+
+        async def timed_arequest(*args: Any, **kwargs: Any):
+            # Called once the pool gave the connection, observed once
+            # even if the request is retried on a new connection
+            if (requested := pool_requested.get()) is not None:
+                pool.observe(monotonic() - requested)
+                pool_requested.set(None)
+            return await arequest(*args, **kwargs)
+
+        async def timed_open_socket(*args: Any, **kwargs: Any):
+            started = monotonic()
+            try:
+                return await open_socket(*args, **kwargs)
+            finally:
+                connect.observe(monotonic() - started)
+
+        connection.arequest = timed_arequest
+        connection._open_socket = timed_open_socket
+        return connection
+
+
+class UpstreamError(Exception):
+    status_code = 502
+
+
+class UpstreamTimeout(UpstreamError):
+    status_code = 504
+
+
+class UpstreamUnavailable(UpstreamError):
+    """
+    Request was not sent: the circuit is open or the upstream has too many
+    requests in flight.
+    """
+    status_code = 503
+
+
+class Upstream(BaseService):
+    """
+    Pooled client of an upstream service guarded by a circuit breaker and
+    a cap on requests in flight. A request stays in flight until its
+    response is closed with `finish`.
+    """
+    client: httpx.AsyncClient
+
+    def __init__(self, conf: ServiceSettings, name: str):
+        self.conf = conf
+        self.name = name
+        self.base_url = f'http://{conf.HOST}:{conf.PORT}'
+        self.breaker = CircuitBreaker(conf.CIRCUIT_BREAKER)
+        self.in_flight = 0
+        self._responses: Set[httpx.Response] = set()
+
+    async def start(self):
+        c = self.conf
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            transport=TimedConnectionPool(
+                self.name,
+                max_connections=c.MAX_CONNECTIONS,
+                max_keepalive_connections=c.MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=c.KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(c.TIMEOUT, connect=c.CONNECT_TIMEOUT)
+        )
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def send(self, request: httpx.Request) -> httpx.Response:
+        """
+        Sends the request and returns the response with unread body.
+        """
+        if self.in_flight >= self.conf.MAX_IN_FLIGHT or \
+                not self.breaker.allow():
+            raise UpstreamUnavailable()
+
+        self.in_flight += 1
+        started = monotonic()
+        try:
+            response = await self.client.send(request, stream=True)
+        except asyncio.CancelledError:
+            # The client went away, which says nothing of the upstream
+            self.in_flight -= 1
+            self.breaker.release()
+            raise
+        except Exception as e:
+            self.in_flight -= 1
+            self.breaker.record(True, monotonic() - started)
+            if isinstance(e, httpx.TimeoutException):
+                raise UpstreamTimeout() from e
+            if isinstance(e, httpx.TransportError):
+                raise UpstreamError() from e
+            raise
+        self.breaker.record(response.status_code >= 500,
+                            monotonic() - started)
+        self._responses.add(response)
+        return response
+
+    async def finish(self, response: httpx.Response):
+        """
+        Closes the response and frees its in-flight slot, safe to call twice.
+        """
+        try:
+            await response.aclose()
+        finally:
+            if response in self._responses:
+                self._responses.remove(response)
+                self.in_flight -= 1
+
+    async def request(self, method: str, url: str, **kwargs: Any) \
+            -> httpx.Response:
+        response = await self.send(
+            self.client.build_request(method, url, **kwargs)
+        )
+        try:
+            await response.aread()
+        finally:
+            await self.finish(response)
+        return response
+
+
+class UpstreamsStorage(BaseController):
+    """
+    One long-lived keep-alive client per upstream service, so proxied calls
+    reuse pooled connections instead of opening a new one every time.
+    """
+
+    def __init__(self, conf: Settings):
+        self.conf = conf
+        self._upstreams: Dict[str, Upstream] = {}
+        # Serializing settings on every lookup is slow, so upstreams are
+        # also remembered by settings object identity (the object is kept
+        # referenced, so its id is never reused)
+        self._by_id: Dict[int, Tuple[ServiceSettings, Upstream]] = {}
+        for name, service_conf in (('monolith', conf.MONOLITH),
+                                   ('messages', conf.MESSAGES),
+                                   ('auth', conf.AUTH)):
+            self._upstreams.setdefault(service_conf.json(),
+                                       Upstream(service_conf, name))
+
+    @property
+    def services(self) -> List[BaseService]:
+        return list(self._upstreams.values())
+
+    @property
+    def upstreams(self) -> List[Upstream]:
+        return list(self._upstreams.values())
+
+    def get_upstream(self, conf: ServiceSettings) -> Upstream:
+        if (item := self._by_id.get(id(conf))) is not None:
+            return item[1]
+        upstream = self._upstreams[conf.json()]
+        self._by_id[id(conf)] = (conf, upstream)
+        return upstream
@@ -0,0 +1,218 @@
+import asyncio
+from json import dumps, loads
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+import websockets
+from websockets import ConnectionClosed, WebSocketClientProtocol
+from starlette.websockets import WebSocket, WebSocketState
+
+from api_gateway.settings import ServiceSettings, WebSocketSettings
+
+from .base import BaseService
+
+FEED_PATH = '/news/ws'
+MULTIPLEXED_FEED_PATH = '/news/ws/multiplex'
+
+Send = Callable[[str], Awaitable[None]]
+
+
+async def wait_first(*coros: Awaitable):
+    """
+    Runs coroutines concurrently until the first of them finishes,
+    the others are cancelled.
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def pump_client(client_ws: WebSocket, send: Optional[Send] = None):
+    while True:
+        message = await client_ws.receive()
+        if message['type'] == 'websocket.disconnect':
+            return
+        text = message.get('text')
+        if send and text is not None:
+            # Waits for the upstream write buffer to drain (backpressure)
+            await send(text)
+
+
+async def pump_upstream(upstream: WebSocketClientProtocol,
+                        client_ws: WebSocket):
+    try:
+        async for message in upstream:
+            if isinstance(message, bytes):
+                await client_ws.send_bytes(message)
+            else:
+                await client_ws.send_text(message)
+    except ConnectionClosed:
+        pass
+
+
+async def pump_queue(queue: asyncio.Queue, client_ws: WebSocket):
+    while (message := await queue.get()) is not None:
+        await client_ws.send_text(message)
+
+
+async def close_client(client_ws: WebSocket, code: int = 1000):
+    if client_ws.client_state == WebSocketState.DISCONNECTED or \
+            client_ws.application_state == WebSocketState.DISCONNECTED:
+        return
+    try:
+        await client_ws.close(code)
+    except RuntimeError:
+        # Client has gone away in the meantime
+        pass
+
+
+def put_or_drop(queue: asyncio.Queue, message: Optional[str]):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        # Slow client: disconnect it instead of stalling other feeds
+        queue.get_nowait()
+        queue.put_nowait(None)
+
+
+class MultiplexedConnection:
+    """
+    Upstream socket which carries feeds of many users. Messages from
+    the upstream are wrapped as {"user_id": ..., "data": ...}.
+    """
+
+    def __init__(self, relay: 'FeedRelayService'):
+        self.relay = relay
+        self.subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self.upstream: Optional[WebSocketClientProtocol] = None
+        self.reader: Optional[asyncio.Task] = None
+        self.lock = asyncio.Lock()
+
+    async def subscribe(self, user_id: int, queue: asyncio.Queue):
+        async with self.lock:
+            if self.upstream is None or self.upstream.closed:
+                self.upstream = await self.relay.connect(MULTIPLEXED_FEED_PATH)
+                self.reader = asyncio.ensure_future(self.read(self.upstream))
+            queues = self.subscribers.setdefault(user_id, set())
+            queues.add(queue)
+            if len(queues) == 1:
+                await self.send('subscribe', user_id)
+
+    async def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        async with self.lock:
+            queues = self.subscribers.get(user_id, set())
+            queues.discard(queue)
+            if queues:
+                return
+            self.subscribers.pop(user_id, None)
+            await self.send('unsubscribe', user_id)
+
+    async def send(self, action: str, user_id: int):
+        if self.upstream is None or self.upstream.closed:
+            return
+        try:
+            await self.upstream.send(dumps({'action': action,
+                                            'user_id': user_id}))
+        except ConnectionClosed:
+            pass
+
+    async def read(self, upstream: WebSocketClientProtocol):
+        try:
+            async for raw in upstream:
+                message = loads(raw)
+                queues = self.subscribers.get(message['user_id'], ())
+                # Serialize once for every client of the user
+                data = dumps(message['data'])
+                for queue in list(queues):
+                    put_or_drop(queue, data)
+        except ConnectionClosed:
+            pass
+        finally:
+            if self.upstream is upstream:
+                # Clients reconnect by themselves and resubscribe
+                for queues in self.subscribers.values():
+                    for queue in queues:
+                        put_or_drop(queue, None)
+                self.subscribers = {}
+                self.upstream = None
+
+    async def close(self):
+        if self.reader:
+            self.reader.cancel()
+        if self.upstream:
+            await self.upstream.close()
+
+
+class FeedRelayService(BaseService):
+    """
+    Relays the real-time news feed between clients and the monolith.
+
+    By default every client gets its own upstream socket and messages are
+    pumped both ways. In multiplexed mode clients share a few upstream
+    sockets, one upstream subscription per user.
+    """
+    connections: List[MultiplexedConnection]
+
+    def __init__(self, conf: WebSocketSettings, service_conf: ServiceSettings):
+        self.conf = conf
+        self.base_uri = f'ws://{service_conf.HOST}:{service_conf.PORT}'
+        self.connections = []
+
+    async def start(self):
+        if self.conf.MULTIPLEX:
+            self.connections = [
+                MultiplexedConnection(self)
+                for _ in range(self.conf.MULTIPLEX_CONNECTIONS)
+            ]
+
+    async def close(self):
+        for connection in self.connections:
+            await connection.close()
+
+    async def connect(self, path: str) -> WebSocketClientProtocol:
+        c = self.conf
+        return await websockets.connect(
+            self.base_uri + path,
+            ping_interval=c.PING_INTERVAL,
+            ping_timeout=c.PING_TIMEOUT,
+            close_timeout=c.CLOSE_TIMEOUT,
+            max_size=c.MAX_MESSAGE_SIZE,
+            max_queue=c.MAX_QUEUE,
+            read_limit=c.BUFFER_SIZE,
+            write_limit=c.BUFFER_SIZE
+        )
+
+    async def relay(self, client_ws: WebSocket, user_id: int):
+        try:
+            if self.connections:
+                await self._relay_multiplexed(client_ws, user_id)
+            else:
+                await self._relay_direct(client_ws, user_id)
+        finally:
+            await close_client(client_ws)
+
+    async def _relay_direct(self, client_ws: WebSocket, user_id: int):
+        upstream = await self.connect(FEED_PATH)
+        try:
+            await upstream.send(dumps({'value': user_id}))
+            await wait_first(
+                pump_upstream(upstream, client_ws),
+                pump_client(client_ws, upstream.send)
+            )
+        finally:
+            await upstream.close()
+
+    async def _relay_multiplexed(self, client_ws: WebSocket, user_id: int):
+        connection = self.connections[user_id % len(self.connections)]
+        queue = asyncio.Queue(self.conf.MAX_QUEUE)
+        await connection.subscribe(user_id, queue)
+        try:
+            await wait_first(
+                pump_queue(queue, client_ws),
+                pump_client(client_ws)
+            )
+        finally:
+            await connection.unsubscribe(user_id, queue)
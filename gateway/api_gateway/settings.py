@@ -5,9 +5,62 @@ from copy import deepcopy
 from pydantic import BaseModel, BaseSettings as PydanticSettings
 
 
+class CircuitBreakerSettings(BaseModel):
+    # Outcomes of the last WINDOW seconds decide whether to open the circuit
+    WINDOW: float = 10
+    MIN_REQUESTS: int = 20
+    ERROR_RATE: float = 0.5
+    SLOW_CALL_DURATION: float = 2
+    SLOW_CALL_RATE: float = 0.8
+    OPEN_TIMEOUT: float = 5
+    HALF_OPEN_REQUESTS: int = 3
+
+
 class ServiceSettings(BaseModel):
     HOST: str = '0.0.0.0'
     PORT: int = 9999
+    MAX_CONNECTIONS: int = 100
+    MAX_KEEPALIVE_CONNECTIONS: int = 20
+    KEEPALIVE_EXPIRY: float = 30
+    TIMEOUT: float = 10
+    CONNECT_TIMEOUT: float = 1
+    # Requests past the limit fail fast with 503 instead of queueing
+    MAX_IN_FLIGHT: int = 200
+    CIRCUIT_BREAKER: CircuitBreakerSettings = CircuitBreakerSettings()
+
+
+class TokenCacheSettings(BaseModel):
+    MAX_SIZE: int = 10000
+    TTL: float = 5 * 60
+    NEGATIVE_TTL: float = 5
+
+
+class ResponseCacheSettings(BaseModel):
+    MAX_SIZE: int = 10000
+    MAX_MEMORY: int = 64 * 2 ** 20
+    # How long expired entries are kept for revalidation with upstream ETag
+    MAX_STALE: float = 60
+
+
+class CoalescingSettings(BaseModel):
+    ENABLED: bool = True
+
+
+class BatchSettings(BaseModel):
+    MAX_REQUESTS: int = 20
+
+
+class WebSocketSettings(BaseModel):
+    # Share a few upstream sockets between all client feeds
+    MULTIPLEX: bool = False
+    MULTIPLEX_CONNECTIONS: int = 4
+    PING_INTERVAL: float = 20
+    PING_TIMEOUT: float = 20
+    CLOSE_TIMEOUT: float = 5
+    MAX_MESSAGE_SIZE: int = 2 ** 20
+    MAX_QUEUE: int = 16
+    # Small buffers keep idle sockets cheap
+    BUFFER_SIZE: int = 2 ** 14
 
 
 class UvicornSettings(BaseModel):
@@ -52,6 +105,13 @@ class Settings(BaseSettings):
     MONOLITH: ServiceSettings = ServiceSettings()
     MESSAGES: ServiceSettings = ServiceSettings(PORT=10000)
     AUTH: ServiceSettings = ServiceSettings(PORT=9900)
+    TOKEN_CACHE: TokenCacheSettings = TokenCacheSettings()
+    WEBSOCKET: WebSocketSettings = WebSocketSettings()
+    RESPONSE_CACHE: ResponseCacheSettings = ResponseCacheSettings()
+    COALESCING: CoalescingSettings = CoalescingSettings()
+    BATCH: BatchSettings = BatchSettings()
+    # Proxy MAPPING routes without FastAPI request validation
+    FAST_PATH: bool = True
 
 
 settings = Settings.from_json(CONFIG_PATH)
@@ -1,14 +1,32 @@
-from typing import Callable, Type, Optional
+from typing import (
+    Callable,
+    Type,
+    Optional,
+    Iterable,
+    Tuple,
+    Union,
+    AsyncIterator
+)
 from inspect import signature, Parameter
+from urllib.parse import urlencode
 
 from fastapi import Request, APIRouter, Header, HTTPException
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse, JSONResponse
+from starlette.background import BackgroundTask
+from starlette.requests import HTTPConnection
 
 import httpx
 
+from api_gateway.metrics import (
+    AUTH_DURATION,
+    UPSTREAM_DURATION,
+    observe,
+    track_request
+)
 from api_gateway.models.path_info import PathInfo
+from api_gateway.services import DependencyInjector, Upstream, UpstreamError
 from api_gateway.models.response import AccessToken
-from api_gateway.settings import settings
+from api_gateway.services.responses import CacheEntry, ProxyResponse, Headers
 
 
 def add_param(func: Callable, name: str, annotation: Type,
@@ -32,43 +50,251 @@ def delete_kwargs(func: Callable):
     func.__signature__ = sig.replace(parameters=params)
 
 
-async def get_token_by_value(token: str) -> Optional[AccessToken]:
-    url = f'http://{settings.AUTH.HOST}:{settings.AUTH.PORT}'
-    async with httpx.AsyncClient(base_url=url) as client:
-        response = await client.put(f'/tokens/', json={'value': token})
-    if not response.is_error:
-        return AccessToken(**response.json())
+# Headers meaningful only for a single transport-level connection (RFC 7230)
+HOP_BY_HOP_HEADERS = frozenset((
+    'connection',
+    'keep-alive',
+    'proxy-authenticate',
+    'proxy-authorization',
+    'te',
+    'trailer',
+    'trailers',
+    'transfer-encoding',
+    'upgrade',
+))
+# Set by the gateway itself, must never come from the client
+REQUEST_EXCLUDED_HEADERS = HOP_BY_HOP_HEADERS | {'host', 'x-user-id'}
+# Body is re-framed by the gateway server, which also sets its own
+# Date and Server (otherwise cached responses would replay a stale Date)
+RESPONSE_EXCLUDED_HEADERS = HOP_BY_HOP_HEADERS | {
+    'content-length', 'date', 'server'
+}
+CONDITIONAL_HEADERS = frozenset(('if-none-match', 'if-modified-since'))
+# Cached bodies are served to every client, whatever encodings it accepts
+CACHE_EXCLUDED_HEADERS = CONDITIONAL_HEADERS | {'accept-encoding'}
+
+
+def filter_headers(headers: Iterable[Tuple[str, str]],
+                   excluded: frozenset) -> Headers:
+    headers = list(headers)
+    # Headers listed in "Connection" are hop-by-hop too
+    connection_headers = {
+        name.strip().lower()
+        for key, value in headers if key.lower() == 'connection'
+        for name in value.split(',')
+    }
+    return [
+        (key, value) for key, value in headers
+        if key.lower() not in excluded and
+        key.lower() not in connection_headers
+    ]
+
+
+async def upstream_error_handler(request: Request, exc: UpstreamError) \
+        -> Response:
+    return JSONResponse(status_code=exc.status_code,
+                        content={'detail': 'Upstream service is unavailable.'})
+
+
+def get_injector(connection: HTTPConnection) -> DependencyInjector:
+    return connection.app.state.dependency_injector
+
+
+def get_request_content(request: Request) -> Optional[AsyncIterator[bytes]]:
+    headers = request.headers
+    if 'content-length' in headers or 'transfer-encoding' in headers:
+        return request.stream()
+    return None
+
+
+async def send_upstream(injector: DependencyInjector, path_info: PathInfo,
+                        request: Request, headers: Headers) \
+        -> Tuple[Upstream, httpx.Response]:
+    service_path = path_info.service_path.format(**request.path_params)
+    upstream = injector.upstreams.get_upstream(path_info.service)
+    upstream_request = upstream.client.build_request(
+        url=service_path,
+        method=path_info.method,
+        params=request.query_params.multi_items(),
+        content=get_request_content(request),
+        headers=headers
+    )
+    with observe(UPSTREAM_DURATION, path_info):
+        return upstream, await upstream.send(upstream_request)
+
+
+async def read_response(upstream: Upstream, response: httpx.Response) \
+        -> ProxyResponse:
+    try:
+        # Raw bytes are passed as is, so Content-Encoding stays valid
+        content = b''.join([chunk async for chunk in response.aiter_raw()])
+    finally:
+        await upstream.finish(response)
+    return ProxyResponse(
+        status_code=response.status_code,
+        headers=filter_headers(response.headers.items(),
+                               RESPONSE_EXCLUDED_HEADERS),
+        content=content
+    )
+
+
+async def fetch_response(injector: DependencyInjector, path_info: PathInfo,
+                         request: Request, headers: Headers) -> ProxyResponse:
+    async def fetch() -> ProxyResponse:
+        return await read_response(
+            *await send_upstream(injector, path_info, request, headers)
+        )
+
+    if path_info.method != 'GET' or get_request_content(request) is not None:
+        return await fetch()
+    service = path_info.service
+    url = (f'{service.HOST}:{service.PORT}'
+           f'{path_info.service_path.format(**request.path_params)}?'
+           f'{urlencode(sorted(request.query_params.multi_items()))}')
+    coalescing = injector.coalescing
+    key = coalescing.make_key(path_info.method, url, headers)
+    return await coalescing.do(key, fetch)
+
+
+async def iter_response(upstream: Upstream, response: httpx.Response) \
+        -> AsyncIterator[bytes]:
+    try:
+        async for chunk in response.aiter_raw():
+            yield chunk
+    finally:
+        await upstream.finish(response)
+
+
+def make_streaming_response(upstream: Upstream, response: httpx.Response) \
+        -> StreamingResponse:
+    return StreamingResponse(
+        iter_response(upstream, response),
+        status_code=response.status_code,
+        headers=dict(filter_headers(response.headers.items(),
+                                    RESPONSE_EXCLUDED_HEADERS)),
+        # In case the body was never iterated
+        background=BackgroundTask(upstream.finish, response)
+    )
+
+
+def make_response(response: ProxyResponse) -> Response:
+    return Response(
+        status_code=response.status_code,
+        content=response.content,
+        headers=dict(response.headers)
+    )
+
+
+async def get_cache_entry(injector: DependencyInjector, path_info: PathInfo,
+                          request: Request, headers: Headers) \
+        -> Union[CacheEntry, ProxyResponse]:
+    """
+    Returns the cache entry of the request, or the upstream response if it
+    can't be cached.
+    """
+    cache = injector.response_cache
+    key = cache.make_key(request.url.path, request.query_params.multi_items())
+    entry = cache.get(key)
+    if entry is not None and entry.is_fresh:
+        return entry
+
+    # Full body is needed for the cache, not the client's 304, and it
+    # must not be encoded, as the key doesn't depend on Accept-Encoding
+    headers = filter_headers(headers, CACHE_EXCLUDED_HEADERS)
+    headers.append(('accept-encoding', 'identity'))
+    if entry is not None and entry.revalidate:
+        headers.append(('if-none-match', entry.etag))
+
+    response = await fetch_response(injector, path_info, request, headers)
+    if response.status_code == 304 and entry is not None:
+        cache.refresh(key, entry, path_info.cache_ttl)
+        return entry
+    if response.status_code == 200:
+        return cache.set(key, response, path_info.cache_ttl)
+    return response
+
+
+async def get_cached_response(injector: DependencyInjector,
+                              path_info: PathInfo,
+                              request: Request,
+                              headers: Headers) -> Response:
+    entry = await get_cache_entry(injector, path_info, request, headers)
+    if isinstance(entry, ProxyResponse):
+        return make_response(entry)
+
+    if entry.matches(request.headers.get('if-none-match')):
+        return Response(status_code=304, headers={'etag': entry.etag})
+    response = make_response(entry.response)
+    response.headers['etag'] = entry.etag
+    return response
+
+
+async def authorize(injector: DependencyInjector,
+                    auth_token: Optional[str]) -> AccessToken:
+    if not (token := await injector.tokens.get(auth_token)):
+        raise HTTPException(status_code=401)
+    return token
+
+
+def get_upstream_headers(request: Request,
+                         token: Optional[AccessToken]) -> Headers:
+    headers = filter_headers(request.headers.items(),
+                             REQUEST_EXCLUDED_HEADERS)
+    if token is not None:
+        headers.append(('x-user-id', str(token.user_id)))
+    return headers
+
+
+async def fetch(request: Request, path_info: PathInfo,
+                token: Optional[AccessToken]) -> ProxyResponse:
+    """
+    Reads the whole upstream response of an already authorized request,
+    streaming routes included.
+    """
+    injector = get_injector(request)
+    headers = get_upstream_headers(request, token)
+    if path_info.cache_ttl:
+        entry = await get_cache_entry(injector, path_info, request, headers)
+        if isinstance(entry, CacheEntry):
+            return entry.response
+        return entry
+    return await fetch_response(injector, path_info, request, headers)
+
+
+async def proxy(request: Request, path_info: PathInfo,
+                auth_token: Optional[str] = None) -> Response:
+    with track_request(path_info) as tracker:
+        response = await forward(request, path_info, auth_token)
+        tracker.status_code = response.status_code
+        return response
+
+
+async def forward(request: Request, path_info: PathInfo,
+                  auth_token: Optional[str]) -> Response:
+    injector = get_injector(request)
+    token = None
+    if path_info.authorized:
+        with observe(AUTH_DURATION, path_info):
+            token = await authorize(injector, auth_token)
+    headers = get_upstream_headers(request, token)
+
+    if path_info.cache_ttl:
+        return await get_cached_response(injector, path_info, request,
+                                         headers)
+
+    if path_info.streaming:
+        return make_streaming_response(
+            *await send_upstream(injector, path_info, request, headers)
+        )
+    return make_response(
+        await fetch_response(injector, path_info, request, headers)
+    )
 
 
 def generate_handler(name: str, path_info: PathInfo, router: APIRouter) \
         -> Callable:
     async def handler(request: Request, **kwargs):
-        token = None
-        if path_info.authorized:
-            raw_token = kwargs.get('x_auth_token', '')
-            if not (token := await get_token_by_value(raw_token)):
-                raise HTTPException(status_code=401)
-
-        host, port = path_info.service.HOST, path_info.service.PORT
-        service_path = path_info.service_path.format(**request.path_params)
-        url = f'http://{host}:{port}{service_path}'
-        headers = [(k, v) for k, v in request.headers.items()]
-        if token:
-            headers.append(('x-user-id', str(token.user_id)))
-
-        async with httpx.AsyncClient() as client:
-            response = await client.request(
-                url=url,
-                method=path_info.method,
-                params=request.query_params,
-                content=await request.body(),
-                headers=headers
-            )
-        return Response(
-            status_code=response.status_code,
-            content=response.content,
-            headers=response.headers
-        )
+        return await proxy(request, path_info, kwargs.get('x_auth_token'))
 
     delete_kwargs(handler)
 
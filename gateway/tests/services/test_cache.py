@@ -0,0 +1,91 @@
+import pytest
+
+from api_gateway.services import cache
+from api_gateway.services.cache import LRUCache, MISSING
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(name='clock')
+def fake_clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(cache, 'monotonic', clock)
+    return clock
+
+
+def test_get_missing(clock):
+    lru = LRUCache(2)
+    assert lru.get('a') is MISSING
+    assert lru.get('a', None) is None
+
+
+def test_expires(clock):
+    lru = LRUCache(2)
+    lru.set('a', 1, ttl=10)
+    clock.now = 9.9
+    assert lru.get('a') == 1
+    clock.now = 10
+    assert lru.get('a') is MISSING
+    assert len(lru) == 0
+
+
+def test_ttl_per_entry(clock):
+    lru = LRUCache(2)
+    lru.set('a', 1, ttl=5)
+    lru.set('b', 2, ttl=20)
+    clock.now = 10
+    assert lru.get('a') is MISSING
+    assert lru.get('b') == 2
+
+
+def test_non_positive_ttl_is_not_cached(clock):
+    lru = LRUCache(2)
+    lru.set('a', 1, ttl=10)
+    lru.set('a', 2, ttl=-1)
+    assert lru.get('a') is MISSING
+
+
+def test_evicts_least_recently_used(clock):
+    lru = LRUCache(2)
+    lru.set('a', 1, ttl=10)
+    lru.set('b', 2, ttl=10)
+    lru.get('a')
+    lru.set('c', 3, ttl=10)
+    assert lru.get('b') is MISSING
+    assert lru.get('a') == 1 and lru.get('c') == 3
+
+
+def test_cached_none(clock):
+    lru = LRUCache(2)
+    lru.set('a', None, ttl=10)
+    assert lru.get('a') is None
+
+
+def test_max_weight(clock):
+    lru = LRUCache(10, max_weight=100)
+    lru.set('a', 'a', ttl=10, weight=60)
+    lru.set('b', 'b', ttl=10, weight=30)
+    lru.set('c', 'c', ttl=10, weight=30)
+    assert lru.get('a') is MISSING
+    assert lru.weight == 60
+    # Heavier than the whole cache
+    lru.set('d', 'd', ttl=10, weight=101)
+    assert lru.get('d') is MISSING
+    assert lru.weight == 60
+
+
+def test_replacing_keeps_weight(clock):
+    lru = LRUCache(10, max_weight=100)
+    lru.set('a', 'a', ttl=10, weight=60)
+    lru.set('a', 'b', ttl=10, weight=50)
+    assert lru.weight == 50
+    lru.pop('a')
+    lru.pop('a')
+    assert lru.weight == 0
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from api_gateway.services.singleflight import SingleFlight
+
+
+class Call:
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self) -> int:
+        self.calls += 1
+        await self.release.wait()
+        return self.calls
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_shared():
+    single_flight, call = SingleFlight(), Call()
+    callers = [
+        asyncio.ensure_future(single_flight.do('key', call))
+        for _ in range(3)
+    ]
+    await asyncio.sleep(0)
+    call.release.set()
+    assert await asyncio.gather(*callers) == [1, 1, 1]
+    assert call.calls == 1
+    assert (single_flight.calls, single_flight.collapsed) == (1, 2)
+
+
+@pytest.mark.asyncio
+async def test_keys_are_separate():
+    single_flight, call = SingleFlight(), Call()
+    call.release.set()
+    results = await asyncio.gather(single_flight.do('a', call),
+                                   single_flight.do('b', call))
+    assert sorted(results) == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_finished_call_is_forgotten():
+    single_flight, call = SingleFlight(), Call()
+    call.release.set()
+    assert await single_flight.do('key', call) == 1
+    assert await single_flight.do('key', call) == 2
+
+
+@pytest.mark.asyncio
+async def test_error_is_shared_and_forgotten():
+    single_flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0)
+        raise ValueError()
+
+    results = await asyncio.gather(single_flight.do('key', fail),
+                                   single_flight.do('key', fail),
+                                   return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert single_flight.calls == 1
+    with pytest.raises(ValueError):
+        await single_flight.do('key', fail)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_call():
+    single_flight, call = SingleFlight(), Call()
+    first = asyncio.ensure_future(single_flight.do('key', call))
+    second = asyncio.ensure_future(single_flight.do('key', call))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    call.release.set()
+    assert await second == 1
+    assert first.cancelled()
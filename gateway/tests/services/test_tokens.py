@@ -0,0 +1,91 @@
+from time import time
+from typing import List, Optional
+
+import httpx
+import pytest
+
+from api_gateway.services.tokens import TokensService
+from api_gateway.settings import TokenCacheSettings, settings
+
+VALUE = 'token'
+USER_ID = 42
+
+
+class FakeUpstream:
+
+    def __init__(self, responses: List[httpx.Response]):
+        self.responses = responses
+        self.requests = 0
+
+    async def request(self, method: str, url: str, **kwargs) \
+            -> httpx.Response:
+        assert (method, url, kwargs) == ('PUT', '/tokens/',
+                                         {'json': {'value': VALUE}})
+        self.requests += 1
+        return self.responses.pop(0)
+
+
+class FakeUpstreams:
+
+    def __init__(self, upstream: FakeUpstream):
+        self.upstream = upstream
+
+    def get_upstream(self, conf):
+        return self.upstream
+
+
+def make_service(*responses: httpx.Response) -> TokensService:
+    upstream = FakeUpstream(list(responses))
+    conf = TokenCacheSettings(MAX_SIZE=10, TTL=60, NEGATIVE_TTL=5)
+    return TokensService(conf, settings.AUTH, FakeUpstreams(upstream))
+
+
+def token_response(expires_in: float = 3600) -> httpx.Response:
+    return httpx.Response(200, json={'id': 1, 'value': VALUE,
+                                     'user_id': USER_ID,
+                                     'expired_at': time() + expires_in})
+
+
+def requests(service: TokensService) -> int:
+    return service.upstreams.upstream.requests
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('value', [None, ''])
+async def test_no_token(value: Optional[str]):
+    service = make_service()
+    assert await service.get(value) is None
+    assert requests(service) == 0
+
+
+@pytest.mark.asyncio
+async def test_valid_token_is_cached():
+    service = make_service(token_response())
+    token = await service.get(VALUE)
+    assert token.user_id == USER_ID
+    assert await service.get(VALUE) == token
+    assert requests(service) == 1
+
+
+@pytest.mark.asyncio
+async def test_token_is_cached_until_it_expires():
+    service = make_service(token_response(expires_in=-1), token_response())
+    await service.get(VALUE)
+    await service.get(VALUE)
+    assert requests(service) == 2
+
+
+@pytest.mark.asyncio
+async def test_invalid_token_is_cached():
+    service = make_service(httpx.Response(404))
+    assert await service.get(VALUE) is None
+    assert await service.get(VALUE) is None
+    assert requests(service) == 1
+
+
+@pytest.mark.asyncio
+async def test_auth_errors_are_not_cached():
+    service = make_service(httpx.Response(503), token_response())
+    assert await service.get(VALUE) is None
+    assert (await service.get(VALUE)).user_id == USER_ID
+    assert requests(service) == 2
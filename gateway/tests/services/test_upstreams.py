@@ -0,0 +1,141 @@
+import asyncio
+
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from api_gateway.services.breaker import CircuitState
+from api_gateway.services.upstreams import (
+    TimedConnectionPool,
+    Upstream,
+    UpstreamError,
+    UpstreamUnavailable
+)
+from api_gateway.settings import (
+    CircuitBreakerSettings,
+    ServiceSettings
+)
+
+
+@pytest.fixture(name='make_upstream')
+async def upstream_factory():
+    upstreams = []
+
+    def make_upstream(handler) -> Upstream:
+        conf = ServiceSettings(
+            MAX_IN_FLIGHT=2,
+            CIRCUIT_BREAKER=CircuitBreakerSettings(MIN_REQUESTS=2,
+                                                   HALF_OPEN_REQUESTS=1)
+        )
+        upstream = Upstream(conf, 'monolith')
+        upstream.client = httpx.AsyncClient(
+            base_url=upstream.base_url,
+            transport=httpx.MockTransport(handler)
+        )
+        upstreams.append(upstream)
+        return upstream
+
+    yield make_upstream
+    for upstream in upstreams:
+        await upstream.close()
+
+
+def failing(request: httpx.Request):
+    raise httpx.ConnectError('Connection refused', request=request)
+
+
+@pytest.mark.asyncio
+async def test_failures_open_the_circuit(make_upstream):
+    upstream = make_upstream(failing)
+    for _ in range(2):
+        with pytest.raises(UpstreamError):
+            await upstream.request('GET', '/')
+    assert upstream.breaker.state == CircuitState.OPEN
+    assert upstream.in_flight == 0
+    with pytest.raises(UpstreamUnavailable):
+        await upstream.request('GET', '/')
+
+
+@pytest.mark.asyncio
+async def test_cancelled_requests_are_not_failures(make_upstream):
+    upstream = make_upstream(lambda request: httpx.Response(200))
+
+    async def never(*args, **kwargs):
+        await asyncio.Event().wait()
+
+    upstream.client.send = never
+    for _ in range(5):
+        request = asyncio.ensure_future(upstream.request('GET', '/'))
+        await asyncio.sleep(0)
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+    assert upstream.breaker.state == CircuitState.CLOSED
+    assert not upstream.breaker.outcomes
+    assert upstream.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_is_given_back(make_upstream):
+    upstream = make_upstream(lambda request: httpx.Response(200))
+    upstream.breaker.state = CircuitState.HALF_OPEN
+    send = upstream.client.send
+
+    async def never(*args, **kwargs):
+        await asyncio.Event().wait()
+
+    upstream.client.send = never
+    request = asyncio.ensure_future(upstream.request('GET', '/'))
+    await asyncio.sleep(0)
+    request.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await request
+    upstream.client.send = send
+    response = await upstream.request('GET', '/')
+    assert response.status_code == 200
+    assert upstream.breaker.state == CircuitState.CLOSED
+
+
+def get_connection_duration(name: str, stage: str):
+    labels = {'upstream': name, 'stage': stage}
+    return (
+        REGISTRY.get_sample_value(
+            'gateway_upstream_connection_duration_seconds_count', labels
+        ) or 0,
+        REGISTRY.get_sample_value(
+            'gateway_upstream_connection_duration_seconds_sum', labels
+        ) or 0
+    )
+
+
+@pytest.mark.asyncio
+async def test_pool_wait_and_connect_are_timed():
+    async def handle(reader, writer):
+        while await reader.readline() not in (b'\r\n', b''):
+            pass
+        await asyncio.sleep(.1)
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: 0\r\n'
+                     b'Connection: close\r\n\r\n')
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    client = httpx.AsyncClient(
+        base_url=f'http://127.0.0.1:{port}',
+        transport=TimedConnectionPool('timed', max_connections=1)
+    )
+    try:
+        await asyncio.gather(client.get('/'), client.get('/'))
+    finally:
+        await client.aclose()
+        server.close()
+        await server.wait_closed()
+
+    count, seconds = get_connection_duration('timed', 'pool')
+    assert count == 2
+    # One of the requests waited for the other one's connection
+    assert seconds >= .1
+    count, seconds = get_connection_duration('timed', 'connect')
+    assert count == 2
+    assert seconds < .1
@@ -0,0 +1,57 @@
+import pytest
+
+from api_gateway.api.v1.views import MAPPING
+from api_gateway.models.path_info import PathInfo
+from api_gateway.routing import RouteTable
+
+PREFIX = '/api/v1'
+
+USERS = PathInfo(path='/users/', service_path='/users/')
+USER = PathInfo(path='/users/{id}/', service_path='/users/{id}/',
+                path_params={'id': int})
+DELETE_USER = PathInfo(path='/users/{id}/', service_path='/users/{id}/',
+                       path_params={'id': int}, method='DELETE')
+CHAT = PathInfo(path='/chats/{key}/', service_path='/chats/{key}/',
+                path_params={'key': str})
+ROUTES = RouteTable(PREFIX, {'users': USERS, 'user': USER,
+                             'delete_user': DELETE_USER, 'chat': CHAT})
+
+
+def test_static_route():
+    assert ROUTES.match('GET', '/api/v1/users/') == (USERS, {})
+
+
+def test_path_params_are_converted():
+    assert ROUTES.match('GET', '/api/v1/users/42/') == (USER, {'id': 42})
+    assert ROUTES.match('GET', '/api/v1/chats/1:2/') == \
+        (CHAT, {'key': '1:2'})
+
+
+def test_routes_by_method():
+    assert ROUTES.match('DELETE', '/api/v1/users/42/') == \
+        (DELETE_USER, {'id': 42})
+    assert ROUTES.match('POST', '/api/v1/users/') is None
+
+
+@pytest.mark.parametrize('path', [
+    '/users/',
+    '/api/v1/users',
+    '/api/v1/users/abc/',
+    '/api/v1/users/42/friends/',
+    '/api/v2/users/',
+])
+def test_no_match(path):
+    assert ROUTES.match('GET', path) is None
+
+
+@pytest.mark.parametrize('name', list(MAPPING))
+def test_mapping_routes_match_themselves(name):
+    path_info = MAPPING[name]
+    path = path_info.path
+    params = {}
+    for param, annotation in path_info.path_params.items():
+        params[param] = 7 if annotation is int else 'value'
+        path = path.replace(f'{{{param}}}', str(params[param]))
+    routes = RouteTable(PREFIX, MAPPING)
+    assert routes.match(path_info.method, PREFIX + path) == \
+        (path_info, params)
@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import Request
+
+from api_gateway import utils
+from api_gateway.models.path_info import PathInfo
+from api_gateway.services.responses import ProxyResponse, ResponseCacheService
+from api_gateway.settings import ResponseCacheSettings
+from api_gateway.utils import (
+    filter_headers,
+    get_cache_entry,
+    REQUEST_EXCLUDED_HEADERS,
+    RESPONSE_EXCLUDED_HEADERS
+)
+
+
+def test_hop_by_hop_request_headers_are_dropped():
+    headers = [
+        ('Host', 'gateway'),
+        ('Connection', 'keep-alive'),
+        ('Keep-Alive', 'timeout=5'),
+        ('Transfer-Encoding', 'chunked'),
+        ('TE', 'trailers'),
+        ('Upgrade', 'h2c'),
+        ('Proxy-Authorization', 'Basic'),
+        ('Content-Type', 'application/json'),
+        ('X-Auth-Token', 'token'),
+    ]
+    assert filter_headers(headers, REQUEST_EXCLUDED_HEADERS) == [
+        ('Content-Type', 'application/json'),
+        ('X-Auth-Token', 'token'),
+    ]
+
+
+def test_user_id_is_not_taken_from_client():
+    headers = [('X-User-Id', '1'), ('x-user-id', '2'), ('Accept', '*/*')]
+    assert filter_headers(headers, REQUEST_EXCLUDED_HEADERS) == \
+        [('Accept', '*/*')]
+
+
+def test_headers_listed_in_connection_are_dropped():
+    headers = [
+        ('Connection', 'close, X-Trace , x-debug'),
+        ('X-Trace', '1'),
+        ('X-Debug', '1'),
+        ('X-Request-Id', '1'),
+    ]
+    assert filter_headers(headers, REQUEST_EXCLUDED_HEADERS) == \
+        [('X-Request-Id', '1')]
+
+
+def test_response_headers():
+    headers = [
+        ('content-length', '10'),
+        ('date', 'Mon, 01 Mar 2021 00:00:00 GMT'),
+        ('server', 'uvicorn'),
+        ('transfer-encoding', 'chunked'),
+        ('content-type', 'application/json'),
+        ('etag', '"1"'),
+        ('set-cookie', 'a=1'),
+        ('set-cookie', 'b=2'),
+    ]
+    assert filter_headers(headers, RESPONSE_EXCLUDED_HEADERS) == [
+        ('content-type', 'application/json'),
+        ('etag', '"1"'),
+        ('set-cookie', 'a=1'),
+        ('set-cookie', 'b=2'),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_cached_responses_are_not_encoded(monkeypatch):
+    sent = []
+
+    async def fetch_response(injector, path_info, request, headers):
+        sent.append(headers)
+        return ProxyResponse(status_code=200, headers=[], content=b'[]')
+
+    monkeypatch.setattr(utils, 'fetch_response', fetch_response)
+    injector = SimpleNamespace(
+        response_cache=ResponseCacheService(ResponseCacheSettings())
+    )
+    path_info = PathInfo(path='/hobbies/', service_path='/hobbies/',
+                         cache_ttl=60)
+    request = Request({'type': 'http', 'method': 'GET',
+                       'path': '/hobbies/', 'query_string': b'',
+                       'headers': []})
+
+    gzip = [('Accept-Encoding', 'gzip'), ('If-None-Match', '"1"')]
+    entry = await get_cache_entry(injector, path_info, request, gzip)
+    assert sent == [[('accept-encoding', 'identity')]]
+    # Served to a client which doesn't accept gzip
+    assert await get_cache_entry(injector, path_info, request, []) is entry
+    assert len(sent) == 1